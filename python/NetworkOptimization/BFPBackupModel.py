@@ -3,9 +3,81 @@ Created on Nov 23, 2015
  
 @author: Edielson P. Frigieri
 '''
-from gurobipy import Model, GRB, quicksum, tuplelist
+from gurobipy import Model, GRB, tuplelist, LinExpr
+import numpy as np
 import json
- 
+
+from NetworkOptimization.ModelBuilder import ModelBuilder, GetLinkNames, SetStart, GetScenarioRows
+from NetworkOptimization.QualityAssessment import GetSuperquantiles
+
+class SuperquantileCuts(object):
+    """ Benders (L-shaped) optimality cuts of the decomposed buffered failure probability model.
+
+    For fixed routes, the Buffer_Prob constraints of backup link (i,j) say that its capacity is at least the
+    superquantile of the load routed to it, which is computed in closed form (see GetSuperquantiles). The
+    superquantile is convex in the routes, and the dual weights of the scenarios give the cut
+    capacity[i,j] >= sum_sd (sum_k Duals[k]*Failed[k,s,d])*route[i,j,s,d], tight at the given routes.
+    The object is the Gurobi callback: violated cuts are added as lazy constraints on each new
+    incumbent (MIPSOL) and as user cuts on the node relaxations (MIPNODE).
+
+    Parameters
+    ----------
+    Failed: (NumScenarios, NumLinks) matrix of failed capacity.
+    Weights: Weight of each scenario (Gamma[k]), None for 1.
+    NumSamples: Number of samples (K).
+    Survivability: Survivability factor (epsilon).
+    CapacityVars: Capacity variable of each backup link.
+    RouteVars: Routing variables, NumLinks per backup link (in the order of the columns of Failed).
+    Tolerance: Minimum violation of a cut.
+
+    """
+
+    def __init__(self, Failed, Weights, NumSamples, Survivability, CapacityVars, RouteVars, Tolerance=1e-6):
+        '''
+        Constructor
+        '''
+        self.Failed = np.asarray(Failed, dtype=float)
+        self.Weights = Weights
+        self.NumSamples = NumSamples
+        self.Survivability = Survivability
+        self.CapacityVars = list(CapacityVars)
+        self.RouteVars = list(RouteVars)
+        self.Vars = self.CapacityVars + self.RouteVars
+        self.Tolerance = Tolerance
+        self.NumLazy = 0
+        self.NumUser = 0
+
+    def GetCuts(self, CapacityValues, RouteValues):
+        """Return the violated cuts (backup link index and route coefficients) for the given capacities and routes."""
+        Routes = np.asarray(RouteValues, dtype=float).reshape(len(self.CapacityVars), -1)
+        Superquantiles, Quantiles, Duals = GetSuperquantiles(np.dot(Routes, self.Failed.T), self.Weights, self.NumSamples, self.Survivability)
+        Violated = np.nonzero(Superquantiles > np.asarray(CapacityValues)+self.Tolerance)[0]
+        return Violated, np.dot(Duals[Violated], self.Failed)
+
+    def GetExpression(self, Link, Coeffs):
+        """Return the routed load sum_sd Coeffs[s,d]*route[i,j,s,d] of a cut on the Link-th backup link."""
+        NumLinks = len(Coeffs)
+        Columns = np.nonzero(Coeffs)[0]
+        return LinExpr(Coeffs[Columns].tolist(), [self.RouteVars[Link*NumLinks+c] for c in Columns])
+
+    def __call__(self, model, where):
+        if where == GRB.Callback.MIPSOL:
+            Values = model.cbGetSolution(self.Vars)
+            Add = model.cbLazy
+        elif where == GRB.Callback.MIPNODE and model.cbGet(GRB.Callback.MIPNODE_STATUS) == GRB.Status.OPTIMAL:
+            Values = model.cbGetNodeRel(self.Vars)
+            Add = model.cbCut
+        else:
+            return
+        NumBackupLinks = len(self.CapacityVars)
+        Violated, Coeffs = self.GetCuts(Values[:NumBackupLinks], Values[NumBackupLinks:])
+        for Link, Row in zip(Violated, Coeffs):
+            Add(self.GetExpression(Link, Row) <= self.CapacityVars[Link])
+        if where == GRB.Callback.MIPSOL:
+            self.NumLazy = self.NumLazy + len(Violated)
+        else:
+            self.NumUser = self.NumUser + len(Violated)
+
 class BFPBackupNetwork(object):
     """ Class object for buffered failure probability-based model.
 
@@ -33,94 +105,245 @@ class BFPBackupNetwork(object):
     bBackupLink = {}
     z0 = {}
     z = {}
+    
+    # Cut callback of the decomposed model (None for the monolithic model)
+    Cuts = None
+    
+    # Constraint handles, indexed by (i,j) for Buffer_Prob_I and Buffer_Cut and by (k,i,j) for Buffer_Prob_II
+    BufferProbI = {}
+    BufferProbII = {}
+    BufferCut = {}
          
     def __init__(self):
         '''
         Constructor
         '''
                          
-    def LoadModel(self,Gamma,Nodes,Links,Capacity,Survivability,NumSamples):
+    def LoadModel(self,Gamma,Nodes,Links,Capacity,Survivability,NumSamples,Aggregate=False,Reduce=False,Decompose=False):
         """ Load model.
     
+        The variables are added in blocks and the constraints as sparse coefficient matrices
+        (see ModelBuilder), with a single model update. The build statistics are kept in BuildStatistics.
+    
         Parameters
         ----------
         Gamma : importance sampling vector
+        Aggregate : True to collapse identical scenarios into weighted ones (the z variables are then
+            indexed by distinct scenario, and the compression ratio is kept in BuildStatistics)
+        Reduce : True to replace the zero-failure scenarios by z0 >= -capacity and to merge the single-failure
+            scenarios of each failed link (same optimal solution, see ReduceScenarioRows)
+        Decompose : True to build the master problem of a Benders decomposition instead of the monolithic model.
+            It only has the capacity and routing variables, and the scenarios enter through the cuts of the
+            superquantile of each backup link (see SuperquantileCuts), added by Optimize. Reduce is not used.
+        
+        The built model can be changed in place by SetEpsilon, SetGamma and ReplaceScenarios.
         
         """         
         self.Links = tuplelist(Links)
         self.Capacity = Capacity
+        self.Gamma = Gamma
+        self.Survivability = Survivability
+        self.NumSamples = NumSamples
+        self.Aggregate = Aggregate
+        self.Reduce = Reduce
                
         # Create optimization model
         self.model = Model('Backup')
+        Builder = ModelBuilder(self.model)
+        Failed, Weights = Builder.GetScenarioRows(Capacity, NumSamples, self.Links, Gamma, Aggregate, Survivability if Reduce and not Decompose else None)
+        self.Failed = Failed
+        self.Weights = np.ones(len(Failed)) if Weights is None else np.asarray(Weights, dtype=float)
      
         # Create variables
-        for i,j in self.Links:
-            self.BackupCapacity[i,j] = self.model.addVar(vtype=GRB.INTEGER,lb=0, name='Backup_Capacity[%s,%s]' % (i, j))
-            #self.BackupCapacity[i,j] = self.model.addVar(lb=0, name='Backup_Capacity[%s,%s]' % (i, j))
-        self.model.update()
-          
-        for i,j in self.Links:
-            for s,d in self.Links:
-                self.bBackupLink[i,j,s,d] = self.model.addVar(vtype=GRB.BINARY,name='Backup_Link[%s,%s,%s,%s]' % (i, j, s, d))
-        self.model.update()
-         
-        for i,j in self.Links:
-            for k in range(NumSamples):
-                self.z[k,i,j] = self.model.addVar(lb=0,name='z[%s][%s][%s]' % (k,i,j))
-        self.model.update()
+        CapStart = Builder.AddVars(GetLinkNames('Backup_Capacity', self.Links), vtype=GRB.INTEGER, obj=1.0)
+        LinkStart, LinkKeys = Builder.AddRouteVars('Backup_Link', self.Links, self.Links)
         
-        for i,j in self.Links: 
-            self.z0[i,j] = self.model.addVar(lb=-GRB.INFINITY,name='z0[%s][%s]' %(i,j))
-        self.model.update()
+        self.BackupCapacity = Builder.GetVarDict(self.Links, CapStart)
+        self.bBackupLink = Builder.GetVarDict(LinkKeys, LinkStart)
          
         self.model.modelSense = GRB.MINIMIZE
         
-        self.model.setObjective(quicksum(self.BackupCapacity[i,j] for i,j in self.Links))
-        self.model.update()
-         
+        if Decompose:
+            self.__LoadMaster(Builder, Nodes, Failed, Weights, Survivability, NumSamples, CapStart, LinkStart)
+            return
+        self.Cuts = None
+        self.BufferCut = {}
+        ZStart, Z0Start, ZKeys = Builder.AddScenarioVars(self.Links, len(Failed))
+        self.z = Builder.GetVarDict(ZKeys, ZStart)
+        self.z0 = Builder.GetVarDict(self.Links, Z0Start)
             
         #------------------------------------------------------------------------#
         #                    Constraints definition                              #
         #                                                                        #
         #                                                                        #
         #------------------------------------------------------------------------#
-          
+        
         # Buffer probability I
-        for i,j in self.Links:
-            self.model.addConstr(self.z0[i,j] + 1/(NumSamples*Survivability)*quicksum(self.z[k,i,j] for (k) in range(NumSamples)) <= 0,'[CONST]Buffer_Prob_I[%s][%s]'%(i,j))
-        self.model.update()
+        Constrs = Builder.AddBufferProbConstrs(self.Links, len(Failed), ZStart, Z0Start, Survivability, Scale=NumSamples)
+        self.BufferProbI = dict(zip(self.Links, Constrs))
          
-        # Link capacity constraints
-        for i,j in self.Links:
-            for k in range(NumSamples):
-                if Gamma == None:
-                    self.model.addConstr((quicksum(self.bBackupLink[i,j,s,d]*Capacity[k,s,d] for s,d in self.Links) - self.BackupCapacity[i,j] - self.z0[i,j]) <= self.z[k,i,j],'[CONST]Buffer_Prob_II[%s][%s][%s]' % (k,i,j))
-                else:    
-                    self.model.addConstr((quicksum(self.bBackupLink[i,j,s,d]*Capacity[k,s,d] for s,d in self.Links) - self.BackupCapacity[i,j] - self.z0[i,j])*Gamma[k] <= self.z[k,i,j],'[CONST]Buffer_Prob_II[%s][%s][%s]' % (k,i,j))
-        self.model.update()
+        # Link capacity constraints (z[k,i,j] >= 0 is the lower bound of z)
+        Constrs = Builder.AddScenarioConstrs(self.Links, ZKeys, ZStart, Z0Start, Weights, Failed, LinkStart, CapStart)
+        self.BufferProbII = dict(zip(ZKeys, Constrs))
+        Builder.AddZeroLoadConstrs(self.Links, Z0Start, CapStart)
         
-        # Link capacity constraints
-        for i,j in self.Links:
-            for k in range(NumSamples):
-                self.model.addConstr(self.z[k,i,j] >= 0,'[CONST]Buffer_Prob_III[%s][%s][%s]' % (k,i,j))
-        self.model.update()
+        # Flow conservation constraints
+        Builder.AddFlowConstrs(Nodes, self.Links, self.Links, LinkStart)
+        
+        self.BuildStatistics = Builder.Update()
+    
+    def SetStart(self, BackupCapacity, BackupRoutes, Hint=False):
+        """ Start the next optimization from a previous solution.
+        
+        Parameters
+        ----------
+        BackupCapacity : capacity per backup link (e.g. from Optimize or LoadBackupNetwork)
+        BackupRoutes : backup routes indexed by (i,j,s,d)
+        Hint : True to give the solution as variable hints instead of a MIP start
+        
+        Returns
+        -------
+        Number of variables set.
+        
+        """
+        return SetStart(self.BackupCapacity, BackupCapacity, Hint) + SetStart(self.bBackupLink, BackupRoutes, Hint)
+    
+    def __LoadMaster(self, Builder, Nodes, Failed, Weights, Survivability, NumSamples, CapStart, LinkStart):
+        """ Load the master problem of the decomposed model (see LoadModel).
+        
+        The master starts with the cut of the expected load of each backup link (the superquantile is at least
+        the mean when the weights add up to K*epsilon or more), and the other cuts are added by SuperquantileCuts.
+        
+        """
+        NumLinks = len(self.Links)
+        self.z = {}
+        self.z0 = {}
+        self.BufferProbI = {}
+        self.BufferProbII = {}
+        self.BufferCut = {}
+        
+        # Cuts of the expected load: sum_sd E[Failed[s,d]]*bBackupLink[i,j,s,d] <= BackupCapacity[i,j]
+        ScenarioWeights = np.ones(len(Failed)) if Weights is None else np.asarray(Weights, dtype=float)
+        if len(Failed) and ScenarioWeights.sum() >= NumSamples*Survivability:
+            Mean = np.dot(ScenarioWeights, Failed)/ScenarioWeights.sum()
+            Columns = np.nonzero(Mean)[0]
+            Links = np.arange(NumLinks)
+            Rows = np.concatenate([np.repeat(Links, len(Columns)), Links])
+            Cols = np.concatenate([(LinkStart+NumLinks*Links.reshape(-1,1)+Columns).ravel(), CapStart+Links])
+            Values = np.concatenate([np.tile(Mean[Columns], NumLinks), -np.ones(NumLinks)])
+            Constrs = Builder.AddConstrs(Rows, Cols, Values, GRB.LESS_EQUAL, 0, GetLinkNames('[CONST]Buffer_Cut', self.Links, '[%s][%s]'))
+            self.BufferCut = dict(zip(self.Links, Constrs))
+        
+        # Flow conservation constraints
+        Builder.AddFlowConstrs(Nodes, self.Links, self.Links, LinkStart)
+        
+        self.BuildStatistics = Builder.Update()
+        self.Cuts = SuperquantileCuts(Failed, Weights, NumSamples, Survivability, Builder.GetVars(CapStart, CapStart+NumLinks),
+                                      Builder.GetVars(LinkStart, LinkStart+NumLinks*NumLinks))
+        self.model.params.LazyConstraints = 1
+        self.model.params.PreCrush = 1
          
-        for i in Nodes:
-            for s,d in self.Links:
-                # Flow conservation constraints
-                if i == s:
-                    self.model.addConstr(quicksum(self.bBackupLink[i,j,s,d] for i,j in self.Links.select(i,'*')) - 
-                                           quicksum(self.bBackupLink[j,i,s,d] for j,i in self.Links.select('*',i)) == 1,'Flow1[%s,%s,%s]' % (i,s,d))
-                # Flow conservation constraints
-                elif i == d:
-                    self.model.addConstr(quicksum(self.bBackupLink[i,j,s,d] for i,j in self.Links.select(i,'*')) - 
-                                           quicksum(self.bBackupLink[j,i,s,d] for j,i in self.Links.select('*',i)) == -1,'Flow2[%s,%s,%s]' % (i,s,d))
-                # Flow conservation constraints
-                else:    
-                    self.model.addConstr(quicksum(self.bBackupLink[i,j,s,d] for i,j in self.Links.select(i,'*')) - 
-                                           quicksum(self.bBackupLink[j,i,s,d] for j,i in self.Links.select('*',i)) == 0,'Flow3[%s,%s,%s]' % (i,s,d))
+    def SetEpsilon(self, Survivability):
+        """ Change the survivability factor (epsilon) of the built model.
+        
+        Only the coefficients of z in the Buffer_Prob_I constraints change (in the decomposed model, the
+        cuts and the Buffer_Cut constraints), so the next Optimize does not rebuild the model.
+        
+        Parameters
+        ----------
+        Survivability : desired survivabiliy factor (epsilon)
+        
+        """
+        self.__SetScenarioRows(self.Capacity, self.NumSamples, self.Gamma, Survivability)
+    
+    def SetGamma(self, Gamma):
+        """ Change the importance sampling vector of the built model.
+        
+        Only the rows of the Buffer_Prob_II constraints whose weight changed are edited.
+        
+        Parameters
+        ----------
+        Gamma : importance sampling vector (None for 1)
+        
+        """
+        self.__SetScenarioRows(self.Capacity, self.NumSamples, Gamma, self.Survivability)
+    
+    def ReplaceScenarios(self, Capacity, Gamma=None, NumSamples=None):
+        """ Replace the scenarios of the built model.
+        
+        The new scenarios must give as many scenario rows as the model has (after Aggregate and Reduce),
+        and only the Buffer_Prob_II rows that changed are edited.
+        
+        Parameters
+        ----------
+        Capacity : capacities per link based based on random failures
+        Gamma : importance sampling vector of the new scenarios (None for 1)
+        NumSamples : number of random scenarios (None to keep the current one)
+        
+        """
+        if NumSamples == None:
+            NumSamples = self.NumSamples
+        self.__SetScenarioRows(Capacity, NumSamples, Gamma, self.Survivability)
+    
+    def __SetScenarioRows(self, Capacity, NumSamples, Gamma, Survivability):
+        """ Edit the coefficients of the built model for new scenarios, weights or epsilon.
+        
+        Raises ValueError when the change needs a new LoadModel, i.e. when the number of scenario rows
+        changes, or when it changes whether the zero-failure scenarios are removed (see ReduceScenarioRows).
+        
+        """
+        Failed, Weights, Statistics = GetScenarioRows(Capacity, NumSamples, self.Links, Gamma, self.Aggregate,
+                                                      Survivability if self.Reduce and self.Cuts is None else None)
+        Weights = np.ones(len(Failed)) if Weights is None else np.asarray(Weights, dtype=float)
+        if self.Cuts is not None:
+            self.__SetCuts(Failed, Weights, NumSamples, Survivability)
+        else:
+            if (Statistics["zero_failure"] > 0) != (self.BuildStatistics["zero_failure"] > 0):
+                raise ValueError('The zero-failure scenarios must be removed in both models, load the model again.')
+            if Failed.shape != self.Failed.shape:
+                raise ValueError('The model has %d scenario rows and the new scenarios have %d, load the model again.' %(len(self.Failed), len(Failed)))
+            
+            # Buffer probability I: z0[i,j] + 1/(K*epsilon)*sum_k z[k,i,j] <= 0
+            if NumSamples*Survivability != self.NumSamples*self.Survivability:
+                for i,j in self.Links:
+                    for k in range(len(Failed)):
+                        self.model.chgCoeff(self.BufferProbI[i,j], self.z[k,i,j], 1.0/(NumSamples*Survivability))
+            
+            # Buffer probability II of the changed scenarios
+            Changed = np.nonzero((Failed != self.Failed).any(axis=1) | (Weights != self.Weights))[0]
+            for k in Changed:
+                Columns = np.nonzero((Failed[k] != 0) | (self.Failed[k] != 0))[0]
+                for i,j in self.Links:
+                    Constr = self.BufferProbII[k,i,j]
+                    for c in Columns:
+                        s,d = self.Links[c]
+                        self.model.chgCoeff(Constr, self.bBackupLink[i,j,s,d], Failed[k,c]*Weights[k])
+                    self.model.chgCoeff(Constr, self.BackupCapacity[i,j], -Weights[k])
+                    self.model.chgCoeff(Constr, self.z0[i,j], -Weights[k])
         self.model.update()
-                 
+        
+        self.Capacity = Capacity
+        self.Gamma = Gamma
+        self.NumSamples = NumSamples
+        self.Survivability = Survivability
+        self.Failed = Failed
+        self.Weights = Weights
+        self.BuildStatistics.update(Statistics)
+    
+    def __SetCuts(self, Failed, Weights, NumSamples, Survivability):
+        """ Update the cuts and the Buffer_Cut constraints of the decomposed model (see __LoadMaster). """
+        self.Cuts.Failed = np.asarray(Failed, dtype=float)
+        self.Cuts.Weights = Weights
+        self.Cuts.NumSamples = NumSamples
+        self.Cuts.Survivability = Survivability
+        
+        # The expected load is only a valid cut when the weights add up to K*epsilon or more
+        Mean = np.zeros(len(self.Links))
+        if len(Failed) and Weights.sum() >= NumSamples*Survivability:
+            Mean = np.dot(Weights, Failed)/Weights.sum()
+        for i,j in self.BufferCut:
+            for c, (s,d) in enumerate(self.Links):
+                self.model.chgCoeff(self.BufferCut[i,j], self.bBackupLink[i,j,s,d], Mean[c])
          
     def Optimize(self, MipGap=None, TimeLimit = None, LogLevel = None):
         """ Optimize the defined  model.
@@ -136,6 +359,8 @@ class BFPBackupNetwork(object):
         BackupCapacity: The total capacity assigned per backup link
         BackupRoutes: The set of selected backup links 
            A tuple list with all paths for edge (s,d) that uses (i,j).
+        
+        A solve stopped by the limits (e.g. TimeLimit) returns its incumbent (see GetSolution).
     
         """ 
         self.model.write('bpbackup.lp')
@@ -144,26 +369,18 @@ class BFPBackupNetwork(object):
             self.model.params.MIPGap = MipGap
         if TimeLimit != None:
             self.model.params.timeLimit = TimeLimit
-        # Compute optimal solution
-        self.model.optimize()
+        # Compute optimal solution (adding the cuts of the decomposed model)
+        if self.Cuts is None:
+            self.model.optimize()
+        else:
+            self.model.optimize(self.Cuts)
          
         # Print solution
-        if self.model.status == GRB.Status.OPTIMAL:
+        if self.model.SolCount > 0:
             
             if LogLevel == 1:
                 for v in self.model.getVars():
                     print('%s %g' % (v.varName, v.x))
-                    
-            self.BackupCapacitySolution = self.model.getAttr('x', self.BackupCapacity)
-            self.BackupRoutesSolution = self.model.getAttr('x', self.bBackupLink)
-            
-            self.BackupLinksSolution={}
-            for link in self.BackupCapacitySolution:
-                if self.BackupCapacitySolution[link] > 0.0001:
-                    if (len(self.BackupLinksSolution) == 0):
-                        self.BackupLinksSolution=[link]
-                    else:
-                        self.BackupLinksSolution=self.BackupLinksSolution+[link]
             
 #             #SuperQuantileSolution = self.model.getAttr('x', self.z0)
 #             ZNotSolution = {}
@@ -190,13 +407,41 @@ class BFPBackupNetwork(object):
                             
         else:
             print('Optimal value not found!\n')
-            self.BackupCapacitySolution = []
-            self.BackupRoutesSolution = {}
-            self.BackupLinksSolution = {}
 #             LHS = {}
              
 #         return BackupCapacity,BackupRoutes,BackupLinks,LHS
-        return self.BackupCapacitySolution,self.BackupRoutesSolution,self.BackupLinksSolution    
+        return self.GetSolution()
+    
+    def GetSolution(self):
+        """ Keep and return the solution of the last solve, rounded to integral values.
+        
+        The solution is the optimum or, for a solve stopped by the limits (e.g. TimeLimit), the incumbent,
+        so the rounding drops the small violations of integrality of the solver. 
+        
+        Returns
+        -------
+        BackupCapacity, BackupRoutes, BackupLinks: As in Optimize, empty if the solve found no solution.
+    
+        """
+        if self.model.SolCount == 0:
+            self.BackupCapacitySolution = []
+            self.BackupRoutesSolution = {}
+            self.BackupLinksSolution = {}
+            return self.BackupCapacitySolution,self.BackupRoutesSolution,self.BackupLinksSolution
+        
+        Capacity = self.model.getAttr('x', self.BackupCapacity)
+        Routes = self.model.getAttr('x', self.bBackupLink)
+        self.BackupCapacitySolution = dict((key, round(value)) for key, value in Capacity.items())
+        self.BackupRoutesSolution = dict((key, round(value)) for key, value in Routes.items())
+        
+        self.BackupLinksSolution={}
+        for link in self.BackupCapacitySolution:
+            if self.BackupCapacitySolution[link] > 0:
+                if (len(self.BackupLinksSolution) == 0):
+                    self.BackupLinksSolution=[link]
+                else:
+                    self.BackupLinksSolution=self.BackupLinksSolution+[link]
+        return self.BackupCapacitySolution,self.BackupRoutesSolution,self.BackupLinksSolution
     
     
     def SaveBakupNetwork(self, file_name): 
@@ -246,8 +491,10 @@ class BFPBackupNetwork(object):
             
         return self.BackupCapacitySolution,self.BackupRoutesSolution,self.BackupLinksSolution
     
-    def ResetModel(self):
+    def ResetModel(self, KeepStart=False):
         '''
-        Reset model solution.
+        Reset model solution (with KeepStart, the last solution found is the MIP start of the next optimization).
         '''
-        self.model.reset()
\ No newline at end of file
+        self.model.reset()
+        if KeepStart and len(getattr(self, 'BackupRoutesSolution', {})) > 0:
+            self.SetStart(self.BackupCapacitySolution, self.BackupRoutesSolution)
\ No newline at end of file
@@ -3,9 +3,11 @@ Created on Nov 23, 2015
  
 @author: Edielson P. Frigieri
 '''
-from gurobipy import Model, GRB, quicksum, tuplelist
+from gurobipy import Model, GRB, tuplelist
 import json
 import math
+
+from NetworkOptimization.ModelBuilder import ModelBuilder, GetLinkNames, SetStart
  
 class BFPBackupNetwork_WithBackupCapacity(object):
     """ Class object for buffered failure probability-based model.
@@ -42,12 +44,18 @@ class BFPBackupNetwork_WithBackupCapacity(object):
         Constructor
         '''
                          
-    def LoadModel(self,Gamma,Nodes,Links,Capacity,Survivability,NumSamples,BackupCapacity, BackupLinks):
+    def LoadModel(self,Gamma,Nodes,Links,Capacity,Survivability,NumSamples,BackupCapacity, BackupLinks, Aggregate=False, Reduce=False):
         """ Load model.
     
+        The model is built in blocks through ModelBuilder, and the build statistics are kept in BuildStatistics.
+    
         Parameters
         ----------
         Gamma : importance sampling vector
+        Aggregate : True to collapse identical scenarios into weighted ones (the z variables are then
+            indexed by distinct scenario, and the compression ratio is kept in BuildStatistics)
+        Reduce : True to replace the zero-failure scenarios by z0 >= -capacity and to merge the single-failure
+            scenarios of each failed link (same optimal solution, see ReduceScenarioRows)
         
         """         
         self.Links = tuplelist(Links)
@@ -69,33 +77,22 @@ class BFPBackupNetwork_WithBackupCapacity(object):
         self.BarDelta = math.ceil(SumBackupCapacity-SumFloorBackupCapacity)
         print('barDelta=%g'%self.BarDelta)
         
-        # Create variables
-        for i,j in self.BackupLinks:
-            self.Delta[i,j] = self.model.addVar(vtype=GRB.INTEGER,lb=0, name='Delta[%s,%s]' % (i, j))
-        self.model.update()
-        
-        self.Theta = self.model.addVar(name='Theta')
-        self.model.update()
-          
-        for i,j in self.BackupLinks:
-            for s,d in self.Links:
-                self.bBackupLink[i,j,s,d] = self.model.addVar(vtype=GRB.BINARY,name='Backup_Link[%s,%s,%s,%s]' % (i, j, s, d))
-        self.model.update()
+        Builder = ModelBuilder(self.model)
+        Failed, Weights = Builder.GetScenarioRows(Capacity, NumSamples, self.Links, Gamma, Aggregate, Survivability if Reduce else None)
         
-        for i,j in self.BackupLinks:
-            for k in range(NumSamples):
-                self.z[k,i,j] = self.model.addVar(lb=0,name='z[%s][%s][%s]' % (k,i,j))
-        self.model.update()
+        # Create variables
+        DeltaStart = Builder.AddVars(GetLinkNames('Delta', self.BackupLinks), vtype=GRB.INTEGER)
+        ThetaIndex = Builder.AddVars(['Theta'], obj=1.0)
+        LinkStart, LinkKeys = Builder.AddRouteVars('Backup_Link', self.BackupLinks, self.Links)
+        ZStart, Z0Start, ZKeys = Builder.AddScenarioVars(self.BackupLinks, len(Failed))
         
-        for i,j in self.BackupLinks: 
-            self.z0[i,j] = self.model.addVar(lb=-GRB.INFINITY,name='z0[%s][%s]' %(i,j))
-        self.model.update()
+        self.Delta = Builder.GetVarDict(self.BackupLinks, DeltaStart)
+        self.Theta = Builder.GetVars(ThetaIndex, ThetaIndex+1)[0]
+        self.bBackupLink = Builder.GetVarDict(LinkKeys, LinkStart)
+        self.z = Builder.GetVarDict(ZKeys, ZStart)
+        self.z0 = Builder.GetVarDict(self.BackupLinks, Z0Start)
          
         self.model.modelSense = GRB.MINIMIZE
-        
-        self.model.setObjective(self.Theta)
-        self.model.update()
-         
             
         #------------------------------------------------------------------------#
         #                    Constraints definition                              #
@@ -104,43 +101,38 @@ class BFPBackupNetwork_WithBackupCapacity(object):
         #------------------------------------------------------------------------#
           
         # Buffer probability I
-        for i,j in self.BackupLinks:
-            self.model.addConstr(self.z0[i,j] + 1/(NumSamples*Survivability)*quicksum(self.z[k,i,j] for (k) in range(NumSamples)) <= self.Theta,'[CONST]Buffer_Prob_I[%s][%s]'%(i,j))
-        self.model.update()
+        Builder.AddBufferProbConstrs(self.BackupLinks, len(Failed), ZStart, Z0Start, Survivability, ThetaIndex, Scale=NumSamples)
          
-        # Link capacity constraints
-        for i,j in self.BackupLinks:
-            for k in range(NumSamples):
-                if Gamma == None:
-                    self.model.addConstr((quicksum(self.bBackupLink[i,j,s,d]*Capacity[k,s,d] for s,d in self.Links) - (self.Delta[i,j] + self.HatBackupCapacity[i,j]) - self.z0[i,j]) <= self.z[k,i,j],'[CONST]Buffer_Prob_II[%s][%s][%s]' % (k,i,j))
-                else:    
-                    self.model.addConstr((quicksum(self.bBackupLink[i,j,s,d]*Capacity[k,s,d] for s,d in self.Links) - (self.Delta[i,j] + self.HatBackupCapacity[i,j]) - self.z0[i,j])*Gamma[k] <= self.z[k,i,j],'[CONST]Buffer_Prob_II[%s][%s][%s]' % (k,i,j))
-        self.model.update()
-        
-        # Link capacity constraints
-        for i,j in self.BackupLinks:
-            for k in range(NumSamples):
-                self.model.addConstr(self.z[k,i,j] >= 0,'[CONST]Buffer_Prob_III[%s][%s][%s]' % (k,i,j))
-        self.model.update()
+        # Link capacity constraints, with capacity Delta[i,j] + HatBackupCapacity[i,j] (z[k,i,j] >= 0 is the lower bound of z)
+        HatCapacity = [self.HatBackupCapacity[i,j] for i,j in self.BackupLinks]
+        Builder.AddScenarioConstrs(self.BackupLinks, ZKeys, ZStart, Z0Start, Weights, Failed, LinkStart, DeltaStart, HatCapacity)
+        Builder.AddZeroLoadConstrs(self.BackupLinks, Z0Start, DeltaStart, HatCapacity)
         
-        for i,j in self.BackupLinks:
-            self.model.addConstr(quicksum(self.Delta[i,j] for i,j in self.BackupLinks) <= self.BarDelta, '[CONST]Delta[%s][%s]' % (i,j))
- 
-        for i in Nodes:
-            for s,d in self.Links:
-                # Flow conservation constraints
-                if i == s:
-                    self.model.addConstr(quicksum(self.bBackupLink[i,j,s,d] for i,j in self.BackupLinks.select(i,'*')) - 
-                                           quicksum(self.bBackupLink[j,i,s,d] for j,i in self.BackupLinks.select('*',i)) == 1,'Flow1[%s,%s,%s]' % (i,s,d))
-                # Flow conservation constraints
-                elif i == d:
-                    self.model.addConstr(quicksum(self.bBackupLink[i,j,s,d] for i,j in self.BackupLinks.select(i,'*')) - 
-                                           quicksum(self.bBackupLink[j,i,s,d] for j,i in self.BackupLinks.select('*',i)) == -1,'Flow2[%s,%s,%s]' % (i,s,d))
-                # Flow conservation constraints
-                else:    
-                    self.model.addConstr(quicksum(self.bBackupLink[i,j,s,d] for i,j in self.BackupLinks.select(i,'*')) - 
-                                           quicksum(self.bBackupLink[j,i,s,d] for j,i in self.BackupLinks.select('*',i)) == 0,'Flow3[%s,%s,%s]' % (i,s,d))
-        self.model.update()
+        # Total increase of the backup capacity (a single row, the same for every backup link)
+        NumBackupLinks = len(self.BackupLinks)
+        Builder.AddConstrs([0]*NumBackupLinks, range(DeltaStart, DeltaStart+NumBackupLinks), [1]*NumBackupLinks, GRB.LESS_EQUAL, self.BarDelta, ['[CONST]Delta'])
+        
+        # Flow conservation constraints
+        Builder.AddFlowConstrs(Nodes, self.BackupLinks, self.Links, LinkStart)
+        
+        self.BuildStatistics = Builder.Update()
+    
+    def SetStart(self, BackupCapacity, BackupRoutes, Hint=False):
+        """ Start the next optimization from a previous solution.
+        
+        Parameters
+        ----------
+        BackupCapacity : capacity per backup link (the start of Delta is its increase over HatBackupCapacity)
+        BackupRoutes : backup routes indexed by (i,j,s,d)
+        Hint : True to give the solution as variable hints instead of a MIP start
+        
+        Returns
+        -------
+        Number of variables set.
+        
+        """
+        Delta = dict((link, max(0, round(BackupCapacity[link]-self.HatBackupCapacity[link]))) for link in BackupCapacity if link in self.HatBackupCapacity)
+        return SetStart(self.Delta, Delta, Hint) + SetStart(self.bBackupLink, BackupRoutes, Hint)
                  
          
     def Optimize(self, MipGap=None, TimeLimit = None, LogLevel = None):
@@ -3,9 +3,11 @@ Created on Nov 23, 2015
  
 @author: Edielson P. Frigieri
 '''
-from gurobipy import Model, GRB, quicksum, tuplelist
+from gurobipy import Model, GRB, tuplelist
 import json
 import math
+
+from NetworkOptimization.ModelBuilder import ModelBuilder, GetLinkNames, SetStart
  
 class BFP_JRD_Model(object):
     """ Class object for buffered failure probability-based model.
@@ -41,12 +43,18 @@ class BFP_JRD_Model(object):
         Constructor
         '''
                          
-    def LoadModel(self,Gamma,Nodes,Connections,Links,Capacity,Survivability,NumSamples):
+    def LoadModel(self,Gamma,Nodes,Connections,Links,Capacity,Survivability,NumSamples,Aggregate=False,Reduce=False):
         """ Load model.
     
+        The model is built in blocks through ModelBuilder, and the build statistics are kept in BuildStatistics.
+    
         Parameters
         ----------
         Gamma : importance sampling vector
+        Aggregate : True to collapse identical scenarios into weighted ones (the z variables are then
+            indexed by distinct scenario, and the compression ratio is kept in BuildStatistics)
+        Reduce : True to replace the zero-failure scenarios by z0 >= -capacity and to merge the single-failure
+            scenarios of each failed link (same optimal solution, see ReduceScenarioRows)
         
         """         
         self.Connections = tuplelist(Connections)
@@ -58,30 +66,20 @@ class BFP_JRD_Model(object):
         # Create optimization model
         self.model = Model('BFP-JRD Model')
      
+        Builder = ModelBuilder(self.model)
+        Failed, Weights = Builder.GetScenarioRows(Capacity, NumSamples, self.Connections, Gamma, Aggregate, Survivability if Reduce else None)
+     
         # Create variables
-        for i,j in self.Links:
-            self.WavelengthCapacity[i,j] = self.model.addVar(vtype=GRB.CONTINUOUS,lb=0, name='Wavelength_Capacity[%s,%s]' % (i, j))
-        self.model.update()
-          
-        for i,j in self.Links:
-            for s,d in self.Connections:
-                self.bAssignedRoute[i,j,s,d] = self.model.addVar(vtype=GRB.BINARY,name='Route[%s,%s,%s,%s]' % (i, j, s, d))
-        self.model.update()
-         
-        for i,j in self.Links:
-            for k in range(NumSamples):
-                self.z[k,i,j] = self.model.addVar(lb=0,name='z[%s][%s][%s]' % (k,i,j))
-        self.model.update()
-        
-        for i,j in self.Links: 
-            self.z0[i,j] = self.model.addVar(lb=-GRB.INFINITY,name='z0[%s][%s]' %(i,j))
-        self.model.update()
-         
-        self.model.modelSense = GRB.MINIMIZE
+        CapStart = Builder.AddVars(GetLinkNames('Wavelength_Capacity', self.Links), obj=1.0)
+        RouteStart, RouteKeys = Builder.AddRouteVars('Route', self.Links, self.Connections)
+        ZStart, Z0Start, ZKeys = Builder.AddScenarioVars(self.Links, len(Failed))
         
-        self.model.setObjective(quicksum(self.WavelengthCapacity[i,j] for i,j in self.Links))
-        self.model.update()
+        self.WavelengthCapacity = Builder.GetVarDict(self.Links, CapStart)
+        self.bAssignedRoute = Builder.GetVarDict(RouteKeys, RouteStart)
+        self.z = Builder.GetVarDict(ZKeys, ZStart)
+        self.z0 = Builder.GetVarDict(self.Links, Z0Start)
          
+        self.model.modelSense = GRB.MINIMIZE
             
         #------------------------------------------------------------------------#
         #                    Constraints definition                              #
@@ -90,40 +88,32 @@ class BFP_JRD_Model(object):
         #------------------------------------------------------------------------#
           
         # Buffer probability I
-        for i,j in self.Links:
-            self.model.addConstr(self.z0[i,j] + 1/(NumSamples*Survivability)*quicksum(self.z[k,i,j] for (k) in range(NumSamples)) <= 0,'[CONST]Buffer_Prob_I[%s][%s]'%(i,j))
-        self.model.update()
+        Builder.AddBufferProbConstrs(self.Links, len(Failed), ZStart, Z0Start, Survivability, Scale=NumSamples)
          
-        # Link capacity constraints
-        for i,j in self.Links:
-            for k in range(NumSamples):
-                if Gamma == None:
-                    self.model.addConstr((quicksum(self.bAssignedRoute[i,j,s,d]*Capacity[k,s,d] for s,d in self.Connections) - self.WavelengthCapacity[i,j] - self.z0[i,j]) <= self.z[k,i,j],'[CONST]Buffer_Prob_II[%s][%s][%s]' % (k,i,j))
-                else:    
-                    self.model.addConstr((quicksum(self.bAssignedRoute[i,j,s,d]*Capacity[k,s,d] for s,d in self.Connections) - self.WavelengthCapacity[i,j] - self.z0[i,j])*Gamma[k] <= self.z[k,i,j],'[CONST]Buffer_Prob_II[%s][%s][%s]' % (k,i,j))
-        self.model.update()
-        
-        # Variable bound constraints
-        for i,j in self.Links:
-            for k in range(NumSamples):
-                self.model.addConstr(self.z[k,i,j] >= 0,'[CONST]Buffer_Prob_III[%s][%s][%s]' % (k,i,j))
-        self.model.update()
-         
-        for i in Nodes:
-            for s,d in self.Connections:
-                # Flow conservation constraints
-                if i == s:
-                    self.model.addConstr(quicksum(self.bAssignedRoute[i,j,s,d] for i,j in self.Links.select(i,'*')) - 
-                                           quicksum(self.bAssignedRoute[j,i,s,d] for j,i in self.Links.select('*',i)) == 1,'Flow1[%s,%s,%s]' % (i,s,d))
-                # Flow conservation constraints
-                elif i == d:
-                    self.model.addConstr(quicksum(self.bAssignedRoute[i,j,s,d] for i,j in self.Links.select(i,'*')) - 
-                                           quicksum(self.bAssignedRoute[j,i,s,d] for j,i in self.Links.select('*',i)) == -1,'Flow2[%s,%s,%s]' % (i,s,d))
-                # Flow conservation constraints
-                else:    
-                    self.model.addConstr(quicksum(self.bAssignedRoute[i,j,s,d] for i,j in self.Links.select(i,'*')) - 
-                                           quicksum(self.bAssignedRoute[j,i,s,d] for j,i in self.Links.select('*',i)) == 0,'Flow3[%s,%s,%s]' % (i,s,d))
-        self.model.update()
+        # Link capacity constraints (z[k,i,j] >= 0 is the lower bound of z)
+        Builder.AddScenarioConstrs(self.Links, ZKeys, ZStart, Z0Start, Weights, Failed, RouteStart, CapStart)
+        Builder.AddZeroLoadConstrs(self.Links, Z0Start, CapStart)
+        
+        # Flow conservation constraints
+        Builder.AddFlowConstrs(Nodes, self.Links, self.Connections, RouteStart)
+        
+        self.BuildStatistics = Builder.Update()
+    
+    def SetStart(self, WavelengthCapacity, Routes, Hint=False):
+        """ Start the next optimization from a previous solution.
+        
+        Parameters
+        ----------
+        WavelengthCapacity : capacity per link (e.g. from Optimize or LoadWDNNetwork)
+        Routes : assigned routes indexed by (i,j,s,d)
+        Hint : True to give the solution as variable hints instead of a MIP start
+        
+        Returns
+        -------
+        Number of variables set.
+        
+        """
+        return SetStart(self.WavelengthCapacity, WavelengthCapacity, Hint) + SetStart(self.bAssignedRoute, Routes, Hint)
                  
          
     def Optimize(self, MipGap=None, TimeLimit = None, LogLevel = None):
@@ -0,0 +1,411 @@
+'''
+Created on Oct 18, 2026
+
+@author: Edielson
+'''
+import time
+import numpy as np
+import scipy.sparse as sp
+from gurobipy import GRB, MVar
+
+from NetworkOptimization.ScenarioSet import GetCapacityMatrix, AggregateScenarios
+from NetworkOptimization.QualityAssessment import GetWeights
+
+
+def GetLinkNames(Prefix, Links, Format='[%s,%s]'):
+    """Return the names Prefix[i,j] of a set of links."""
+    return [Prefix + Format % (i,j) for i,j in Links]
+
+def GetIncidenceMatrix(Nodes, Links):
+    """Return the (NumNodes, NumLinks) node-link incidence matrix (1 if the link leaves the node and -1 if it enters)."""
+    NodeIndex = dict((n,index) for index,n in enumerate(Nodes))
+    Rows = [NodeIndex[i] for i,j in Links] + [NodeIndex[j] for i,j in Links]
+    Cols = list(range(len(Links)))*2
+    Values = [1]*len(Links) + [-1]*len(Links)
+    return sp.csr_matrix((Values, (Rows, Cols)), shape=(len(Nodes), len(Links)))
+
+def SetStart(Vars, Values, Hint=False):
+    """Set the MIP start (or the hint) of the variables of a dictionary from a dictionary of values.
+
+    Parameters
+    ----------
+    Vars: Dictionary of variables (e.g. the routing variables of a model).
+    Values: Dictionary of values with the same keys (e.g. a previous solution); keys without a variable are ignored.
+    Hint: True to set the variable hints (VarHintVal) instead of the MIP start (Start).
+
+    Returns
+    -------
+    Count: Number of variables set.
+
+    """
+    Attr = 'VarHintVal' if Hint else 'Start'
+    Count = 0
+    for key in Values:
+        if key in Vars:
+            setattr(Vars[key], Attr, Values[key])
+            Count = Count+1
+    return Count
+
+def ReduceScenarioRows(Failed, Weights=None, Survivability=None, NumSamples=None):
+    """Remove the zero-failure scenarios and merge the single-failure scenarios of each failed link.
+
+    A scenario without failures has no routed load, so its rows only say z[k,i,j] >= -(capacity[i,j]+z0[i,j])*Gamma[k].
+    When the total weight of the scenarios is at least K*epsilon, the left-hand side of Buffer_Prob_I does not
+    increase with z0[i,j] below -capacity[i,j] (all the scenarios are above it), so z0[i,j] >= -capacity[i,j] does
+    not change the optimal solution and these rows are always zero: they are replaced by one row per backup link
+    (see AddZeroLoadConstrs). A scenario with a single failure is known from the failed link and capacity, so the
+    single-failure scenarios are merged into one row per failed link, weighted by the sum of their weights.
+
+    Parameters
+    ----------
+    Failed: (NumRows, NumLinks) matrix of failed capacity.
+    Weights: Weight of each row (None for 1).
+    Survivability: Survivability factor (epsilon), None to keep the zero-failure scenarios.
+    NumSamples: Number of samples (K) represented by the rows, None for the number of rows.
+
+    Returns
+    -------
+    Failed: Matrix of failed capacity with the multiple-failure rows followed by one row per failed link.
+    Weights: Weight of each row.
+    NumZero: Number of zero-failure rows removed.
+    NumSingle: Number of single-failure rows merged.
+
+    """
+    Weights = np.ones(len(Failed)) if Weights is None else np.asarray(Weights, dtype=float)
+    NumSamples = len(Failed) if NumSamples is None else NumSamples
+    NumFailed = np.count_nonzero(Failed, axis=1)
+    Zero = NumFailed == 0
+    if Survivability is None or Weights.sum() < NumSamples*Survivability:
+        Zero = np.zeros(len(Failed), dtype=bool)
+    Single = NumFailed == 1
+
+    Column = np.argmax(Failed[Single] != 0, axis=1)
+    Keys, Inverse = np.unique(np.column_stack([Column, Failed[Single, Column]]), axis=0, return_inverse=True)
+    Inverse = Inverse.ravel()
+    Merged = np.zeros((len(Keys), Failed.shape[1]), dtype=Failed.dtype)
+    Merged[np.arange(len(Keys)), Keys[:,0].astype(np.intp)] = Keys[:,1]
+
+    Multiple = ~(Zero | Single)
+    Failed = np.vstack([Failed[Multiple], Merged])
+    Weights = np.concatenate([Weights[Multiple], np.bincount(Inverse, weights=Weights[Single], minlength=len(Keys))])
+    return Failed, Weights, int(Zero.sum()), int(Single.sum())
+
+def GetScenarioRows(Scenarios, NumSamples, Links, Gamma=None, Aggregate=False, Survivability=None):
+    """Return the failed capacity matrix and the weights of the scenario rows of a model.
+
+    With Aggregate, identical scenarios are collapsed into one row weighted by the sum of their
+    importance sampling weights (see AggregateScenarios). With Survivability, the zero-failure
+    scenarios are removed and the single-failure scenarios merged (see ReduceScenarioRows).
+
+    Parameters
+    ----------
+    Scenarios: Set of scenarios (ScenarioSet or dictionary indexed by (k,s,d)).
+    NumSamples: Number of scenarios (K).
+    Links: Links defining the columns of the failed capacity matrix.
+    Gamma: Importance sampling vector (None if not used).
+    Aggregate: True to collapse the identical scenarios.
+    Survivability: Survivability factor (epsilon) to reduce the zero- and single-failure scenarios, None to keep them.
+
+    Returns
+    -------
+    Failed: (NumRows, NumLinks) matrix of failed capacity.
+    Weights: Weight of each row (None for 1).
+    Statistics: Number of samples and scenario rows, compression ratio between them and number of
+        zero- and single-failure scenarios.
+
+    """
+    Weights = GetWeights(Gamma, NumSamples)
+    if Aggregate:
+        Failed, Weights, Inverse = AggregateScenarios(Scenarios, NumSamples, Links, Weights)
+    else:
+        Failed = GetCapacityMatrix(Scenarios, NumSamples, Links)
+    NumZero = NumSingle = 0
+    if Survivability is not None:
+        Failed, Weights, NumZero, NumSingle = ReduceScenarioRows(Failed, Weights, Survivability, NumSamples)
+    Statistics = {"zero_failure": NumZero,
+                  "single_failure": NumSingle,
+                  "num_samples": NumSamples,
+                  "num_scenarios": len(Failed),
+                  "compression_ratio": 1.0*NumSamples/len(Failed) if len(Failed) else 1.0}
+    return Failed, Weights, Statistics
+
+class ModelBuilder(object):
+    """ Bulk builder of Gurobi models through the matrix interface.
+
+    Variables are added in blocks (one MVar call per block) and constraints as sparse
+    coefficient matrices over all the variables of the model, instead of one addVar or
+    addConstr call per element. The model is updated once, by Update, which also returns
+    the build statistics (size of each block, number of nonzeros and build time).
+
+    The Add*Vars and Add*Constrs methods build the blocks shared by the buffered failure
+    probability models: scenario variables z[k,i,j] and z0[i,j], the Buffer_Prob_I and
+    Buffer_Prob_II constraints and the flow conservation of the routing variables. No
+    z[k,i,j] >= 0 rows are added, since z is created with a zero lower bound.
+
+    Parameters
+    ----------
+    Model: Gurobi model to be built.
+
+    """
+
+    def __init__(self, Model):
+        '''
+        Constructor
+        '''
+        self.Model = Model
+        self.Blocks = []
+        self.NumVars = 0
+        self.Vars = None
+        self.MVar = None
+        self.Statistics = {"vars": {}, "constrs": {}, "nonzeros": 0}
+        self.StartTime = time.time()
+
+    def AddVars(self, Names, lb=0.0, ub=GRB.INFINITY, vtype=GRB.CONTINUOUS, obj=0.0, Block=None):
+        """Add a block of variables and return the index of its first variable.
+
+        Parameters
+        ----------
+        Names: Names of the variables (one per variable, in order).
+        lb, ub, vtype, obj: Bounds, type and objective coefficient (a value for all variables or one per variable).
+        Block: Name of the block in the statistics (None for the name of the first variable without indexes).
+
+        """
+        Size = len(Names)
+        Start = self.NumVars
+        self.Blocks.append(self.Model.addMVar(Size, lb=np.broadcast_to(lb, (Size,)), ub=np.broadcast_to(ub, (Size,)),
+                                              obj=np.broadcast_to(obj, (Size,)), vtype=np.broadcast_to(vtype, (Size,)),
+                                              name=np.array(Names, dtype=object)))
+        self.NumVars = self.NumVars + Size
+        self.Vars = None
+        self.MVar = None
+        self.__Count("vars", Block, Names)
+        return Start
+
+    def GetVars(self, Start=0, Stop=None):
+        """Return the list of Var objects from index Start to Stop (None for the last one)."""
+        if self.Vars is None:
+            self.Vars = [v for Block in self.Blocks for v in Block.tolist()]
+        if Stop is None:
+            Stop = self.NumVars
+        return self.Vars[Start:Stop]
+
+    def GetVarDict(self, Keys, Start):
+        """Return a dictionary from each key to the variables starting at index Start (in the order of Keys)."""
+        return dict(zip(Keys, self.GetVars(Start, Start+len(Keys))))
+
+    def GetMVar(self):
+        """Return all the variables of the model as a single MVar."""
+        if self.MVar is None:
+            self.MVar = self.Blocks[0] if len(self.Blocks) == 1 else MVar.fromlist(self.GetVars())
+        return self.MVar
+
+    def AddConstrs(self, Rows, Cols, Values, Sense, Rhs, Names, Block=None):
+        """Add a block of linear constraints given in coordinate form and return their list.
+
+        Parameters
+        ----------
+        Rows, Cols, Values: Row (constraint in the block), column (variable index) and coefficient of each nonzero.
+        Sense: Constraint sense (GRB.LESS_EQUAL, GRB.EQUAL or GRB.GREATER_EQUAL).
+        Rhs: Right-hand side (a value for all constraints or one per constraint).
+        Names: Names of the constraints (one per constraint, in order).
+        Block: Name of the block in the statistics (None for the name of the first constraint without indexes).
+
+        """
+        Size = len(Names)
+        A = sp.csr_matrix((np.asarray(Values, dtype=float), (np.asarray(Rows), np.asarray(Cols))), shape=(Size, self.NumVars))
+        A.eliminate_zeros()
+        Constrs = self.Model.addMConstr(A, self.GetMVar(), Sense, np.broadcast_to(np.asarray(Rhs, dtype=float), (Size,)),
+                                        name=np.array(Names, dtype=object))
+        self.__Count("constrs", Block, Names)
+        self.Statistics["nonzeros"] = self.Statistics["nonzeros"] + A.nnz
+        return Constrs.tolist()
+
+    def __Count(self, Kind, Block, Names):
+        """Add the size of a block to the statistics."""
+        if Block == None:
+            Block = Names[0].replace('[CONST]', '').split('[')[0] if len(Names) else ''
+        self.Statistics[Kind][Block] = self.Statistics[Kind].get(Block, 0) + len(Names)
+
+    def Update(self):
+        """Update the model (once, after all the blocks were added) and return the build statistics.
+
+        Returns
+        -------
+        Statistics: Dictionary with the number of variables and constraints per block ("vars" and "constrs"),
+            the totals ("num_vars", "num_constrs" and "nonzeros") and the build time in seconds ("build_time").
+
+        """
+        self.Model.update()
+        self.Statistics["num_vars"] = self.NumVars
+        self.Statistics["num_constrs"] = sum(self.Statistics["constrs"].values())
+        self.Statistics["build_time"] = time.time()-self.StartTime
+        return self.Statistics
+
+    def GetScenarioRows(self, Scenarios, NumSamples, Links, Gamma=None, Aggregate=False, Survivability=None):
+        """Return the failed capacity matrix and the weights of the scenario rows of the model (see GetScenarioRows),
+        adding the number of samples and scenario rows, the compression ratio and the number of zero- and
+        single-failure scenarios to the statistics."""
+        Failed, Weights, Statistics = GetScenarioRows(Scenarios, NumSamples, Links, Gamma, Aggregate, Survivability)
+        self.Statistics.update(Statistics)
+        return Failed, Weights
+
+    def AddRouteVars(self, Prefix, Links, Connections):
+        """Add the binary routing variables Prefix[i,j,s,d] for (i,j) in Links and (s,d) in Connections.
+
+        Returns
+        -------
+        Start: Index of the first variable, Start+len(Connections)*b+c for the b-th link and the c-th connection.
+        Keys: The (i,j,s,d) keys in variable order.
+
+        """
+        Keys = [(i,j,s,d) for i,j in Links for s,d in Connections]
+        Start = self.AddVars([Prefix + '[%s,%s,%s,%s]' % key for key in Keys], vtype=GRB.BINARY, Block=Prefix)
+        return Start, Keys
+
+    def AddScenarioVars(self, BackupLinks, NumSamples):
+        """Add the variables z[k,i,j] (lb=0) and z0[i,j] (free) of the buffered failure probability.
+
+        Returns
+        -------
+        ZStart: Index of the first z variable, ZStart+NumSamples*b+k for the b-th backup link and scenario k.
+        Z0Start: Index of the first z0 variable, Z0Start+b for the b-th backup link.
+        ZKeys: The (k,i,j) keys of z in variable order.
+
+        """
+        ZKeys = [(k,i,j) for i,j in BackupLinks for k in range(NumSamples)]
+        ZStart = self.AddVars(['z[%s][%s][%s]' % key for key in ZKeys], Block='z')
+        Z0Start = self.AddVars(GetLinkNames('z0', BackupLinks, '[%s][%s]'), lb=-GRB.INFINITY, Block='z0')
+        return ZStart, Z0Start, ZKeys
+
+    def AddBufferProbConstrs(self, BackupLinks, NumSamples, ZStart, Z0Start, Survivability, Bound=None, ZWeights=None, Scale=None):
+        """Add the constraints Buffer_Prob_I: z0[i,j] + 1/(K*epsilon)*sum_k w[k]*z[k,i,j] <= bound[i,j].
+
+        Parameters
+        ----------
+        BackupLinks: Set of backup links (one constraint each).
+        NumSamples: Number of scenario rows (z variables per backup link).
+        ZStart, Z0Start: Indexes of the z and z0 variables (see AddScenarioVars).
+        Survivability: Survivability factor (epsilon).
+        Bound: Index of the variable bounding each constraint (one index for all or one per backup link), None for 0.
+        ZWeights: Weight of z[k,i,j] on each scenario (w[k]), None for 1.
+        Scale: Number of samples (K) when the rows are aggregated scenarios, None for NumSamples.
+
+        """
+        NumLinks = len(BackupLinks)
+        Links = np.arange(NumLinks)
+        Scale = NumSamples if Scale is None else Scale
+        ZWeights = np.ones(NumSamples) if ZWeights is None else np.asarray(ZWeights, dtype=float)
+        Rows = [Links, np.repeat(Links, NumSamples)]
+        Cols = [Z0Start+Links, ZStart+np.arange(NumLinks*NumSamples)]
+        Values = [np.ones(NumLinks), np.tile(ZWeights/(Scale*Survivability), NumLinks)]
+        if Bound is not None:
+            Rows.append(Links)
+            Cols.append(np.broadcast_to(Bound, (NumLinks,)))
+            Values.append(-np.ones(NumLinks))
+        return self.AddConstrs(np.concatenate(Rows), np.concatenate(Cols), np.concatenate(Values), GRB.LESS_EQUAL, 0,
+                               GetLinkNames('[CONST]Buffer_Prob_I', BackupLinks, '[%s][%s]'))
+
+    def AddScenarioConstrs(self, BackupLinks, ZKeys, ZStart, Z0Start, Weights=None, Failed=None, RouteStart=None, CapStart=None, Constant=None):
+        """Add the constraints Buffer_Prob_II of each backup link (i,j) and scenario k:
+        (sum_sd route[i,j,s,d]*Failed[k,s,d] - capacity[i,j] - constant[i,j] - z0[i,j])*Gamma[k] <= z[k,i,j].
+
+        Parameters
+        ----------
+        BackupLinks: Set of backup links.
+        ZKeys, ZStart, Z0Start: Keys and indexes of the z and z0 variables (see AddScenarioVars).
+        Weights: Importance sampling weight of each scenario (Gamma[k]), None for 1.
+        Failed: (K, NumConnections) matrix of failed capacity routed by the routing variables (None without routing variables).
+        RouteStart: Index of the routing variables (see AddRouteVars).
+        CapStart: Index of the first capacity variable, one per backup link (None if the capacity is not a variable).
+        Constant: Constant per backup link, or (NumBackupLinks, K) matrix, moved to the right-hand side (None for 0).
+
+        """
+        NumLinks = len(BackupLinks)
+        NumSamples = len(ZKeys)//NumLinks if NumLinks else 0
+        Links = np.arange(NumLinks)
+        Weights = np.ones(NumSamples) if Weights is None else np.asarray(Weights, dtype=float)
+        Row = np.arange(NumLinks*NumSamples).reshape(NumLinks, NumSamples)
+
+        Rows = [Row.ravel(), Row.ravel()]
+        Cols = [np.repeat(Z0Start+Links, NumSamples), ZStart+Row.ravel()]
+        Values = [np.tile(-Weights, NumLinks), -np.ones(NumLinks*NumSamples)]
+        if Failed is not None:
+            FailedScenarios, FailedConnections = np.nonzero(Failed)
+            Rows.append(Row[:,FailedScenarios].ravel())
+            Cols.append((RouteStart+Failed.shape[1]*Links.reshape(-1,1)+FailedConnections).ravel())
+            Values.append(np.tile(Failed[FailedScenarios,FailedConnections]*Weights[FailedScenarios], NumLinks))
+        if CapStart is not None:
+            Rows.append(Row.ravel())
+            Cols.append(np.repeat(CapStart+Links, NumSamples))
+            Values.append(np.tile(-Weights, NumLinks))
+        Rhs = 0
+        if Constant is not None:
+            Constant = np.asarray(Constant, dtype=float)
+            if Constant.ndim == 1:
+                Constant = Constant.reshape(-1,1)
+            Rhs = (np.broadcast_to(Constant, (NumLinks, NumSamples))*Weights).ravel()
+        return self.AddConstrs(np.concatenate(Rows), np.concatenate(Cols), np.concatenate(Values), GRB.LESS_EQUAL, Rhs,
+                               ['[CONST]Buffer_Prob_II[%s][%s][%s]' % key for key in ZKeys])
+
+    def AddZeroLoadConstrs(self, BackupLinks, Z0Start, CapStart=None, Constant=None):
+        """Add the constraints Zero_Load: -z0[i,j] - capacity[i,j] - constant[i,j] <= 0 of each backup link.
+
+        They replace the rows of the zero-failure scenarios removed by GetScenarioRows, and nothing is added
+        if no scenario was removed.
+
+        Parameters
+        ----------
+        BackupLinks: Set of backup links.
+        Z0Start: Index of the z0 variables (see AddScenarioVars).
+        CapStart: Index of the first capacity variable, one per backup link (None if the capacity is not a variable).
+        Constant: Constant per backup link, moved to the right-hand side (None for 0).
+
+        """
+        if not self.Statistics.get("zero_failure"):
+            return []
+        NumLinks = len(BackupLinks)
+        Links = np.arange(NumLinks)
+        Rows = [Links]
+        Cols = [Z0Start+Links]
+        Values = [-np.ones(NumLinks)]
+        if CapStart is not None:
+            Rows.append(Links)
+            Cols.append(CapStart+Links)
+            Values.append(-np.ones(NumLinks))
+        Rhs = 0 if Constant is None else np.asarray(Constant, dtype=float)
+        return self.AddConstrs(np.concatenate(Rows), np.concatenate(Cols), np.concatenate(Values), GRB.LESS_EQUAL, Rhs,
+                               GetLinkNames('[CONST]Zero_Load', BackupLinks, '[%s][%s]'))
+
+    def AddFlowConstrs(self, Nodes, Links, Connections, RouteStart):
+        """Add the flow conservation constraints of the routing variables of each connection (s,d).
+
+        The flow leaving node i minus the flow entering it is 1 at s (Flow1), -1 at d (Flow2) and 0 elsewhere (Flow3).
+
+        Parameters
+        ----------
+        Nodes: Set of nodes.
+        Links: Set of links of the routing variables.
+        Connections: Set of connections (s,d).
+        RouteStart: Index of the routing variables (see AddRouteVars).
+
+        """
+        NumConnections = len(Connections)
+        Columns = np.arange(NumConnections)
+        Incidence = GetIncidenceMatrix(Nodes, Links).tocoo()
+        Rows = (NumConnections*Incidence.row.reshape(-1,1)+Columns).ravel()
+        Cols = (RouteStart+NumConnections*Incidence.col.reshape(-1,1)+Columns).ravel()
+        Values = np.repeat(Incidence.data, NumConnections)
+        Rhs=[]
+        Names=[]
+        for i in Nodes:
+            for s,d in Connections:
+                if i == s:
+                    Rhs.append(1)
+                    Names.append('Flow1[%s,%s,%s]' % (i,s,d))
+                elif i == d:
+                    Rhs.append(-1)
+                    Names.append('Flow2[%s,%s,%s]' % (i,s,d))
+                else:
+                    Rhs.append(0)
+                    Names.append('Flow3[%s,%s,%s]' % (i,s,d))
+        return self.AddConstrs(Rows, Cols, Values, GRB.EQUAL, Rhs, Names, 'Flow')
@@ -0,0 +1,301 @@
+'''
+Created on Oct 18, 2026
+
+@author: Edielson
+'''
+import os
+import tempfile
+import numpy as np
+import multiprocessing
+from multiprocessing import Pool
+
+from NetworkOptimization.ScenarioSet import ScenarioSet
+from NetworkOptimization.RandomStreams import GetMasterSeed, GetStreamFailures, GetChunks, GetImportanceSamplingWeights
+from NetworkOptimization.QualityAssessment import BFPEvaluator, RunningStats, GetRoutingMatrix, GetWeights
+
+# State of each worker process (set once by InitWorker)
+Worker = {}
+
+def CreateSharedArray(Shape, Dtype):
+    """Create an array in a memory-mapped file shared with the worker processes.
+
+    The file is created in /dev/shm when available, so the array lives in shared memory.
+
+    Returns
+    -------
+    Spec: (file name, shape, dtype) used by the workers to attach the array.
+    Array: Memory-mapped array.
+
+    """
+    Directory = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    Handle, FileName = tempfile.mkstemp(prefix='rno-', suffix='.dat', dir=Directory)
+    os.close(Handle)
+    Array = np.memmap(FileName, dtype=Dtype, mode='w+', shape=Shape)
+    return (FileName, tuple(Shape), np.dtype(Dtype).str), Array
+
+def AttachSharedArray(Spec, Mode='r'):
+    """Attach an array created by CreateSharedArray."""
+    FileName, Shape, Dtype = Spec
+    return np.memmap(FileName, dtype=Dtype, mode=Mode, shape=Shape)
+
+def RemoveSharedArray(Spec):
+    """Remove the file of an array created by CreateSharedArray (mapped arrays stay valid)."""
+    if Spec != None and os.path.exists(Spec[0]):
+        os.remove(Spec[0])
+
+def InitWorker(Links, CapPerLink):
+    """Receive the topology once, when the worker process starts."""
+    Worker['Links'] = Links
+    Worker['CapPerLink'] = np.asarray(CapPerLink)
+    Worker['Design'] = None
+
+def GetWorkerEvaluator(DesignSpec, BackupLinks):
+    """Return the evaluator of the backup design in shared memory, attaching it on first use."""
+    if Worker['Design'] == None or Worker['Design'][0] != DesignSpec:
+        Design = AttachSharedArray(DesignSpec)
+        Evaluator = BFPEvaluator(Worker['Links'], BackupLinks, np.array(Design[:,-1]), np.array(Design[:,:-1]))
+        Worker['Design'] = (DesignSpec, Evaluator)
+    return Worker['Design'][1]
+
+def ThreadGenerate(MasterSeed, FailureProb, Start, Stop, StreamSize, ScenarioSpec):
+    """Worker job: generate scenarios Start to Stop straight into the shared failure matrix."""
+    Failures = AttachSharedArray(ScenarioSpec, 'r+')
+    Failures[Start:Stop] = GetStreamFailures(MasterSeed, FailureProb, Start, Stop, len(Worker['Links']), StreamSize)
+    Failures.flush()
+    del Failures
+
+def ThreadAssess(MasterSeed, FailureProb, FailureProbIS, Start, Stop, StreamSize, DesignSpec, BackupLinks):
+    """Worker job: generate scenarios Start to Stop and evaluate them against the loaded design.
+
+    Returns
+    -------
+    Count, Mean, M2: Statistics of the (weighted) overload indicators per backup link (see RunningStats).
+
+    """
+    Links = Worker['Links']
+    SamplingProb = FailureProb if FailureProbIS is None else FailureProbIS
+    Scenarios = ScenarioSet(GetStreamFailures(MasterSeed, SamplingProb, Start, Stop, len(Links), StreamSize), Links, Worker['CapPerLink'])
+    Gamma = None
+    if FailureProbIS is not None:
+        Gamma = GetImportanceSamplingWeights(Links, Scenarios, Scenarios.NumScenarios, FailureProb, FailureProbIS)
+
+    return GetIndicatorStatistics(GetWorkerEvaluator(DesignSpec, BackupLinks), Scenarios, Gamma)
+
+def ThreadAssessShared(ScenarioSpec, GammaSpec, Start, Stop, DesignSpec, BackupLinks):
+    """Worker job: evaluate scenarios Start to Stop of a shared scenario set against the loaded design.
+
+    Returns
+    -------
+    Count, Mean, M2: Statistics of the (weighted) overload indicators per backup link (see RunningStats).
+
+    """
+    Failures = AttachSharedArray(ScenarioSpec)
+    Scenarios = ScenarioSet(Failures[Start:Stop], Worker['Links'], Worker['CapPerLink'])
+    Gamma = None
+    if GammaSpec != None:
+        Gamma = AttachSharedArray(GammaSpec)[Start:Stop]
+
+    return GetIndicatorStatistics(GetWorkerEvaluator(DesignSpec, BackupLinks), Scenarios, Gamma)
+
+def GetIndicatorStatistics(Evaluator, Scenarios, Gamma):
+    """Return the count, mean and sum of squared deviations of the overload indicators of a scenario set."""
+    Stats = RunningStats(len(Evaluator.BackupLinks))
+    Stats.Update(Evaluator.GetIndicators(Scenarios.GetCapacityMatrix(), Gamma))
+    return Stats.Count, Stats.Mean, Stats.M2
+
+class ParallelExecutor(object):
+    """ Pool of worker processes reused across scenario generation and assessment calls.
+
+    The pool is started once and each worker receives the topology once. The routing matrix of
+    the backup design being assessed is placed in shared memory by LoadDesign, so the jobs only
+    carry the scenario range and the seed. Generated scenarios are written by the workers straight
+    into a shared failure matrix owned by this process, by scenario-index range, so no scenario is
+    pickled. Use it as a context manager to shut the pool down.
+
+    Parameters
+    ----------
+    Links: Graph edges (links)
+    CapPerLink: Edge (link) capacity (weight)
+    NumProcesses: Number of worker processes (None for the number of available processors).
+    StreamSize: Number of scenarios per random stream (None for 4096, see ScenariosGenerator.GetBinomialRandStreams).
+
+    """
+
+    def __init__(self, Links, CapPerLink, NumProcesses=None, StreamSize=None):
+        '''
+        Constructor
+        '''
+        if NumProcesses == None:
+            NumProcesses = multiprocessing.cpu_count()
+        if StreamSize == None:
+            StreamSize = 4096
+        self.Links = [tuple(link) for link in Links]
+        self.CapPerLink = np.asarray(CapPerLink)
+        self.NumProcesses = NumProcesses
+        self.StreamSize = StreamSize
+        self.BackupLinks = []
+        self.DesignSpec = None
+        self.SharedSpecs = []
+        self.Pool = Pool(NumProcesses, initializer=InitWorker, initargs=(self.Links, self.CapPerLink))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, ExcType, ExcValue, Traceback):
+        self.Close()
+
+    def Close(self):
+        """Shut down the worker processes and release the shared memory."""
+        if self.Pool != None:
+            self.Pool.close()
+            self.Pool.join()
+            self.Pool = None
+        RemoveSharedArray(self.DesignSpec)
+        self.DesignSpec = None
+        for Spec in self.SharedSpecs:
+            RemoveSharedArray(Spec)
+        self.SharedSpecs = []
+
+    def ReleaseScenarios(self, Scenarios):
+        """Remove the shared file of a scenario set generated by this executor (the set stays valid)."""
+        Spec = getattr(Scenarios, 'SharedSpec', None)
+        if Spec in self.SharedSpecs:
+            RemoveSharedArray(Spec)
+            self.SharedSpecs.remove(Spec)
+        Scenarios.SharedSpec = None
+
+    def LoadDesign(self, BackupLinks, CapPerBackupLink, BackupRoutes):
+        """Place the routing matrix and capacities of a backup design in shared memory for the assessment jobs.
+
+        Parameters
+        ----------
+        BackupLinks: Set of backup edges (links).
+        CapPerBackupLink: Set of backup edge (link) capacity (weight)
+        BackupRoutes: Set of backup routes indexed by (s,d,i,j).
+
+        """
+        BackupLinks = [tuple(link) for link in BackupLinks]
+        Spec, Design = CreateSharedArray((len(BackupLinks), len(self.Links)+1), np.float64)
+        Design[:,:-1] = GetRoutingMatrix(self.Links, BackupLinks, BackupRoutes)
+        Design[:,-1] = [CapPerBackupLink[i,j] for i,j in BackupLinks]
+        Design.flush()
+        del Design
+
+        RemoveSharedArray(self.DesignSpec)
+        self.DesignSpec = Spec
+        self.BackupLinks = BackupLinks
+
+    def GetBinomialRand(self, MasterSeed, FailureProb, NumScenarios):
+        """Generate random failure scenarios (same result as ScenariosGenerator.GetBinomialRandStreams).
+
+        Parameters
+        ----------
+        MasterSeed : Master random seed (None for a random initialization).
+        FailureProb: Failure probability for each edge (link) in the graph.
+        NumScenarios : Number of scenarios to be generated.
+
+        Returns
+        -------
+        Scenarios: Group of scenarios with random failure following Binomial distribution.
+
+        """
+        if NumScenarios == 0:
+            return ScenarioSet(np.zeros((0,len(self.Links))), self.Links, self.CapPerLink)
+
+        MasterSeed = GetMasterSeed(MasterSeed)
+        Spec, Failures = CreateSharedArray((NumScenarios, len(self.Links)), np.uint8)
+        self.SharedSpecs.append(Spec)
+
+        Chunks = GetChunks(NumScenarios, self.NumProcesses, self.StreamSize)
+        multiple_results = [self.Pool.apply_async(ThreadGenerate, (MasterSeed, FailureProb, Start, Stop, self.StreamSize, Spec)) for Start,Stop in Chunks]
+        for res in multiple_results:
+            res.get()
+
+        Scenarios = ScenarioSet(Failures, self.Links, self.CapPerLink)
+        Scenarios.SharedSpec = Spec
+        return Scenarios
+
+    def GetBufferedFailureProb(self, MasterSeed, FailureProb, FailureProbIS, NumScenarios):
+        """Calculate the buffered failure probability of the loaded design (see LoadDesign).
+
+        Parameters
+        ----------
+        MasterSeed : Master random seed (None for a random initialization).
+        FailureProb: Failure probability for each edge (link) in the graph.
+        FailureProbIS: Importance sampling failure probability, or None if importance sampling is not used.
+        NumScenarios : Number of scenarios to be generated.
+
+        Returns
+        -------
+        P: Buffered failure probability.
+        Var: Variance of the buffered failure probability.
+
+        """
+        if self.DesignSpec == None:
+            raise RuntimeError('No backup design loaded (call LoadDesign first)')
+
+        MasterSeed = GetMasterSeed(MasterSeed)
+        Chunks = GetChunks(NumScenarios, 4*self.NumProcesses, self.StreamSize)
+        multiple_results = [self.Pool.apply_async(ThreadAssess, (MasterSeed, FailureProb, FailureProbIS, Start, Stop, self.StreamSize, self.DesignSpec, self.BackupLinks)) for Start,Stop in Chunks]
+
+        return self.__GetResults(multiple_results)
+
+    def GetBufferedFailureProbScenarios(self, Scenarios, ImportanceSampling=None):
+        """Calculate the buffered failure probability of the loaded design over a given scenario set.
+
+        The workers read the scenarios from shared memory by scenario-index range. Sets generated by
+        this executor are already shared; other sets are copied once to shared memory.
+
+        Parameters
+        ----------
+        Scenarios: Set of scenarios (ScenarioSet with the links of this executor).
+        ImportanceSampling: Importance sampling vector, or None if importance sampling is not used.
+
+        Returns
+        -------
+        P: Buffered failure probability.
+        Var: Variance of the buffered failure probability.
+
+        """
+        if self.DesignSpec == None:
+            raise RuntimeError('No backup design loaded (call LoadDesign first)')
+
+        Created = []
+        ScenarioSpec = getattr(Scenarios, 'SharedSpec', None)
+        if ScenarioSpec == None or ScenarioSpec not in self.SharedSpecs:
+            ScenarioSpec, Failures = CreateSharedArray((Scenarios.NumScenarios, len(self.Links)), np.uint8)
+            Failures[:] = Scenarios.Failures[:,Scenarios.GetLinkColumns(self.Links)]
+            Failures.flush()
+            del Failures
+            Created.append(ScenarioSpec)
+
+        GammaSpec = None
+        Gamma = GetWeights(ImportanceSampling, Scenarios.NumScenarios)
+        if Gamma is not None:
+            GammaSpec, SharedGamma = CreateSharedArray(Gamma.shape, np.float64)
+            SharedGamma[:] = Gamma
+            SharedGamma.flush()
+            del SharedGamma
+            Created.append(GammaSpec)
+
+        try:
+            Chunks = GetChunks(Scenarios.NumScenarios, 4*self.NumProcesses, self.StreamSize)
+            multiple_results = [self.Pool.apply_async(ThreadAssessShared, (ScenarioSpec, GammaSpec, Start, Stop, self.DesignSpec, self.BackupLinks)) for Start,Stop in Chunks]
+            return self.__GetResults(multiple_results)
+        finally:
+            for Spec in Created:
+                RemoveSharedArray(Spec)
+
+    def __GetResults(self, Results):
+        """Merge the statistics returned by the assessment jobs."""
+        Stats = RunningStats(len(self.BackupLinks))
+        for res in Results:
+            Stats.Merge(*res.get())
+
+        P={}
+        Var={}
+        Variance = Stats.GetVariance()
+        for b,(i,j) in enumerate(self.BackupLinks):
+            P[i,j]=float(Stats.Mean[b])
+            Var[i,j]=float(Variance[b])
+        return P,Var
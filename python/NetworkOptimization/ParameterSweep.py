@@ -0,0 +1,123 @@
+'''
+Created on Oct 18, 2026
+
+@author: Edielson
+'''
+import time
+
+from NetworkOptimization.BFPBackupModel import BFPBackupNetwork
+from NetworkOptimization.RandomStreams import GetMasterSeed, GetStreamScenarios
+
+
+class ParameterSweep(object):
+    """ Sweep of the buffered failure probability backup model along a path of parameters.
+
+    Each point of the path is a dictionary with any of "epsilon", "p", "p2" and "num_scenarios"
+    (the missing ones keep the values given to the constructor). The points are solved in order,
+    and each model starts from the solution of the previous point (as a MIP start or as hints),
+    so neighbouring points do not start from a cold root. The scenarios of every point are the
+    first num_scenarios scenarios of the random streams of the same master seed.
+
+    Parameters
+    ----------
+    Nodes: Set of nodes.
+    Links: Graph edges (links).
+    CapPerLink: Edge (link) capacity (weight).
+    FailureProb: Failure probability (p).
+    FailureProbIS: Failure probability of the importance sampling (p2, None to sample with p).
+    Survivability: Survivability factor (epsilon).
+    NumScenarios: Number of scenarios.
+    MasterSeed: Master random seed (None for a random initialization).
+    StreamSize: Number of scenarios per random stream (None for 4096).
+
+    """
+
+    def __init__(self, Nodes, Links, CapPerLink, FailureProb, FailureProbIS, Survivability, NumScenarios, MasterSeed=None, StreamSize=None):
+        '''
+        Constructor
+        '''
+        if StreamSize == None:
+            StreamSize = 4096
+        self.Nodes = Nodes
+        self.Links = [tuple(link) for link in Links]
+        self.CapPerLink = CapPerLink
+        self.Defaults = {"epsilon": Survivability, "p": FailureProb, "p2": FailureProbIS, "num_scenarios": NumScenarios}
+        self.MasterSeed = GetMasterSeed(MasterSeed)
+        self.StreamSize = StreamSize
+
+    def GetPoint(self, Point):
+        """Return the full set of parameters of a point of the path."""
+        Parameters = dict(self.Defaults)
+        Parameters.update(Point)
+        return Parameters
+
+    def GetScenarios(self, Parameters):
+        """Return the scenarios of a point and their importance sampling weights (see GetStreamScenarios)."""
+        return GetStreamScenarios(self.MasterSeed, Parameters["p"], Parameters["p2"], 0, Parameters["num_scenarios"], self.Links, self.CapPerLink, self.StreamSize)
+
+    def Solve(self, Point, Start=None, MipGap=None, TimeLimit=None, Hint=False):
+        """Solve the model at one point of the path.
+
+        Parameters
+        ----------
+        Point: Parameters of the point (see the class description).
+        Start: (BackupCapacity, BackupRoutes) of a previous solution, None for a cold start.
+        MipGap, TimeLimit: Parameters of the solve (see BFPBackupNetwork.Optimize).
+        Hint: True to give the previous solution as variable hints instead of a MIP start.
+
+        Returns
+        -------
+        Result: Dictionary with the parameters of the point, the solve status, objective, gap, build and solve times,
+            model size and the solution ("backup_capacity" and "backup_routes", the rounded incumbent of a solve
+            stopped by the limits, empty if no solution was found, see BFPBackupNetwork.GetSolution).
+
+        """
+        Parameters = self.GetPoint(Point)
+        Scenarios, Gamma = self.GetScenarios(Parameters)
+        BackupNet = BFPBackupNetwork()
+        BackupNet.LoadModel(Gamma, self.Nodes, self.Links, Scenarios, Parameters["epsilon"], Parameters["num_scenarios"])
+        if Start is not None:
+            BackupNet.SetStart(Start[0], Start[1], Hint)
+
+        SolveStart = time.time()
+        BackupCapacity, BackupRoutes, BackupLinks = BackupNet.Optimize(MipGap, TimeLimit)
+        SolveTime = time.time()-SolveStart
+        model = BackupNet.model
+
+        Result = dict(Parameters)
+        Result.update({"status": model.Status,
+                       "objective": model.ObjVal if model.SolCount > 0 else None,
+                       "mip_gap": model.MIPGap if model.SolCount > 0 else None,
+                       "build_time": BackupNet.BuildStatistics["build_time"],
+                       "solve_time": SolveTime,
+                       "num_vars": BackupNet.BuildStatistics["num_vars"],
+                       "num_constrs": BackupNet.BuildStatistics["num_constrs"],
+                       "warm_start": Start is not None,
+                       "backup_capacity": dict(BackupCapacity),
+                       "backup_routes": dict(BackupRoutes)})
+        return Result
+
+    def Run(self, Points, MipGap=None, TimeLimit=None, WarmStart=True, Hint=False, Start=None):
+        """Solve the points in order, each one starting from the solution of the previous one.
+
+        Parameters
+        ----------
+        Points: List of points (see the class description).
+        MipGap, TimeLimit: Parameters of each solve (see BFPBackupNetwork.Optimize).
+        WarmStart: False to solve every point from a cold start.
+        Hint: True to give the previous solution as variable hints instead of a MIP start.
+        Start: (BackupCapacity, BackupRoutes) for the first point (e.g. from LoadBackupNetwork), None for a cold start.
+
+        Returns
+        -------
+        Results: List with the result of each point (see Solve).
+
+        """
+        Results = []
+        for Point in Points:
+            Result = self.Solve(Point, Start if WarmStart else None, MipGap, TimeLimit, Hint)
+            Results.append(Result)
+            if len(Result["backup_routes"]) > 0:
+                Start = (Result["backup_capacity"], Result["backup_routes"])
+            print('epsilon=%g, p=%g, %d scenarios: objective %s in %g s' %(Result["epsilon"], Result["p"], Result["num_scenarios"], Result["objective"], Result["solve_time"]))
+        return Results
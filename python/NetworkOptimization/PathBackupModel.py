@@ -3,18 +3,68 @@ Created on Nov 23, 2015
 
 @author: Edielson
 '''
-from gurobipy import Model, GRB, quicksum
+from gurobipy import Model, GRB, quicksum, Column
+import numpy as np
+import networkx as nx
+import scipy.sparse as sp
+
+from NetworkOptimization.ModelBuilder import ModelBuilder, GetLinkNames
+from NetworkOptimization.PathIndex import PathIndex
+
+def GetPathCatalog(links, paths, Psd=None, Pij=None):
+    """Return the (s,d) link of each path and the sparse link x path incidence matrix.
+    
+    Parameters
+    ----------
+    links: set of links
+    paths: path catalog (PathIndex) or set of paths in the graph
+    Psd: set of backup paths for link (s,d) (not used with a PathIndex).
+    Pij: set of (s,d) paths that use link (i,j) (not used with a PathIndex).
+    
+    Returns
+    -------
+    PathPair: index in links of the (s,d) link of each path (-1 for paths of no link).
+    Incidence: (NumLinks, NumPaths) matrix, 1 if the path uses the link.
+    
+    """
+    links = [tuple(link) for link in links]
+    if isinstance(paths, PathIndex):
+        Order = np.array([paths.LinkIds[link] for link in links], dtype=np.int64)
+        Position = np.empty(len(paths.Links), dtype=np.int64)
+        Position[Order] = np.arange(len(links))
+        return Position[paths.PathPair], paths.GetIncidenceMatrix()[Order]
+    
+    # Path ids are looked up once per path of Psd and Pij
+    Ids = dict((tuple(path), p) for p, path in enumerate(paths))
+    PathPair = np.full(len(Ids), -1, dtype=np.int64)
+    for k,(s,d) in enumerate(links):
+        PathPair[[Ids[tuple(path)] for path in Psd[s,d]]] = k
+    Rows = []
+    Cols = []
+    for l,(i,j) in enumerate(links):
+        for s,d in links:
+            Path = [Ids[tuple(path)] for path in Pij[i,j,s,d]]
+            Rows.extend([l]*len(Path))
+            Cols.extend(Path)
+    Incidence = sp.csr_matrix((np.ones(len(Rows)), (Rows, Cols)), shape=(len(links), len(Ids)))
+    return PathPair, Incidence
 
 class PathBackup(object):
     """ Class object for normal-based backup network model.
 
+    The link capacity and SOCP rows are built from the sparse link x path incidence matrix of the
+    path catalog (see GetPathCatalog), so the build time is linear in its nonzeros.
+    
+    The catalog does not need every candidate path: generatePaths adds the paths that improve the
+    continuous relaxation (column generation), e.g. starting from PathIndex(G, NumShortest=1).
+
     Parameters
     ----------
     nodes: set of nodes
     links: set of links
-    paths: set of paths in the graph
-    Psd: set of backup paths for link (s,d). 
-    Pij: set of (s,d) paths that use link (i,j).
+    paths: path catalog (PathIndex, with integer path ids) or set of paths in the graph
+    Psd: set of backup paths for link (s,d) (None with a PathIndex). 
+    Pij: set of (s,d) paths that use link (i,j) (None with a PathIndex).
     capacity: capacities per link based based on random failures 
     mean: mean for failure random variable
     std: standard deviation for failure random variable
@@ -64,61 +114,152 @@ class PathBackup(object):
                 
         # Create optimization model
         self.__model = Model('PathBackup')
-    
-        # Auxiliary variables for SOCP reformulation
-        U = {}
-        R = {}
+        Builder = ModelBuilder(self.__model)
+        links = [tuple(link) for link in self.__links]
+        NumLinks = len(links)
+        PathPair, Incidence = GetPathCatalog(links, self.__paths, self.__Psd, self.__Pij)
+        NumPaths = len(PathPair)
+        Mean = np.array([self.__mean[s,d] for s,d in links], dtype=float)
+        Std = np.array([self.__std[s,d] for s,d in links], dtype=float)
+        self.__Mean = Mean
+        self.__Std = Std
+        self.__PathPair = PathPair.tolist()
+        self.__NewPaths = {}
         
-        # Create variables
-        for i,j in self.__links:
-            self.__BackupCapacity[i,j] = self.__model.addVar(lb=0, obj=1, name='Backup_Capacity[%s,%s]' % (i, j))
-        self.__model.update()
-         
-        for p in self.__paths:
-            #LP Relaxation
-            #self.__bPath[self.__paths.index(p)] = self.__model.addVar(lb=0,obj=1,name='Backup_Path[%s]' % (self.__paths.index(p)))
-            self.__bPath[self.__paths.index(p)] = self.__model.addVar(vtype=GRB.BINARY,obj=1,name='Backup_Path[%s]' % (self.__paths.index(p)))
-        self.__model.update()
-        
-        for i,j in self.__links:
-            U[i,j] = self.__model.addVar(obj=1,name='U[%s,%s]' % (i, j))
-        self.__model.update()
+        # Paths in the model (link (s,d) and set of links of each path), not to be generated again
+        Columns = Incidence.tocsc()
+        self.__Pool = set((PathPair[p], frozenset(Columns.indices[Columns.indptr[p]:Columns.indptr[p+1]].tolist())) for p in range(NumPaths))
+    
+        # Create variables (U and R are the auxiliary variables of the SOCP reformulation)
+        CapStart = Builder.AddVars(GetLinkNames('Backup_Capacity', links), obj=1.0)
+        PathStart = Builder.AddVars(['Backup_Path[%s]' % p for p in range(NumPaths)], vtype=GRB.BINARY)
+        UStart = Builder.AddVars(GetLinkNames('U', links))
+        RKeys = [(i,j,s,d) for i,j in links for s,d in links]
+        RStart = Builder.AddVars(['R[%s,%s,%s,%s]' % key for key in RKeys])
         
-        for i,j in self.__links:
-            for s,d in self.__links:
-                R[i,j,s,d] = self.__model.addVar(obj=1,name='R[%s,%s,%s,%s]' % (i,j,s,d))
-        self.__model.update()
+        self.__BackupCapacity = Builder.GetVarDict(links, CapStart)
+        self.__bPath = dict(enumerate(Builder.GetVars(PathStart, PathStart+NumPaths)))
+        U = Builder.GetVarDict(links, UStart)
+        R = Builder.GetVarDict(RKeys, RStart)
         
         self.__model.modelSense = GRB.MINIMIZE
-        self.__model.setObjective(quicksum(self.__BackupCapacity[i,j] for i,j in self.__links))
-        self.__model.update()
-        
            
         #------------------------------------------------------------------------#
         #                    Constraints definition                              #
         #                                                                        #
         #                                                                        #
         #------------------------------------------------------------------------#
+        
+        # Nonzeros (link, path) of the incidence matrix, without the paths of no (s,d) link
+        Incidence = Incidence.tocoo()
+        Valid = PathPair[Incidence.col] >= 0
+        LinkRows, PathCols = Incidence.row[Valid], Incidence.col[Valid]
+        Pairs = PathPair[PathCols]
+        Links = np.arange(NumLinks)
          
-        # Link capacity constraints
-        for i,j in self.__links:
-            self.__model.addConstr(self.__BackupCapacity[i,j] >= quicksum(self.__mean[s,d]*quicksum(self.__bPath[self.__paths.index(p)] for p in self.__Pij[i,j,s,d]) for s,d in self.__links) + U[i,j]*self.__invstd,'[CONST]Link_Cap[%s][%s]' % (i, j))
-        self.__model.update()
+        # Link capacity constraints: sum_sd mean[s,d]*sum_{p in Pij} bPath[p] + U[i,j]*invstd - BackupCapacity[i,j] <= 0
+        self.__LinkCap = Builder.AddConstrs(np.concatenate([LinkRows, Links, Links]),
+                           np.concatenate([PathStart+PathCols, UStart+Links, CapStart+Links]),
+                           np.concatenate([Mean[Pairs], np.full(NumLinks, self.__invstd), -np.ones(NumLinks)]),
+                           GRB.LESS_EQUAL, 0, GetLinkNames('[CONST]Link_Cap', links, '[%s][%s]'))
             
         # SCOP Reformulation Constraints
-        for i,j in self.__links:
-            self.__model.addConstr(quicksum(R[i,j,s,d]*R[i,j,s,d] for s,d in self.__links) <= U[i,j]*U[i,j],'[CONST]SCOP1[%s][%s]' % (i, j))
-        self.__model.update()
+        for i,j in links:
+            self.__model.addQConstr(quicksum(R[i,j,s,d]*R[i,j,s,d] for s,d in links) <= U[i,j]*U[i,j],'[CONST]SCOP1[%s][%s]' % (i, j))
             
-        # SCOP Reformulation Constraints    
-        for i,j in self.__links:
-            for s,d in self.__links:
-                self.__model.addConstr(self.__std[s,d]*quicksum(self.__bPath[self.__paths.index(p)] for p in self.__Pij[i,j,s,d]) == R[i,j,s,d],'[CONST]SCOP2[%s][%s][%s][%s]' % (i,j,s,d))
-        self.__model.update()
+        # SCOP Reformulation Constraints: std[s,d]*sum_{p in Pij} bPath[p] - R[i,j,s,d] == 0
+        Rows = np.arange(NumLinks*NumLinks)
+        self.__SCOP2 = Builder.AddConstrs(np.concatenate([LinkRows*NumLinks+Pairs, Rows]),
+                           np.concatenate([PathStart+PathCols, RStart+Rows]),
+                           np.concatenate([Std[Pairs], -np.ones(NumLinks*NumLinks)]),
+                           GRB.EQUAL, 0, ['[CONST]SCOP2[%s][%s][%s][%s]' % key for key in RKeys])
         
         # Unique path 
-        for s,d in self.__links:
-            self.__model.addConstr(quicksum(self.__bPath[self.__paths.index(p)] for p in self.__Psd[s,d]) == 1,'UniquePath[%s,%s]' % (s, d))
+        Paths = np.nonzero(PathPair >= 0)[0]
+        self.__Unique = Builder.AddConstrs(PathPair[Paths], PathStart+Paths, np.ones(len(Paths)), GRB.EQUAL, 1,
+                                           GetLinkNames('UniquePath', links))
+        
+        self.BuildStatistics = Builder.Update()
+        
+    def generatePaths(self,G,MaxIterations=100,Tolerance=1e-6):
+        """ Add the backup paths that improve the continuous relaxation (column generation).
+        
+        The relaxation of the model (SOCP) is solved with the paths in the model, and each link (s,d) is priced
+        with a shortest path from s to d in G without (s,d), with link weights given by the duals of the
+        Link_Cap and SCOP2 rows: w[i,j] = -(mean[s,d]*pi[i,j] + std[s,d]*sigma[i,j,s,d]), clipped at 0. The path is
+        added when it is shorter than the dual of UniquePath[s,d] (negative reduced cost). The iterations stop
+        when no path is added, and the path variables are binary again, so optimize solves the MIP on the
+        generated paths.
+        
+        Parameters
+        ----------
+        G: directed NetworkX graph with the links of the model
+        MaxIterations: maximum number of relaxations solved
+        Tolerance: minimum reduced cost of an added path
+        
+        Returns
+        -------
+        NumAdded: number of paths added (the objective and the paths added by each iteration are kept in GenerationHistory)
+        
+        """
+        links = [tuple(link) for link in self.__links]
+        NumLinks = len(links)
+        LinkIds = dict((link, l) for l, link in enumerate(links))
+        self.GenerationHistory = []
+        NumAdded = 0
+        
+        # Continuous relaxation, with the duals of the linear rows
+        self.__model.params.QCPDual = 1
+        self.__setPathType(GRB.CONTINUOUS)
+        for Iteration in range(MaxIterations):
+            self.__model.optimize()
+            if self.__model.status != GRB.Status.OPTIMAL:
+                break
+            Pi = np.array(self.__model.getAttr('Pi', self.__LinkCap))
+            Sigma = np.array(self.__model.getAttr('Pi', self.__SCOP2)).reshape(NumLinks, NumLinks)
+            Mu = np.array(self.__model.getAttr('Pi', self.__Unique))
+            Weights = np.maximum(-(np.outer(Pi, self.__Mean)+Sigma*self.__Std), 0)
+            
+            Added = 0
+            for k,(s,d) in enumerate(links):
+                H = nx.restricted_view(G, [], [(s,d)])
+                try:
+                    Length, Path = nx.single_source_dijkstra(H, s, d, weight=lambda u,v,e: Weights[LinkIds[u,v],k])
+                except nx.NetworkXNoPath:
+                    continue
+                PathLinks = [LinkIds[Path[n],Path[n+1]] for n in range(len(Path)-1)]
+                if Length-Mu[k] < -Tolerance and (k, frozenset(PathLinks)) not in self.__Pool:
+                    self.__addPath(k, Path, PathLinks)
+                    Added = Added + 1
+            self.GenerationHistory.append({"iteration": Iteration, "objective": self.__model.ObjVal, "added": Added})
+            NumAdded = NumAdded + Added
+            if Added == 0:
+                break
+        
+        self.__setPathType(GRB.BINARY)
+        return NumAdded
+    
+    def getPath(self,p):
+        """Return the nodes of path p."""
+        if p in self.__NewPaths:
+            return self.__NewPaths[p]
+        return self.__paths.GetPath(p) if isinstance(self.__paths, PathIndex) else self.__paths[p]
+    
+    def __addPath(self,k,Path,PathLinks):
+        """Add the variable of a path of the k-th link (s,d) to the Link_Cap, SCOP2 and UniquePath rows."""
+        NumLinks = len(self.__LinkCap)
+        p = len(self.__PathPair)
+        Coeffs = [self.__Mean[k]]*len(PathLinks) + [self.__Std[k]]*len(PathLinks) + [1.0]
+        Constrs = [self.__LinkCap[l] for l in PathLinks] + [self.__SCOP2[l*NumLinks+k] for l in PathLinks] + [self.__Unique[k]]
+        self.__bPath[p] = self.__model.addVar(lb=0, ub=1, vtype=GRB.CONTINUOUS, name='Backup_Path[%s]' % p, column=Column(Coeffs, Constrs))
+        self.__PathPair.append(k)
+        self.__NewPaths[p] = list(Path)
+        self.__Pool.add((k, frozenset(PathLinks)))
+    
+    def __setPathType(self,VType):
+        """Set the type of the path variables (GRB.CONTINUOUS for the relaxation, GRB.BINARY for the MIP)."""
+        Vars = [self.__bPath[p] for p in sorted(self.__bPath)]
+        self.__model.setAttr('VType', Vars, [VType]*len(Vars))
         self.__model.update()
         
     def optimize(self,MipGap,TimeLimit):
@@ -137,9 +278,9 @@ class PathBackup(object):
         # Print solution
         if self.__model.status == GRB.Status.OPTIMAL:
             solution = self.__model.getAttr('x', self.__bPath)
-            for p in self.__paths:
-                if solution[self.__paths.index(p)] > 0.001:
-                    print('Path[%s] = %s = %s' % (self.__paths.index(p),p,solution[self.__paths.index(p)]))
+            for p in solution:
+                if solution[p] > 0.001:
+                    print('Path[%s] = %s = %s' % (p,self.getPath(p),solution[p]))
             solution = self.__model.getAttr('x', self.__BackupCapacity)
             for i,j in self.__links:
                 if solution[i,j] > 0:
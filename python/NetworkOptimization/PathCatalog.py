@@ -0,0 +1,217 @@
+'''
+Created on Oct 18, 2026
+
+@author: Edielson
+'''
+import os
+import json
+import struct
+import hashlib
+import numpy as np
+
+from NetworkOptimization.PathIndex import PathIndex
+
+#file layout: magic, header length (uint64), JSON header, padding, arrays of the index (see ArrayTypes)
+Magic = b'NOPATH01'
+Alignment = 64
+Extension = '.pcat'
+
+# Arrays of a PathIndex in file order, with their type
+ArrayTypes = [("PathLinks", '<i4'), ("PathPtr", '<i8'), ("PairPtr", '<i8'), ("PathPair", '<i4'), ("LinkPaths", '<i8'), ("LinkPtr", '<i8')]
+
+
+def GetGraphHash(G, Weight=None):
+    """Return the canonical hash of the edge list of a graph (and of the Weight attribute of each edge).
+
+    The edges are sorted, so the hash does not depend on the order in which they were added.
+
+    """
+    Edges = sorted([repr(i), repr(j), repr(Data.get(Weight)) if Weight is not None else None] for i,j,Data in G.edges(data=True))
+    return hashlib.sha1(json.dumps(Edges).encode('utf-8')).hexdigest()
+
+def GetParameters(Cutoff=None, NumShortest=None, Weight=None, MaxLength=None):
+    """Return the parameters of a catalog (see PathIndex) as saved in the header.
+
+    PathIndex ignores Weight and MaxLength without NumShortest, so they are None then (the same catalog has one key).
+
+    """
+    if NumShortest is None:
+        Weight, MaxLength = None, None
+    return {"cutoff": Cutoff, "num_shortest": NumShortest, "weight": Weight, "max_length": MaxLength}
+
+def GetHeaderNode(Node):
+    """Return a JSON friendly copy of a node (numpy scalars are converted to Python scalars)."""
+    return Node.item() if isinstance(Node, np.generic) else Node
+
+def SavePathIndex(FileName, Index, GraphHash=None):
+    """Save a path index to the binary catalog file ``FileName``.
+
+    Parameters
+    ----------
+    FileName: Name of the catalog file.
+    Index: Path index (PathIndex).
+    GraphHash: Hash of the graph of the index (see GetGraphHash), saved in the header.
+
+    """
+    Arrays = [np.ascontiguousarray(getattr(Index, Name), dtype=Type) for Name, Type in ArrayTypes]
+    Header = GetParameters(Index.Cutoff, Index.NumShortest, Index.Weight, Index.MaxLength)
+    Header.update({"graph": GraphHash,
+                   "links": [[GetHeaderNode(i), GetHeaderNode(j)] for i,j in Index.Links],
+                   "sizes": [len(Array) for Array in Arrays]})
+    Data = json.dumps(Header).encode('utf-8')
+    Offset = len(Magic)+8+len(Data)
+    Offset = Offset + (-Offset)%Alignment
+
+    f = open(FileName, "wb")
+    f.write(Magic)
+    f.write(struct.pack('<Q', len(Data)))
+    f.write(Data)
+    f.write(b'\0'*(Offset-len(Magic)-8-len(Data)))
+    for Array in Arrays:
+        f.write(Array.tobytes())
+        f.write(b'\0'*((-Array.nbytes)%8))
+    f.close()
+
+def ReadHeader(FileName):
+    """Return the JSON header of a catalog file and the offset of its first array."""
+    f = open(FileName, "rb")
+    if f.read(len(Magic)) != Magic:
+        f.close()
+        raise ValueError('%s is not a path catalog file' %FileName)
+    Length, = struct.unpack('<Q', f.read(8))
+    Header = json.loads(f.read(Length).decode('utf-8'))
+    f.close()
+    Offset = len(Magic)+8+Length
+    return Header, Offset + (-Offset)%Alignment
+
+def LoadPathIndex(FileName):
+    """Load a path index from a catalog file.
+
+    The arrays are memory-mapped, so the paths are only read from disk when used.
+
+    """
+    Header, Offset = ReadHeader(FileName)
+    Arrays = {}
+    for (Name, Type), Size in zip(ArrayTypes, Header["sizes"]):
+        if Size > 0:
+            Arrays[Name] = np.memmap(FileName, dtype=Type, mode='r', offset=Offset, shape=(Size,))
+        else:
+            Arrays[Name] = np.zeros(0, dtype=Type)
+        Offset = Offset + Size*np.dtype(Type).itemsize
+        Offset = Offset + (-Offset)%8
+    Index = PathIndex(None, Header["cutoff"], Header["num_shortest"], Header["weight"], Header["max_length"])
+    Index.SetArrays([tuple(link) for link in Header["links"]], **Arrays)
+    return Index
+
+def GetMaxLinks(Cutoff, NumShortest, Weight, MaxLength):
+    """Return the maximum number of links of the paths of a catalog (None for no limit).
+
+    MaxLength is a number of links only for the shortest paths by number of links (NumShortest without a Weight).
+
+    """
+    Limits = [Limit for Limit in [Cutoff, MaxLength if NumShortest is not None and Weight is None else None] if Limit is not None]
+    return min(Limits) if Limits else None
+
+def IsSubset(Header, Cutoff, NumShortest, Weight, MaxLength):
+    """Return True if the catalog of the given parameters is a subset (see PathIndex.GetSubset) of the catalog of a header."""
+    def Covers(Limit, Value):
+        return Limit is None or (Value is not None and Value <= Limit)
+
+    if NumShortest is None:
+        return Header["num_shortest"] is None and Covers(Header["cutoff"], Cutoff)
+    if Header["num_shortest"] is None or Header["num_shortest"] < NumShortest or Header["weight"] != Weight:
+        return False
+    if Weight is None:
+        # The paths come by number of links: the first ones within a lower limit are the ones of that limit
+        return Covers(GetMaxLinks(Header["cutoff"], Header["num_shortest"], None, Header["max_length"]), GetMaxLinks(Cutoff, NumShortest, None, MaxLength))
+    return Header["cutoff"] == Cutoff and Header["max_length"] == MaxLength
+
+
+class PathCatalogCache(object):
+    """ Disk cache of path catalogs (PathIndex), keyed by the graph and the path parameters.
+
+    Each catalog is a binary file named by the hash of the edge list of the graph (see GetGraphHash) and of
+    its parameters (cutoff, number of shortest paths, weight and maximum length), and it is memory-mapped
+    when loaded (see LoadPathIndex). A catalog that is not in the cache is derived from a larger catalog of
+    the same graph when there is one (e.g. cutoff 2 from cutoff None, see IsSubset), and enumerated otherwise.
+    The least recently used catalogs are removed when the files take more than MaxSize bytes.
+
+    Parameters
+    ----------
+    Directory: Directory of the catalog files (created if needed).
+    MaxSize: Maximum size of the catalog files in bytes (None for no limit).
+
+    """
+
+    def __init__(self, Directory, MaxSize=None):
+        '''
+        Constructor
+        '''
+        if not os.path.isdir(Directory):
+            os.makedirs(Directory)
+        self.Directory = Directory
+        self.MaxSize = MaxSize
+        self.Statistics = {"hits": 0, "derived": 0, "enumerated": 0, "evicted": 0}
+
+    def GetFileName(self, GraphHash, Parameters):
+        """Return the catalog file of a graph and parameters."""
+        Key = hashlib.sha1(json.dumps(Parameters, sort_keys=True).encode('utf-8')).hexdigest()
+        return os.path.join(self.Directory, '%s-%s%s' %(GraphHash[:20], Key[:20], Extension))
+
+    def GetPathIndex(self, G, Cutoff=None, NumShortest=None, Weight=None, MaxLength=None):
+        """Return the path index of a graph (see PathIndex), from the cache when possible.
+
+        The paths are the same as PathIndex(G, Cutoff, NumShortest, Weight, MaxLength), and the links
+        keep the order of the catalog in the cache.
+
+        """
+        Parameters = GetParameters(Cutoff, NumShortest, Weight, MaxLength)
+        Weight, MaxLength = Parameters["weight"], Parameters["max_length"]
+        GraphHash = GetGraphHash(G, Weight)
+        FileName = self.GetFileName(GraphHash, Parameters)
+        if os.path.exists(FileName):
+            self.Statistics["hits"] = self.Statistics["hits"] + 1
+            self.__Touch(FileName)
+            return LoadPathIndex(FileName)
+
+        # Smallest catalog of the same graph that contains the requested one
+        Source = None
+        for Name in self.__GetFiles():
+            Header = ReadHeader(Name)[0]
+            if Header["graph"] == GraphHash and IsSubset(Header, Cutoff, NumShortest, Weight, MaxLength):
+                if Source is None or os.path.getsize(Name) < os.path.getsize(Source):
+                    Source = Name
+        if Source is not None:
+            self.Statistics["derived"] = self.Statistics["derived"] + 1
+            self.__Touch(Source)
+            Index = LoadPathIndex(Source).GetSubset(GetMaxLinks(Cutoff, NumShortest, Weight, MaxLength), NumShortest)
+            Index.Cutoff, Index.MaxLength = Cutoff, MaxLength
+        else:
+            self.Statistics["enumerated"] = self.Statistics["enumerated"] + 1
+            Index = PathIndex(G, Cutoff, NumShortest, Weight, MaxLength)
+        SavePathIndex(FileName, Index, GraphHash)
+        self.Evict(FileName)
+        return Index
+
+    def Evict(self, Keep=None):
+        """Remove the least recently used catalog files until they take at most MaxSize bytes (Keep is never removed)."""
+        if self.MaxSize is None:
+            return
+        Files = sorted(self.__GetFiles(), key=os.path.getmtime)
+        Size = sum(os.path.getsize(Name) for Name in Files)
+        for Name in Files:
+            if Size <= self.MaxSize:
+                break
+            if Name == Keep:
+                continue
+            Size = Size - os.path.getsize(Name)
+            os.remove(Name)
+            self.Statistics["evicted"] = self.Statistics["evicted"] + 1
+
+    def __GetFiles(self):
+        """Return the catalog files of the cache."""
+        return [os.path.join(self.Directory, Name) for Name in os.listdir(self.Directory) if Name.endswith(Extension)]
+
+    def __Touch(self, FileName):
+        """Mark a catalog file as used now (the modification time orders the files for eviction)."""
+        os.utime(FileName, None)
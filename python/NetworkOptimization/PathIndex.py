@@ -0,0 +1,246 @@
+'''
+Created on Oct 18, 2026
+
+@author: Edielson
+'''
+import heapq
+import numpy as np
+import networkx as nx
+import scipy.sparse as sp
+from itertools import chain, count
+
+
+class PathIndex(object):
+    """ Index of the simple paths of every link (s,d) of a directed graph.
+
+    The paths are enumerated in a single depth-first search per source node, which yields the paths
+    to all the destinations of that source at once (getLinkPaths enumerates the paths of (s,d) again
+    for every link (i,j)). Each path is stored as the ids of its links, in compressed arrays:
+
+    - the links of path p are PathLinks[PathPtr[p]:PathPtr[p+1]];
+    - the paths of the k-th link (s,d) are PairPtr[k] to PairPtr[k+1]-1;
+    - the paths that use the l-th link are LinkPaths[LinkPtr[l]:LinkPtr[l+1]] (in increasing order),
+      so the paths of (s,d) that use (i,j) are found by a binary search (see GetLinkPaths).
+
+    With NumShortest, only the NumShortest shortest loopless paths of each link (s,d) that do not use (s,d)
+    itself are kept as backup candidates (Yen's algorithm, see networkx.shortest_simple_paths, or a best-first
+    search bounded by Cutoff links with a Weight), so the number of paths grows linearly with the number of
+    links instead of exponentially.
+
+    Parameters
+    ----------
+    G : Directed NetworkX graph (None for an empty index, to be filled by SetArrays).
+    Cutoff : Maximum number of links of a path (None for no limit).
+    NumShortest : Number of candidate paths per link (None for all the simple paths).
+    Weight : Edge attribute with the length (e.g. latency) of each link for NumShortest (None to count links).
+    MaxLength : Maximum length of a candidate path for NumShortest (None for no limit).
+
+    """
+
+    def __init__(self, G, Cutoff=None, NumShortest=None, Weight=None, MaxLength=None):
+        '''
+        Constructor
+        '''
+        self.Cutoff = Cutoff
+        self.NumShortest = NumShortest
+        self.Weight = Weight
+        self.MaxLength = MaxLength
+        Links = [] if G is None else [tuple(link) for link in G.edges()]
+        self.LinkIds = dict((link, l) for l, link in enumerate(Links))
+
+        PairPaths = dict((link, []) for link in Links)
+        if G is None:
+            pass
+        elif NumShortest is not None:
+            for s,d in Links:
+                PairPaths[s,d] = self.__GetShortest(G, s, d, NumShortest, Weight, MaxLength)
+        else:
+            # Destinations of each source node
+            Targets = {}
+            if Cutoff is None or Cutoff >= 1:
+                for s,d in Links:
+                    Targets.setdefault(s, set()).add(d)
+            for Source in Targets:
+                self.__Enumerate(G, Source, Targets[Source], PairPaths)
+
+        Paths = [path for link in Links for path in PairPaths[link]]
+        Lengths = np.array([len(path) for path in Paths], dtype=np.int64)
+        Counts = np.array([len(PairPaths[link]) for link in Links], dtype=np.int64)
+        PathPtr = np.concatenate([[0], np.cumsum(Lengths)]).astype(np.int64)
+        self.SetArrays(Links, np.fromiter(chain.from_iterable(Paths), dtype=np.int32, count=int(PathPtr[-1])),
+                       PathPtr, np.concatenate([[0], np.cumsum(Counts)]).astype(np.int64))
+
+    def SetArrays(self, Links, PathLinks, PathPtr, PairPtr, PathPair=None, LinkPaths=None, LinkPtr=None):
+        """Set the paths of the index from its compressed arrays (see the class description).
+
+        PathPair, LinkPaths and LinkPtr are computed when None (e.g. arrays memory-mapped from a file are used as given).
+
+        """
+        self.Links = [tuple(link) for link in Links]
+        self.LinkIds = dict((link, l) for l, link in enumerate(self.Links))
+        self.PathLinks = PathLinks
+        self.PathPtr = PathPtr
+        self.PairPtr = PairPtr
+        self.NumPaths = len(PathPtr)-1
+        if PathPair is None:
+            PathPair = np.repeat(np.arange(len(self.Links), dtype=np.int32), np.diff(PairPtr))
+        self.PathPair = PathPair
+
+        # Inverted index link -> paths (a stable sort keeps the paths of each link in increasing order)
+        if LinkPaths is None or LinkPtr is None:
+            Order = np.argsort(PathLinks, kind='stable')
+            LinkPaths = np.repeat(np.arange(self.NumPaths, dtype=np.int64), np.diff(PathPtr))[Order]
+            LinkPtr = np.concatenate([[0], np.cumsum(np.bincount(PathLinks, minlength=len(self.Links)))]).astype(np.int64)
+        self.LinkPaths = LinkPaths
+        self.LinkPtr = LinkPtr
+
+    def GetSubset(self, MaxLinks=None, NumShortest=None):
+        """Return the index of the paths with at most MaxLinks links, and of the first NumShortest of them per link (None for all).
+
+        A catalog of a lower cutoff (or fewer shortest paths) is derived this way from a larger one, without enumerating
+        the paths again (the paths of each link keep their order).
+
+        """
+        Lengths = np.diff(self.PathPtr)
+        Keep = np.ones(self.NumPaths, dtype=bool) if MaxLinks is None else Lengths <= MaxLinks
+        if NumShortest is not None:
+            Kept = np.nonzero(Keep)[0]
+            Pairs = np.asarray(self.PathPair)[Kept]
+            First = np.concatenate([[0], np.cumsum(np.bincount(Pairs, minlength=len(self.Links)))])
+            Keep[Kept[np.arange(len(Kept))-First[Pairs] >= NumShortest]] = False
+        Subset = PathIndex(None, self.Cutoff if MaxLinks is None else MaxLinks, self.NumShortest if NumShortest is None else NumShortest,
+                           self.Weight, self.MaxLength)
+        Subset.SetArrays(self.Links, np.asarray(self.PathLinks)[np.repeat(Keep, Lengths)],
+                         np.concatenate([[0], np.cumsum(Lengths[Keep])]).astype(np.int64),
+                         np.concatenate([[0], np.cumsum(np.bincount(np.asarray(self.PathPair)[Keep], minlength=len(self.Links)))]).astype(np.int64))
+        return Subset
+
+    def __Enumerate(self, G, Source, Targets, PairPaths):
+        """Add the link ids of the simple paths from Source to each of the Targets to PairPaths."""
+        Nodes = [Source]
+        Visited = set(Nodes)
+        PathLinks = []
+        Stack = [iter(G.adj[Source])]
+        while Stack:
+            Next = next(Stack[-1], None)
+            if Next is None:
+                # All the paths through the last node were enumerated
+                Stack.pop()
+                Visited.discard(Nodes.pop())
+                if PathLinks:
+                    PathLinks.pop()
+                continue
+            if Next in Visited:
+                continue
+            PathLinks.append(self.LinkIds[Nodes[-1], Next])
+            if Next in Targets:
+                PairPaths[Source, Next].append(tuple(PathLinks))
+            if self.Cutoff is None or len(PathLinks) < self.Cutoff:
+                Nodes.append(Next)
+                Visited.add(Next)
+                Stack.append(iter(G.adj[Next]))
+            else:
+                PathLinks.pop()
+
+    def __GetShortest(self, G, s, d, NumShortest, Weight, MaxLength):
+        """Return the link ids of the NumShortest shortest loopless paths from s to d that do not use link (s,d).
+
+        The paths come in increasing length, so the search stops at the first one above MaxLength (or above
+        Cutoff links when the length is the number of links). With both a Weight and a Cutoff, the paths are
+        found by a search bounded by Cutoff links instead (see __GetShortestBounded).
+
+        """
+        Paths = []
+        if NumShortest < 1:
+            return Paths
+        if Weight is not None and self.Cutoff is not None:
+            return self.__GetShortestBounded(G, s, d, NumShortest, Weight, MaxLength)
+        H = nx.restricted_view(G, [], [(s,d)])
+        try:
+            for Path in nx.shortest_simple_paths(H, s, d, weight=Weight):
+                NumLinks = len(Path)-1
+                Length = NumLinks if Weight is None else nx.path_weight(H, Path, Weight)
+                if MaxLength is not None and Length > MaxLength:
+                    break
+                if self.Cutoff is not None and NumLinks > self.Cutoff:
+                    break
+                Paths.append(tuple(self.LinkIds[Path[n], Path[n+1]] for n in range(NumLinks)))
+                if len(Paths) == NumShortest:
+                    break
+        except nx.NetworkXNoPath:
+            pass
+        return Paths
+
+    def __GetShortestBounded(self, G, s, d, NumShortest, Weight, MaxLength):
+        """Return the link ids of the NumShortest shortest loopless paths from s to d with at most Cutoff links, by Weight.
+
+        Yen's algorithm ranks the paths by weight only, so it would enumerate every path below the k-th one
+        within Cutoff links, whatever its number of links. Here the partial paths of at most Cutoff links are
+        expanded best first, ranked by their weight plus the least weight to d in the links left (a lower
+        bound computed by hops, Bellman-Ford), so the complete paths come in increasing weight and a partial
+        path that cannot reach d within Cutoff links is never expanded.
+
+        """
+        def GetWeight(u, v):
+            return G[u][v].get(Weight, 1)
+
+        # Bound[h][u]: least weight from u to d with at most h links, without link (s,d)
+        Bound = [{d: 0}]
+        for h in range(self.Cutoff):
+            Next = dict(Bound[-1])
+            for u, v in G.edges():
+                if (u,v) != (s,d) and v in Bound[-1] and GetWeight(u, v)+Bound[-1][v] < Next.get(u, np.inf):
+                    Next[u] = GetWeight(u, v)+Bound[-1][v]
+            Bound.append(Next)
+
+        Paths = []
+        if s not in Bound[-1]:
+            return Paths
+        Counter = count()
+        Heap = [(Bound[-1][s], 0, next(Counter), (s,))]
+        while Heap and len(Paths) < NumShortest:
+            Estimate, Length, Order, Nodes = heapq.heappop(Heap)
+            if Nodes[-1] == d:
+                if MaxLength is not None and Length > MaxLength:
+                    break
+                Paths.append(tuple(self.LinkIds[Nodes[n], Nodes[n+1]] for n in range(len(Nodes)-1)))
+                continue
+            Left = self.Cutoff-len(Nodes)
+            if Left < 0:
+                continue
+            for v in G.adj[Nodes[-1]]:
+                if (Nodes[-1],v) == (s,d) or v in Nodes or v not in Bound[Left]:
+                    continue
+                Weighted = Length+GetWeight(Nodes[-1], v)
+                heapq.heappush(Heap, (Weighted+Bound[Left][v], Weighted, next(Counter), Nodes+(v,)))
+        return Paths
+
+    def GetPaths(self, s, d):
+        """Return the ids of the paths of link (s,d)."""
+        k = self.LinkIds[s,d]
+        return np.arange(self.PairPtr[k], self.PairPtr[k+1])
+
+    def GetLinkPaths(self, i, j, s, d):
+        """Return the ids of the paths of link (s,d) that use link (i,j)."""
+        l = self.LinkIds[i,j]
+        k = self.LinkIds[s,d]
+        Paths = self.LinkPaths[self.LinkPtr[l]:self.LinkPtr[l+1]]
+        Start, Stop = np.searchsorted(Paths, [self.PairPtr[k], self.PairPtr[k+1]])
+        return Paths[Start:Stop]
+
+    def GetIncidenceMatrix(self):
+        """Return the sparse (NumLinks, NumPaths) incidence matrix of the links used by each path (the inverted index)."""
+        return sp.csr_matrix((np.ones(len(self.LinkPaths)), self.LinkPaths, self.LinkPtr), shape=(len(self.Links), self.NumPaths))
+
+    def GetPathLinks(self, p):
+        """Return the ids of the links of path p, in path order."""
+        return self.PathLinks[self.PathPtr[p]:self.PathPtr[p+1]]
+
+    def GetPath(self, p):
+        """Return the nodes of path p."""
+        Links = self.GetPathLinks(p)
+        return [self.Links[Links[0]][0]] + [self.Links[l][1] for l in Links]
+
+    def GetAllPaths(self):
+        """Return the nodes of all the paths, in id order (the paths of getAllPaths)."""
+        return [self.GetPath(p) for p in range(self.NumPaths)]
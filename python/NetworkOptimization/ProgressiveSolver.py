@@ -0,0 +1,148 @@
+'''
+Created on Oct 18, 2026
+
+@author: Edielson
+'''
+import time
+import numpy as np
+
+from NetworkOptimization.BFPBackupModel import BFPBackupNetwork
+from NetworkOptimization.QualityAssessment import GetModelEvaluator
+from NetworkOptimization.RandomStreams import GetMasterSeed, GetStreamScenarios
+from NetworkOptimization.ScenarioSet import ScenarioSet
+
+
+class ProgressiveSolver(object):
+    """ Progressive refinement of the buffered failure probability backup design.
+
+    The backup model (BFPBackupNetwork) is solved on a small scenario sample, and the design is assessed
+    out of sample with the vectorized evaluator (BFPEvaluator) on a new batch of scenarios. While the assessed
+    failure probability of some backup link is above epsilon, the assessment scenarios that overload a backup
+    link, or come within Margin of its capacity, are added to the sample (the worst ones first), and the model
+    is rebuilt and solved again starting from the previous design.
+
+    The sample and the assessment batches are disjoint ranges of the random streams of one master seed
+    (see GetStreamScenarios), so a run is reproducible.
+
+    Parameters
+    ----------
+    Nodes: Set of nodes.
+    Links: Graph edges (links).
+    CapPerLink: Edge (link) capacity (weight).
+    FailureProb: Failure probability (p).
+    FailureProbIS: Failure probability of the importance sampling (None to sample with FailureProb).
+    Survivability: Survivability factor (epsilon).
+
+    """
+
+    def __init__(self, Nodes, Links, CapPerLink, FailureProb, FailureProbIS, Survivability):
+        '''
+        Constructor
+        '''
+        self.Nodes = Nodes
+        self.Links = [tuple(link) for link in Links]
+        self.CapPerLink = CapPerLink
+        self.FailureProb = FailureProb
+        self.FailureProbIS = FailureProbIS
+        self.Survivability = Survivability
+        self.History = []
+
+    def GetScenarios(self, MasterSeed, Start, Stop, StreamSize):
+        """Return scenarios Start to Stop of the master seed and their importance sampling weights (see GetStreamScenarios)."""
+        return GetStreamScenarios(MasterSeed, self.FailureProb, self.FailureProbIS, Start, Stop, self.Links, self.CapPerLink, StreamSize)
+
+    def Solve(self, MasterSeed, NumInitial, NumAssess, MaxIterations=10, MaxAdd=None, Margin=0, MipGap=None, TimeLimit=None, StreamSize=None, Aggregate=False, Params=None):
+        """Solve the backup model, refining the scenario sample until the assessed failure probability meets epsilon.
+
+        Parameters
+        ----------
+        MasterSeed: Master random seed (None for a random initialization).
+        NumInitial: Number of scenarios of the initial sample.
+        NumAssess: Number of new scenarios to assess each design.
+        MaxIterations: Maximum number of models solved.
+        MaxAdd: Maximum number of scenarios added per iteration (None for NumInitial).
+        Margin: Scenarios whose load is above the capacity minus Margin on some backup link are added.
+        MipGap, TimeLimit: Parameters of each solve (see BFPBackupNetwork.Optimize).
+        StreamSize: Number of scenarios per random stream (None for 4096).
+        Aggregate: True to collapse identical scenarios of the sample (see BFPBackupNetwork.LoadModel).
+        Params: Dictionary of other solver parameters of each solve (e.g. {"SolutionLimit": 1}), None for none.
+
+        Returns
+        -------
+        BackupCapacity: The capacity assigned per backup link.
+        BackupRoutes: The backup routes, indexed by (i,j,s,d).
+        BackupLinks: The backup links with capacity.
+        BufferedP: Assessed failure probability per backup link.
+
+        The size, time and assessment of each iteration are kept in History. A solve stopped by the limits
+        (e.g. TimeLimit) goes on with its incumbent (see BFPBackupNetwork.GetSolution), and a solve without
+        any solution ends the refinement with the previous design (its History entry has no objective and
+        no max_bfp).
+
+        """
+        if MaxAdd == None:
+            MaxAdd = NumInitial
+        if StreamSize == None:
+            StreamSize = 4096
+        if Params == None:
+            Params = {}
+        MasterSeed = GetMasterSeed(MasterSeed)
+        Sample, Gamma = self.GetScenarios(MasterSeed, 0, NumInitial, StreamSize)
+        Next = NumInitial
+        self.History = []
+        BackupCapacity, BackupRoutes, BackupLinks, BufferedP = {}, {}, {}, {}
+
+        for Iteration in range(MaxIterations):
+            BackupNet = BFPBackupNetwork()
+            BackupNet.LoadModel(Gamma, self.Nodes, self.Links, Sample, self.Survivability, Sample.NumScenarios, Aggregate)
+            # Warm start from the previous design
+            for key in BackupCapacity:
+                BackupNet.BackupCapacity[key].Start = BackupCapacity[key]
+            for key in BackupRoutes:
+                BackupNet.bBackupLink[key].Start = BackupRoutes[key]
+            for Name, Value in Params.items():
+                BackupNet.model.setParam(Name, Value)
+            SolveStart = time.time()
+            Capacity, Routes, UsedLinks = BackupNet.Optimize(MipGap, TimeLimit)
+            SolveTime = time.time()-SolveStart
+            model = BackupNet.model
+            Stats = BackupNet.BuildStatistics
+            self.History.append({"iteration": Iteration,
+                                 "status": model.Status,
+                                 "num_scenarios": Sample.NumScenarios,
+                                 "num_vars": Stats["num_vars"],
+                                 "num_constrs": Stats["num_constrs"],
+                                 "build_time": Stats["build_time"],
+                                 "solve_time": SolveTime,
+                                 "objective": None,
+                                 "max_bfp": None,
+                                 "added": 0})
+            if len(Routes) == 0:
+                #no solution: keep the previous design
+                break
+            BackupCapacity, BackupRoutes, BackupLinks = Capacity, Routes, UsedLinks
+
+            # Out of sample assessment
+            Assess, AssessGamma = self.GetScenarios(MasterSeed, Next, Next+NumAssess, StreamSize)
+            Next = Next+NumAssess
+            Evaluator = GetModelEvaluator(self.Links, BackupCapacity, BackupRoutes)
+            Loads = Evaluator.GetScenarioLoads(Assess, NumAssess)
+            BufferedP, Variance = Evaluator.GetStatistics(Evaluator.GetOverloads(Loads, AssessGamma))
+
+            Excess = (Loads-Evaluator.BackupCapacity).max(axis=1) if len(self.Links) else np.zeros(NumAssess)
+            Tail = np.nonzero(Excess > -Margin)[0]
+            Tail = Tail[np.argsort(-Excess[Tail], kind='stable')][:MaxAdd]
+            self.History[-1].update({"objective": sum(BackupCapacity.values()),
+                                     "max_bfp": max(BufferedP.values()) if BufferedP else 0.0})
+            print('Iteration %d: %d scenarios, %d variables, %d constraints, %g s, max p(x)=%g'
+                  %(Iteration, Sample.NumScenarios, Stats["num_vars"], Stats["num_constrs"], Stats["build_time"]+SolveTime, self.History[-1]["max_bfp"]))
+            if self.History[-1]["max_bfp"] <= self.Survivability or len(Tail) == 0:
+                break
+
+            # Refine the sample with the violated and tail scenarios
+            self.History[-1]["added"] = len(Tail)
+            Sample = ScenarioSet(np.vstack([Sample.Failures, Assess.Failures[Tail]]), self.Links, self.CapPerLink)
+            if Gamma is not None:
+                Gamma = np.concatenate([Gamma, AssessGamma[Tail]])
+
+        return BackupCapacity, BackupRoutes, BackupLinks, BufferedP
@@ -4,53 +4,316 @@ Created on Jun 9, 2016
 @author: Edielson
 '''
 import numpy as np
-import time
 import multiprocessing
 from multiprocessing import Pool
 
-def ThreadGetBufferedFailureProb(RandSeed, FailureProb, NumScenarios, Links, CapPerLink, BackupLinks, CapPerBackupLink, OptBackupLinks):    
+from NetworkOptimization.ScenarioSet import ScenarioSet, GetCapacityMatrix
+from NetworkOptimization.RandomStreams import GetMasterSeed, GetStreamFailures, GetChunks, GetStreamBlocks, GetImportanceSamplingWeights
+
+def GetRoutingMatrix(Links, BackupLinks, BackupRoutes):
+    """Build the routing matrix of a backup design.
+
+    Parameters
+    ----------
+    Links: Graph edges (links)
+    BackupLinks: Set of backup edges (links).
+    BackupRoutes: Set of backup routes indexed by (s,d,i,j).
+    
+    Returns
+    -------
+    R: (NumBackupLinks, NumLinks) matrix with R[b,l] = BackupRoutes[s,d,i,j] for the l-th link (s,d) and the b-th backup link (i,j).
+
+    """
+    R = np.zeros((len(BackupLinks), len(Links)))
+    for b,(i,j) in enumerate(BackupLinks):
+        for l,(s,d) in enumerate(Links):
+            R[b,l] = BackupRoutes[s,d,i,j]
+    return R
+
+def GetModelEvaluator(Links, BackupCapacity, BackupRoutes):
+    """Return the evaluator (BFPEvaluator) of the design found by a backup model, with every link as a backup link.
+
+    The capacities (indexed by (i,j)) and the routes (indexed by (i,j,s,d), as in the model) are rounded,
+    so the small violations of the integrality of a MIP solution are not counted as load.
+
+    """
+    RoutingMatrix = np.array([[round(BackupRoutes[i,j,s,d]) for s,d in Links] for i,j in Links], dtype=float).reshape(len(Links), -1)
+    return BFPEvaluator(Links, Links, dict((key, round(value)) for key, value in BackupCapacity.items()), RoutingMatrix)
+
+def GetWeights(ImportanceSampling, NumScenarios):
+    """Convert an importance sampling vector (dictionary or array) to an array, or None if not used."""
+    if ImportanceSampling is None or len(ImportanceSampling) == 0:
+        return None
+    if isinstance(ImportanceSampling, dict):
+        return np.array([ImportanceSampling[k] for k in range(NumScenarios)], dtype=float)
+    return np.asarray(ImportanceSampling, dtype=float)[:NumScenarios]
+
+def GetSuperquantiles(Loads, Weights, NumSamples, Survivability):
+    """Compute the superquantile (CVaR) of the loads of each backup link in closed form.
+
+    The superquantile min_t t + 1/(K*epsilon)*sum_k Gamma[k]*max(0, Loads[b,k]-t) is found by sorting the
+    loads of each backup link in decreasing order and taking the scenarios until their weight Gamma[k]/(K*epsilon)
+    adds up to 1. The optimal t is the load of the last scenario taken (the quantile), and the weight taken from
+    each scenario is the optimal dual solution, so sum_k Duals[b,k]*Loads[b,k] is the superquantile and, for
+    any other loads, a lower bound of their superquantile (a subgradient cut).
+
+    Only the largest loads are sorted: any M scenarios weigh at least as much as the M lightest ones, so once
+    these add up to 1 the scenarios taken are among the M largest loads, which are selected by partial sorting.
+
+    Parameters
+    ----------
+    Loads: (NumBackupLinks, NumScenarios) matrix of loads.
+    Weights: Importance sampling vector (Gamma[k]), None for 1.
+    NumSamples: Number of samples (K).
+    Survivability: Survivability factor (epsilon).
+
+    Returns
+    -------
+    Superquantiles: Superquantile of each backup link (-inf if the weights add up to less than K*epsilon).
+    Quantiles: Optimal t of each backup link.
+    Duals: (NumBackupLinks, NumScenarios) matrix with the weight of each scenario in the superquantile.
+
+    """
+    Loads = np.atleast_2d(np.asarray(Loads, dtype=float))
+    NumLinks, NumScenarios = Loads.shape
+    Weights = GetWeights(Weights, NumScenarios)
+    Weights = (np.ones(NumScenarios) if Weights is None else Weights)/(NumSamples*Survivability)
+    if NumScenarios == 0 or Weights.sum() < 1:
+        return np.full(NumLinks, -np.inf), np.full(NumLinks, -np.inf), np.zeros((NumLinks, NumScenarios))
+
+    NumLargest = min(int(np.searchsorted(np.cumsum(np.sort(Weights)), 1-1e-12))+1, NumScenarios)
+    if NumLargest < NumScenarios:
+        Order = np.argpartition(-Loads, NumLargest-1, axis=1)[:,:NumLargest]
+        Order = np.take_along_axis(Order, np.argsort(-np.take_along_axis(Loads, Order, axis=1), axis=1, kind='stable'), axis=1)
+    else:
+        Order = np.argsort(-Loads, axis=1, kind='stable')
+    Sorted = np.take_along_axis(Loads, Order, axis=1)
+    SortedWeights = Weights[Order]
+    Before = np.cumsum(SortedWeights, axis=1)-SortedWeights
+    SortedDuals = np.clip(1-Before, 0, SortedWeights)
+    Last = np.argmax(Before+SortedWeights >= 1-1e-12, axis=1)
+
+    Duals = np.zeros((NumLinks, NumScenarios))
+    np.put_along_axis(Duals, Order, SortedDuals, axis=1)
+    return (SortedDuals*Sorted).sum(axis=1), Sorted[np.arange(NumLinks), Last], Duals
+
+class BFPEvaluator(object):
+    """ Batched evaluator of the buffered failure probability of a backup design.
+
+    The backup routes are turned into a (NumBackupLinks, NumLinks) routing matrix, so the load
+    of every backup link on every scenario is a single matrix product against the scenario matrix.
+
+    Parameters
+    ----------
+    Links: Graph edges (links)
+    BackupLinks: Set of backup edges (links).
+    CapPerBackupLink: Set of backup edge (link) capacity (weight), or an array with one capacity per backup link.
+    BackupRoutes: Set of backup routes indexed by (s,d,i,j), or the routing matrix (see GetRoutingMatrix).
+    
+    """
+    
+    def __init__(self, Links, BackupLinks, CapPerBackupLink, BackupRoutes):
+        '''
+        Constructor
+        '''
+        self.Links = [tuple(link) for link in Links]
+        self.BackupLinks = [tuple(link) for link in BackupLinks]
+        if isinstance(BackupRoutes, np.ndarray):
+            self.RoutingMatrix = BackupRoutes
+        else:
+            self.RoutingMatrix = GetRoutingMatrix(self.Links, self.BackupLinks, BackupRoutes)
+        if isinstance(CapPerBackupLink, np.ndarray):
+            self.BackupCapacity = CapPerBackupLink
+        else:
+            self.BackupCapacity = np.array([CapPerBackupLink[i,j] for i,j in self.BackupLinks], dtype=float)
+    
+    def GetLoads(self, Capacity):
+        """Return the (NumScenarios, NumBackupLinks) load routed to each backup link.
+        
+        Parameters
+        ----------
+        Capacity: (NumScenarios, NumLinks) matrix of failed capacity (see GetCapacityMatrix).
+        
+        """
+        return np.dot(Capacity, self.RoutingMatrix.T)
+    
+    def GetIndicators(self, Capacity, Gamma=None):
+        """Return the (NumScenarios, NumBackupLinks) indicators of overloaded backup links.
+        
+        Parameters
+        ----------
+        Capacity: (NumScenarios, NumLinks) matrix of failed capacity (see GetCapacityMatrix).
+        Gamma: Importance sampling weights per scenario, or None.
+        
+        Returns
+        -------
+        I: 1 (or the importance sampling weight) if the backup capacity is overloaded and 0 otherwise.
+        
+        """
+        return self.GetOverloads(self.GetLoads(Capacity), Gamma)
+    
+    def GetScenarioLoads(self, Scenarios, NumScenarios):
+        """Return the (NumScenarios, NumBackupLinks) load routed to each backup link on the first NumScenarios scenarios.
+        
+        ScenarioSet objects compute the loads themselves (with popcounts for a PackedScenarioSet),
+        and dictionaries are converted to the matrix of failed capacity first.
+        
+        """
+        if isinstance(Scenarios, ScenarioSet):
+            return Scenarios.GetScenarios(0, NumScenarios).GetLoads(self.RoutingMatrix, self.Links)
+        return self.GetLoads(GetCapacityMatrix(Scenarios, NumScenarios, self.Links))
+    
+    def GetOverloads(self, Loads, Gamma=None):
+        """Return the indicators of overloaded backup links (weighted by Gamma) for a matrix of loads (see GetIndicators)."""
+        I = (Loads > self.BackupCapacity).astype(float)
+        if Gamma is not None:
+            I *= np.asarray(Gamma, dtype=float).reshape(-1,1)
+        return I
+    
+    def GetStatistics(self, Indicators):
+        """Return the sample mean and variance (dictionaries per backup link) of the indicators."""
+        NumScenarios = Indicators.shape[0]
+        Mean = Indicators.sum(axis=0)/NumScenarios
+        Variance = ((Indicators-Mean)**2).sum(axis=0)/(NumScenarios-1)
+        P={}
+        Var={}
+        for b,(i,j) in enumerate(self.BackupLinks):
+            P[i,j]=float(Mean[b])
+            Var[i,j]=float(Variance[b])
+        return P,Var
+
+class SQEvaluator(object):
+    """ Closed-form superquantile of the backup links of a fixed design.
+
+    It has the interface and outputs of SuperquantileModel.SQModel (q and z0 per link), but instead of
+    solving the LP the loads of each link are computed in one matrix product and their superquantile with
+    partial sorting (see GetSuperquantiles), so no solver is needed. As for the LP, q[i,j] is the
+    superquantile of the load minus link_capacity[i,j], and z0[i,j] the quantile minus link_capacity[i,j].
+
+    Parameters
+    ----------
+    imp_samp: importance sampling vector
+    nodes: set of nodes
+    links: set of links (backup links)
+    capacity: capacities per link based on random failures
+    epsilon: survivability factor
+    N: number of random scenarios
+    backup_link: backup routes indexed by (i,j,s,d)
+    link_capacity: capacity per link
+
+    """
+
+    def __init__(self,imp_samp,nodes,links,capacity,epsilon,N,backup_link,link_capacity):
+        '''
+        Constructor
+        '''
+        self.__links = [tuple(link) for link in links]
+        self.__nodes = nodes
+        self.__epsilon = epsilon
+        self.__N = N
+        self.__impSample = imp_samp
+        Routes = np.array([[backup_link[i,j,s,d] for s,d in self.__links] for i,j in self.__links], dtype=float).reshape(len(self.__links), -1)
+        self.__LinkCapacity = np.array([link_capacity[i,j] for i,j in self.__links], dtype=float)
+        if isinstance(capacity, ScenarioSet):
+            self.__Loads = capacity.GetScenarios(0, N).GetLoads(Routes, self.__links)
+        else:
+            self.__Loads = np.dot(GetCapacityMatrix(capacity, N, self.__links), Routes.T)
+
+    def optimize(self,MipGap=None, TimeLimit=None, LogLevel = None):
+        """Compute the superquantile and z0 of each link (MipGap and TimeLimit are not used)."""
+        Superquantiles, Quantiles, Duals = GetSuperquantiles(self.__Loads.T, self.__impSample, self.__N, self.__epsilon)
+        if not np.isfinite(Superquantiles).all():
+            print('Optimal value not found!\n')
+            return {}, {}
+
+        SuperQuantileSolution = {}
+        OptimalZnot = {}
+        for b,(i,j) in enumerate(self.__links):
+            SuperQuantileSolution[i,j] = float(Superquantiles[b]-self.__LinkCapacity[b])
+            OptimalZnot[i,j] = float(Quantiles[b]-self.__LinkCapacity[b])
+            if LogLevel == 1:
+                print('q[%s][%s] %g' % (i,j,SuperQuantileSolution[i,j]))
+                print('z0[%s][%s] %g' % (i,j,OptimalZnot[i,j]))
+        return SuperQuantileSolution, OptimalZnot
+
+    def reset(self):
+        '''
+        Reset model solution (nothing is kept between calls)
+        '''
+
+def ThreadGetBufferedFailureProb(MasterSeed, FailureProb, Start, Stop, Links, CapPerLink, BackupLinks, CapPerBackupLink, OptBackupLinks, StreamSize):    
     """Thread to calculate the buffered failure probability.
 
     Parameters
     ----------
-    RandSeed : Random seed (necessary for multiprocessing calls).
+    MasterSeed : Master random seed (scenarios Start to Stop come from the streams spawned from it).
     FailureProb: Failure probability for each edge (link) in the graph.
-    NumScenarios : Number of scenarios to be generated.
+    Start: Index of the first scenario.
+    Stop: Index after the last scenario.
     Links: Graph edges (links)
     CapPerLink: Set of edge (link) capacity (weight).
     BackupLinks: Set of backup edges (links).
     CapPerBackupLink: Set of backup edge (link) capacity (weight)
     OptBackupLinks: Set of backup edges (links).
+    StreamSize: Number of scenarios per random stream.
     
     Returns
     -------
     P: Buffered failure probability.
 
     """
-    if RandSeed != None:
-        np.random.seed(RandSeed)
+    Y = GetStreamFailures(MasterSeed, FailureProb, Start, Stop, len(Links), StreamSize)
+    
+    Evaluator = BFPEvaluator(Links, BackupLinks, CapPerBackupLink, OptBackupLinks)
+    I = Evaluator.GetIndicators(Y*np.asarray(CapPerLink))
     
-    Y = np.random.binomial(1, FailureProb, (NumScenarios,len(Links)))
-     
-    Scenarios={}
-    for k in range(NumScenarios):
-        Index=0
-        for s,d in Links:
-            Scenarios[k,s,d]=CapPerLink[Index]*Y[k,Index]
-            Index=Index+1
-        
     P={}
-    for i,j in BackupLinks:
-        P[i,j] = 0
-        for k in range(NumScenarios):
-            Psd=0
-            for s,d in Links:
-                Psd=Psd+OptBackupLinks[s,d,i,j]*Scenarios[k,s,d]
-            if Psd > CapPerBackupLink[i,j]:
-                P[i,j]=P[i,j]+1
-        P[i,j]=1.0*P[i,j]/NumScenarios
+    for b,(i,j) in enumerate(Evaluator.BackupLinks):
+        P[i,j]=float(I[:,b].sum())/(Stop-Start)
     return P
 
+class RunningStats(object):
+    """ Running mean and variance per column, updated one block of samples at a time.
+
+    Blocks are merged with the parallel form of Welford's algorithm, so only the count,
+    the mean and the sum of squared deviations are kept in memory.
+
+    Parameters
+    ----------
+    NumColumns: Number of estimated quantities (e.g. backup links).
+
+    """
+
+    def __init__(self, NumColumns):
+        '''
+        Constructor
+        '''
+        self.Count = 0
+        self.Mean = np.zeros(NumColumns)
+        self.M2 = np.zeros(NumColumns)
+
+    def Update(self, Block):
+        """Add a (NumSamples, NumColumns) block of samples."""
+        Block = np.asarray(Block, dtype=float)
+        if Block.shape[0] == 0:
+            return
+        BlockMean = Block.mean(axis=0)
+        self.Merge(Block.shape[0], BlockMean, ((Block-BlockMean)**2).sum(axis=0))
+
+    def Merge(self, Count, Mean, M2):
+        """Add the statistics (count, mean and sum of squared deviations) of another group of samples."""
+        if Count == 0:
+            return
+        Total = self.Count+Count
+        Delta = Mean-self.Mean
+        self.Mean = self.Mean+Delta*Count/Total
+        self.M2 = self.M2+M2+Delta**2*(1.0*self.Count*Count/Total)
+        self.Count = Total
+
+    def GetVariance(self):
+        """Return the sample variance of each column."""
+        return self.M2/(self.Count-1)
+
 class QoS(object):
     '''
     classdocs
@@ -124,32 +387,13 @@ class QoS(object):
         Returns
         -------
         P: Buffered failure probability.
-        I: Indicator (1 if overloaded the backup capacity and 0 otherwise)
+        Var: Variance of the buffered failure probability.
     
         """
-        P={}
-        I={}
-#         t1=time.time()
-        for i,j in BackupLinks:
-            P[i,j] = 0
-#             t2=time.time()
-            for k in xrange(NumScenarios):
-                Psd=0
-                for s,d in Links:
-                    Psd=Psd+BackupRoutes[s,d,i,j]*Scenarios[k,s,d]
-#                 Psd=[BackupRoutes[i,j,s,d]*Scenarios[k,s,d] for s,d in Links]
-                I[k,i,j]=0
-                if Psd > CapPerBackupLink[i,j]:
-                    I[k,i,j]=1
-                    if ImportanceSampling:
-                        I[k,i,j]=ImportanceSampling[k]
-                    P[i,j]=P[i,j]+I[k,i,j]
-            P[i,j]=1.0*P[i,j]/NumScenarios
-#             print('t2=%g'%(time.time()-t2))
-#         print('t1=%g'%(time.time()-t1))    
-        Var = self.__GetVariance(NumScenarios, BackupLinks, P, I)
+        Evaluator = BFPEvaluator(Links, BackupLinks, CapPerBackupLink, BackupRoutes)
+        I = Evaluator.GetOverloads(Evaluator.GetScenarioLoads(Scenarios, NumScenarios), GetWeights(ImportanceSampling, NumScenarios))
             
-        return P,Var
+        return Evaluator.GetStatistics(I)
 
     def GetBufferedFailureProb2(self,ImportanceSampling, Scenarios, NumScenarios, Connections, Links, BackupLinks, CapPerBackupLink, BackupRoutes):    
         """Calculate the buffered failure probability.
@@ -169,119 +413,184 @@ class QoS(object):
         Returns
         -------
         P: Buffered failure probability.
-        I: Indicator (1 if overloaded the backup capacity and 0 otherwise)
+        Var: Variance of the buffered failure probability.
     
         """
-        P={}
-        I={}
-#         t1=time.time()
-        for i,j in BackupLinks:
-            P[i,j] = 0
-#             t2=time.time()
-            for k in xrange(NumScenarios):
-                Psd=0
-                for s,d in Connections:
-                    Psd=Psd+BackupRoutes[s,d,i,j]*Scenarios[k,s,d]
-#                 Psd=[BackupRoutes[i,j,s,d]*Scenarios[k,s,d] for s,d in Links]
-                I[k,i,j]=0
-                if Psd > CapPerBackupLink[i,j]:
-                    I[k,i,j]=1
-                    if ImportanceSampling:
-                        I[k,i,j]=ImportanceSampling[k]
-                    P[i,j]=P[i,j]+I[k,i,j]
-            P[i,j]=1.0*P[i,j]/NumScenarios
-#             print('t2=%g'%(time.time()-t2))
-#         print('t1=%g'%(time.time()-t1))    
-        Var = self.__GetVariance(NumScenarios, BackupLinks, P, I)
+        Evaluator = BFPEvaluator(Connections, BackupLinks, CapPerBackupLink, BackupRoutes)
+        I = Evaluator.GetOverloads(Evaluator.GetScenarioLoads(Scenarios, NumScenarios), GetWeights(ImportanceSampling, NumScenarios))
             
+        return Evaluator.GetStatistics(I)
+
+    def GetBufferedFailureProbStream(self,RandSeed, FailureProb, FailureProbIS, NumScenarios, BlockSize, Links, CapPerLink, BackupLinks, CapPerBackupLink, BackupRoutes):
+        """Calculate the buffered failure probability generating and evaluating the scenarios block by block.
+
+        Each block is discarded after being evaluated and only the running mean and variance are kept,
+        so the memory does not depend on the number of scenarios.
+
+        Parameters
+        ----------
+        RandSeed : Random seed (None for a random initialization).
+        FailureProb: Failure probability for each edge (link) in the graph.
+        FailureProbIS: Importance sampling failure probability, or None if importance sampling is not used.
+        NumScenarios : Number of scenarios to be generated.
+        BlockSize: Number of scenarios generated and evaluated at a time (None for 10000).
+        Links: Graph edges (links)
+        CapPerLink: Set of edge (link) capacity (weight).
+        BackupLinks: Set of backup edges (links).
+        CapPerBackupLink: Set of backup edge (link) capacity (weight)
+        BackupRoutes: Set of backup edges (links).
+
+        Returns
+        -------
+        P: Buffered failure probability.
+        Var: Variance of the buffered failure probability.
+
+        """
+        Evaluator = BFPEvaluator(Links, BackupLinks, CapPerBackupLink, BackupRoutes)
+        Stats = RunningStats(len(Evaluator.BackupLinks))
+
+        for Indicators in self.__GetIndicatorBlocks(Evaluator, RandSeed, FailureProb, FailureProbIS, NumScenarios, BlockSize, Links, CapPerLink):
+            Stats.Update(Indicators)
+
+        P = self.__GetLinkDict(Evaluator.BackupLinks, Stats.Mean)
+        Var = self.__GetLinkDict(Evaluator.BackupLinks, Stats.GetVariance())
         return P,Var
 
-    def __GetVariance(self,NumScenarios,BkpLinks,Mean,Indicator):    
-        """Calculate the buffered failure probability.
-    
+    def GetBufferedFailureProbSequential(self,RandSeed, FailureProb, FailureProbIS, MaxScenarios, BlockSize, Links, CapPerLink, BackupLinks, CapPerBackupLink, BackupRoutes, RelativeHalfWidth=None, AbsoluteHalfWidth=None, Interval=None, MinScenarios=None):
+        """Calculate the buffered failure probability sampling until the confidence interval is tight enough.
+
+        Blocks of scenarios are generated and evaluated until the confidence interval half-width
+        of every backup link meets the target, or until MaxScenarios scenarios have been used.
+        The half-width target of link (i,j) is the largest of AbsoluteHalfWidth[i,j] and RelativeHalfWidth[i,j]*P[i,j].
+        A relative target is only met once P[i,j] > 0 (a link with no overload yet has a zero half-width
+        that says nothing about a rare event), so a link without hits needs an absolute target to stop.
+
         Parameters
         ----------
-        NumScenarios : Number of scenarios used in the mean estimation.
+        RandSeed : Random seed (None for a random initialization).
+        FailureProb: Failure probability for each edge (link) in the graph.
+        FailureProbIS: Importance sampling failure probability, or None if importance sampling is not used.
+        MaxScenarios : Sample budget (maximum number of scenarios to be generated).
+        BlockSize: Number of scenarios generated and evaluated at a time (None for 10000).
+        Links: Graph edges (links)
+        CapPerLink: Set of edge (link) capacity (weight).
         BackupLinks: Set of backup edges (links).
-        Mean: Result from GetBufferedFailureProb function
-        Indicator: Result from GetBufferedFailureProb function
-        
+        CapPerBackupLink: Set of backup edge (link) capacity (weight)
+        BackupRoutes: Set of backup edges (links).
+        RelativeHalfWidth: Target half-width relative to the estimate (a value for all links or a dictionary per backup link).
+        AbsoluteHalfWidth: Target absolute half-width (a value for all links or a dictionary per backup link).
+        Interval: Quantile of the confidence interval (None for 1.96, i.e. 95%).
+        MinScenarios: Minimum number of scenarios before checking the stopping rule (None for one block).
+
         Returns
         -------
-        P: Variance of buffered failure probability.
-    
+        P: Buffered failure probability.
+        Var: Variance of the buffered failure probability.
+        ConfidenceInterval: Half-width of the confidence interval.
+        NumSamples: Number of scenarios actually used.
+
         """
-        Var={}
-        for i,j in BkpLinks:
-            Var[i,j] = 0
-            for k in xrange(NumScenarios):
-                Var[i,j]=Var[i,j]+(Indicator[k,i,j]-Mean[i,j])**2
-            Var[i,j]=1.0*Var[i,j]/(NumScenarios-1)
-        return Var
+        if RelativeHalfWidth == None and AbsoluteHalfWidth == None:
+            raise ValueError('A relative or absolute half-width target must be given')
+        if Interval == None:
+            Interval=1.96 #95%
+
+        Evaluator = BFPEvaluator(Links, BackupLinks, CapPerBackupLink, BackupRoutes)
+        Relative = self.__GetLinkArray(Evaluator.BackupLinks, RelativeHalfWidth)
+        Absolute = self.__GetLinkArray(Evaluator.BackupLinks, AbsoluteHalfWidth)
+        Stats = RunningStats(len(Evaluator.BackupLinks))
+
+        for Indicators in self.__GetIndicatorBlocks(Evaluator, RandSeed, FailureProb, FailureProbIS, MaxScenarios, BlockSize, Links, CapPerLink):
+            Stats.Update(Indicators)
+            if Stats.Count < 2 or (MinScenarios != None and Stats.Count < MinScenarios):
+                continue
+            HalfWidth = Interval*np.sqrt(Stats.GetVariance()/Stats.Count)
+            AbsoluteMet = (Absolute > 0) & (HalfWidth <= Absolute)
+            RelativeMet = (Stats.Mean > 0) & (HalfWidth <= Relative*Stats.Mean)
+            if np.all(AbsoluteMet | RelativeMet):
+                break
+
+        HalfWidth = Interval*np.sqrt(Stats.GetVariance()/Stats.Count)
+        P = self.__GetLinkDict(Evaluator.BackupLinks, Stats.Mean)
+        Var = self.__GetLinkDict(Evaluator.BackupLinks, Stats.GetVariance())
+        ConfidenceInterval = self.__GetLinkDict(Evaluator.BackupLinks, HalfWidth)
+        return P,Var,ConfidenceInterval,Stats.Count
 
+    def __GetIndicatorBlocks(self, Evaluator, RandSeed, FailureProb, FailureProbIS, NumScenarios, BlockSize, Links, CapPerLink):
+        """Generate blocks of scenarios and yield their (weighted) overload indicators."""
+        if BlockSize == None:
+            BlockSize = 10000
 
+        SamplingProb = FailureProb if FailureProbIS is None else FailureProbIS
+        for Block in GetStreamBlocks(GetMasterSeed(RandSeed), SamplingProb, NumScenarios, BlockSize, len(Links), Links, CapPerLink, 4096):
+            Gamma = None
+            if FailureProbIS is not None:
+                Gamma = GetImportanceSamplingWeights(Links, Block, Block.NumScenarios, FailureProb, FailureProbIS)
+            yield Evaluator.GetIndicators(Block.GetCapacityMatrix(Links), Gamma)
 
-    def GetBufferedFailureProbPar(self,FailureProb, NumScenarios, Links, CapPerLink, BackupLinks, CapPerBackupLink, OptBackupLinks):    
+    def __GetLinkDict(self, Links, Values):
+        """Convert an array with one value per link to a dictionary indexed by link."""
+        Result={}
+        for b,(i,j) in enumerate(Links):
+            Result[i,j]=float(Values[b])
+        return Result
+
+    def __GetLinkArray(self, Links, Values):
+        """Convert a value for all links, or a dictionary indexed by link, to an array (0 for None)."""
+        if Values is None:
+            return np.zeros(len(Links))
+        if isinstance(Values, dict):
+            return np.array([Values[i,j] for i,j in Links], dtype=float)
+        return np.full(len(Links), Values, dtype=float)
+
+    def GetBufferedFailureProbPar(self,FailureProb, NumScenarios, Links, CapPerLink, BackupLinks, CapPerBackupLink, OptBackupLinks, MasterSeed=None, StreamSize=None):    
         """Calculate the buffered failure probability using multiprocessing.
     
+        The scenarios come from independent random streams spawned from the master seed (see
+        ScenariosGenerator.GetBinomialRandStreams), so the result does not depend on the number of processors.
+    
         Parameters
         ----------
         FailureProb: Failure probability for each edge (link) in the graph.
-        Scenarios: Group of scenarios with random failure following Binomial distribution.
         NumScenarios : Number of scenarios to be generated.
         Links: Graph edges (links)
-        NumLinks: Number of edges (links) on each scenario.
         CapPerLink: Set of edge (link) capacity (weight).
         BackupLinks: Set of backup edges (links).
         CapPerBackupLink: Set of backup edge (link) capacity (weight)
         OptBackupLinks: Set of backup edges (links).
+        MasterSeed : Master random seed (None for a random initialization).
+        StreamSize: Number of scenarios per random stream (None for 4096).
         
         Returns
         -------
         P: Buffered failure probability.
     
         """
+        if StreamSize == None:
+            StreamSize = 4096
+        MasterSeed = GetMasterSeed(MasterSeed)
+        
         #check the number of available processors 
         nb_processes = multiprocessing.cpu_count ()
         print('Using %g available processors' %nb_processes)
         
-        p = Pool(nb_processes)
+        #divide the scenarios to be generated among the available processes, aligned to the random streams
+        Chunks = GetChunks(NumScenarios, nb_processes, StreamSize)
+        
+        p = Pool(len(Chunks))
         
-        #divide the total number of scenarios to be generated among the available processes 
-        Dividend = NumScenarios/nb_processes
-        Rest=NumScenarios-(nb_processes*Dividend)
-        NewDivision=[0 for k in range(nb_processes)]
-        args = [0 for k in range(nb_processes)]
-        start=0
-        for k in range(nb_processes):
-            NewDivision[k]=Dividend
-            if k == 0:
-                NewDivision[k]=NewDivision[k]+Rest
-                start=0
-            else:
-                start=start+NewDivision[k-1]
-            
-            RandSeed = int(np.random.exponential(time.clock()))
-            args[k]=(RandSeed, FailureProb, NewDivision[k], Links, CapPerLink, BackupLinks, CapPerBackupLink, OptBackupLinks) 
-                        
         # launching multiple evaluations asynchronously *may* use more processes
-        multiple_results = [p.apply_async(ThreadGetBufferedFailureProb, (args[k])) for k in range(nb_processes)]
+        multiple_results = [p.apply_async(ThreadGetBufferedFailureProb, (MasterSeed, FailureProb, Start, Stop, Links, CapPerLink, BackupLinks, CapPerBackupLink, OptBackupLinks, StreamSize)) for Start,Stop in Chunks]
         
         P={}
         for i,j in BackupLinks:
             P[i,j]=0
-        Counter=0
-        for res in multiple_results:
+        for (Start,Stop),res in zip(Chunks,multiple_results):
             AvgP = res.get(timeout=1000)
             for i,j in BackupLinks:
-                P[i,j]=P[i,j] + 1.0*AvgP[i,j]
-            Counter=Counter+1
-        
-        for i,j in BackupLinks:
-            P[i,j]=1.0*P[i,j]/Counter
+                P[i,j]=P[i,j] + 1.0*AvgP[i,j]*(Stop-Start)/NumScenarios
             
         p.close()
         p.join()
         
         return P
-    
\ No newline at end of file
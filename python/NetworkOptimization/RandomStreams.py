@@ -0,0 +1,107 @@
+'''
+Created on Oct 18, 2026
+
+@author: Edielson
+'''
+import numpy as np
+
+from NetworkOptimization.ScenarioSet import ScenarioSet
+
+def GetMasterSeed(MasterSeed):
+    """Return the master seed, drawing a new one from the operating system entropy if None."""
+    if MasterSeed == None:
+        MasterSeed = np.random.SeedSequence().entropy
+    return MasterSeed
+
+def GetStreamFailures(MasterSeed, FailureProb, Start, Stop, NumLinks, StreamSize):
+    """Generate the failure matrix of scenarios Start to Stop from independent random streams.
+
+    Scenario k always comes from stream k//StreamSize, the (k//StreamSize)-th stream spawned from
+    the master seed, so the scenarios do not depend on how the range is divided among workers.
+
+    Parameters
+    ----------
+    MasterSeed : Master random seed.
+    FailureProb: Failure probability, a value for all links or an array with one value per link.
+    Start: Index of the first scenario.
+    Stop: Index after the last scenario.
+    NumLinks: Number of edges (links) on each scenario.
+    StreamSize: Number of scenarios per random stream.
+
+    Returns
+    -------
+    Y: (Stop-Start, NumLinks) failure matrix.
+
+    """
+    Y = np.empty((Stop-Start, NumLinks), dtype=np.uint8)
+    Index = Start
+    while Index < Stop:
+        Stream = Index//StreamSize
+        Size = min(Stop, (Stream+1)*StreamSize)-Index
+        RandGen = np.random.Generator(np.random.PCG64(np.random.SeedSequence(MasterSeed, spawn_key=(Stream,))))
+        #skip the scenarios of the stream before Index (one draw per link)
+        RandGen.bit_generator.advance((Index-Stream*StreamSize)*NumLinks)
+        Y[Index-Start:Index-Start+Size] = RandGen.random((Size,NumLinks)) < FailureProb
+        Index = Index+Size
+    return Y
+
+def GetChunks(NumScenarios, NumChunks, StreamSize):
+    """Divide scenarios 0 to NumScenarios into at most NumChunks ranges aligned to the random streams."""
+    NumStreams = -(-NumScenarios//StreamSize)
+    NumChunks = max(1, min(NumChunks, NumStreams))
+    Bounds = [min(NumScenarios, (NumStreams*k//NumChunks)*StreamSize) for k in range(NumChunks+1)]
+    return [(Bounds[k], Bounds[k+1]) for k in range(NumChunks) if Bounds[k] < Bounds[k+1]]
+
+def GetStreamBlocks(MasterSeed, FailureProb, NumScenarios, BlockSize, NumLinks, Links, CapPerLink, StreamSize):
+    """Generate scenarios 0 to NumScenarios of the random streams of the master seed, one block of at most BlockSize scenarios at a time."""
+    Generated=0
+    while Generated < NumScenarios:
+        Size = min(BlockSize, NumScenarios-Generated)
+        Y = GetStreamFailures(MasterSeed, FailureProb, Generated, Generated+Size, NumLinks, StreamSize)
+        Generated=Generated+Size
+        yield ScenarioSet(Y, Links, CapPerLink)
+
+def GetStreamScenarios(MasterSeed, FailureProb, FailureProbIS, Start, Stop, Links, CapPerLink, StreamSize):
+    """Return scenarios Start to Stop of the random streams of the master seed and their importance sampling weights.
+
+    The scenarios are sampled with FailureProbIS, or with FailureProb (and no weights, None) when FailureProbIS is None.
+
+    """
+    Failures = GetStreamFailures(MasterSeed, FailureProb if FailureProbIS is None else FailureProbIS, Start, Stop, len(Links), StreamSize)
+    Scenarios = ScenarioSet(Failures, Links, CapPerLink)
+    if FailureProbIS is None:
+        return Scenarios, None
+    return Scenarios, GetImportanceSamplingWeights(Links, Scenarios, Stop-Start, FailureProb, FailureProbIS)
+
+def GetImportanceSamplingWeights(Links, Scenarios, NumScenarios, FailureProb, FailureProbIS, Log=False):
+    """Calculate the importance sampling weights of the scenarios as an array (see ScenariosGenerator.GetImportanceSamplingWeights).
+
+    Links with p == p_IS do not change the weights. A scenario that is impossible under p (a failed link
+    with p == 0, or a working link with p == 1) has weight 0, and sampling with p_IS == 0 (or p_IS == 1)
+    a link that fails (or works) with p raises a ValueError.
+
+    """
+    FailureProb = np.broadcast_to(np.asarray(FailureProb, dtype=float), (len(Links),))
+    FailureProbIS = np.broadcast_to(np.asarray(FailureProbIS, dtype=float), (len(Links),))
+    Same = FailureProb == FailureProbIS
+    if np.any(~Same & ((FailureProbIS == 0) | (FailureProbIS == 1))):
+        raise ValueError('The importance sampling failure probability must be in (0,1) where it differs from the failure probability')
+    #links whose failure (or working) state is impossible under p, excluded from the log space sums
+    ZeroFailed = ~Same & (FailureProb == 0)
+    ZeroWorking = ~Same & (FailureProb == 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        Working = np.where(Same | ZeroWorking, 0.0, np.log1p(-FailureProb)-np.log1p(-FailureProbIS))
+        Failed = np.where(Same | ZeroFailed, 0.0, np.log(FailureProb)-np.log(FailureProbIS))-Working
+    Weights = np.vstack([Failed, ZeroFailed, ZeroWorking])
+
+    if isinstance(Scenarios, ScenarioSet):
+        Sums = Scenarios.GetScenarios(0, NumScenarios).GetWeightedSum(Weights, Links)
+    else:
+        Failures = np.array([[Scenarios[k,s,d] != 0 for s,d in Links] for k in range(NumScenarios)], dtype=float).reshape(NumScenarios, len(Links))
+        Sums = np.dot(Failures, Weights.T)
+    LogGamma = Sums[:,0]+Working.sum()
+    LogGamma[(Sums[:,1] > 0) | (Sums[:,2] < ZeroWorking.sum())] = -np.inf
+
+    if Log:
+        return LogGamma
+    return np.exp(LogGamma)
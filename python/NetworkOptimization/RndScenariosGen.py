@@ -9,6 +9,11 @@ import json
 import multiprocessing
 from multiprocessing import Pool
 
+from NetworkOptimization.ScenarioSet import ScenarioSet
+from NetworkOptimization.ScenarioStore import ScenarioStore, SaveScenarioStore, IsScenarioStore
+from NetworkOptimization.RandomStreams import GetMasterSeed, GetStreamFailures, GetChunks, GetStreamBlocks, GetImportanceSamplingWeights
+from NetworkOptimization.ParallelExecutor import ParallelExecutor
+
 def ThreadGetRand(RandSeed, FailureProb,NumScenarios, StartIndex, NumLinks, Links, CapPerLink):    
     """Generate random failure scenarios based on Binomial distribution.
 
@@ -24,6 +29,7 @@ def ThreadGetRand(RandSeed, FailureProb,NumScenarios, StartIndex, NumLinks, Link
     
     Returns
     -------
+    StartIndex: Start index for each thread
     Scenarios: Group of scenarios with random failure following Binomial distribution.
 
     """     
@@ -32,13 +38,7 @@ def ThreadGetRand(RandSeed, FailureProb,NumScenarios, StartIndex, NumLinks, Link
     
     Y = np.random.binomial(1, FailureProb, (NumScenarios,NumLinks))
      
-    Scenarios={}
-    for k in range(NumScenarios):
-        Index=0
-        for s,d in Links:
-            Scenarios[StartIndex+k,s,d]=CapPerLink[Index]*Y[k,Index]
-            Index=Index+1
-    return Scenarios
+    return StartIndex, ScenarioSet(Y, Links, CapPerLink)
 
 class ScenariosGenerator(object):
     '''
@@ -56,7 +56,7 @@ class ScenariosGenerator(object):
         Parameters
         ----------
         RandSeed : Random seed (necessary for multiprocessing calls).
-        FailureProb: Failure probability for each edge (link) in the graph.
+        FailureProb: Failure probability, a value for all links or an array with one value per link.
         NumScenarios : Number of scenarios to be generated.
         NumLinks: Number of edges (links) on each scenario.
         Links: Graph edges (links)
@@ -72,62 +72,107 @@ class ScenariosGenerator(object):
         
         Y = np.random.binomial(1, FailureProb, (NumScenarios,NumLinks))
          
-        Scenarios={}
-        for k in range(NumScenarios):
-            Index=0
-            for s,d in Links:
-                Scenarios[k,s,d]=CapPerLink[Index]*Y[k,Index]
-                Index=Index+1
-        return Scenarios
+        return ScenarioSet(Y, Links, CapPerLink)
     
-    def GetBinomialRandPar(self,FailureProb,NumScenarios, NumLinks, Links, CapPerLink):    
+    def GetBinomialBlocks(self,RandSeed, FailureProb, NumScenarios, BlockSize, NumLinks, Links, CapPerLink, StreamSize=None):
+        """Generate random failure scenarios based on Binomial distribution, one block at a time.
+
+        Only one block is kept in memory, so the number of scenarios is not limited by the available memory.
+        The scenarios are the same as in GetBinomialRandStreams for the same seed, whatever the block size.
+
+        Parameters
+        ----------
+        RandSeed : Master random seed (None for a random initialization).
+        FailureProb: Failure probability for each edge (link) in the graph.
+        NumScenarios : Number of scenarios to be generated.
+        BlockSize: Maximum number of scenarios on each block.
+        NumLinks: Number of edges (links) on each scenario.
+        Links: Graph edges (links)
+        CapPerLink: Edge (link) capacity (weight)
+        StreamSize: Number of scenarios per random stream (None for 4096).
+
+        Returns
+        -------
+        Blocks: Generator of ScenarioSet objects with at most BlockSize scenarios each.
+
+        """
+        if StreamSize == None:
+            StreamSize = 4096
+
+        return GetStreamBlocks(GetMasterSeed(RandSeed), FailureProb, NumScenarios, BlockSize, NumLinks, Links, CapPerLink, StreamSize)
+
+    def GetBinomialRandStreams(self,MasterSeed, FailureProb, NumScenarios, NumLinks, Links, CapPerLink, NumProcesses=None, StreamSize=None, Executor=None):
+        """Generate random failure scenarios based on Binomial distribution from independent random streams.
+
+        The scenarios are divided into streams of StreamSize scenarios, each one seeded by a stream spawned
+        from the master seed. The result is bit-identical for the same master seed whatever the number of processes.
+        Repeated parallel calls should share an Executor, so the worker pool is started once.
+
+        Parameters
+        ----------
+        MasterSeed : Master random seed (None for a random initialization).
+        FailureProb: Failure probability for each edge (link) in the graph.
+        NumScenarios : Number of scenarios to be generated.
+        NumLinks: Number of edges (links) on each scenario.
+        Links: Graph edges (links)
+        CapPerLink: Edge (link) capacity (weight)
+        NumProcesses: Number of processes (None for the number of available processors, or the processes of Executor).
+        StreamSize: Number of scenarios per random stream (None for 4096, or the stream size of Executor).
+        Executor: Running worker pool (ParallelExecutor with the same links) used instead of starting a new one.
+
+        Returns
+        -------
+        Scenarios: Group of scenarios with random failure following Binomial distribution.
+
+        """
+        if Executor != None:
+            if StreamSize == None:
+                StreamSize = Executor.StreamSize
+            if NumProcesses == None:
+                NumProcesses = Executor.NumProcesses
+            if [tuple(link) for link in Links] != Executor.Links or StreamSize != Executor.StreamSize:
+                raise ValueError('The executor has other links or another stream size')
+        if StreamSize == None:
+            StreamSize = 4096
+        if NumProcesses == None:
+            NumProcesses = multiprocessing.cpu_count()
+        MasterSeed = GetMasterSeed(MasterSeed)
+
+        Chunks = GetChunks(NumScenarios, NumProcesses, StreamSize)
+        if len(Chunks) <= 1:
+            return ScenarioSet(GetStreamFailures(MasterSeed, FailureProb, 0, NumScenarios, NumLinks, StreamSize), Links, CapPerLink)
+
+        #workers write their scenario range straight into a shared failure matrix
+        if Executor != None:
+            return Executor.GetBinomialRand(MasterSeed, FailureProb, NumScenarios)
+        with ParallelExecutor(Links, CapPerLink, len(Chunks), StreamSize) as Executor:
+            return Executor.GetBinomialRand(MasterSeed, FailureProb, NumScenarios)
+
+    def GetBinomialRandPar(self,FailureProb,NumScenarios, NumLinks, Links, CapPerLink, MasterSeed=None):
         """Generate random failure scenarios based on Binomial distribution using multiprocessing.
-    
+
         Parameters
         ----------
         FailureProb: Failure probability for each edge (link) in the graph.
         NumScenarios : Number of scenarios to be generated.
         NumLinks: Number of edges (links) on each scenario.
         Links: Graph edges (links)
-        CapPerLink: Edge (link) capacity (weight) 
-        
+        CapPerLink: Edge (link) capacity (weight)
+        MasterSeed : Master random seed (None for a random initialization).
+
         Returns
         -------
         Scenarios: Group of scenarios with random failure following Binomial distribution.
-    
+
         """
-        
+
         #check the number of available processors
         nb_processes = multiprocessing.cpu_count ()
         print('Number of available processors: %g' %nb_processes)
-        
-        p = Pool(nb_processes)
-         
-        Dividend = NumScenarios/nb_processes
-        Rest=NumScenarios-(nb_processes*Dividend)
-        NewDivision=[0 for k in range(nb_processes)]
-        args = [0 for k in range(nb_processes)]
-        start=0
-        for k in range(nb_processes):
-            NewDivision[k]=Dividend
-            if k == 0:
-                NewDivision[k]=NewDivision[k]+Rest
-                start=0
-            else:
-                start=start+NewDivision[k-1]
-            RandSeed = k
-            args[k]=(RandSeed, FailureProb, NewDivision[k], start, NumLinks, Links, CapPerLink)
-    
-        # launching multiple evaluations asynchronously *may* use more processes
-        multiple_results = [p.apply_async(ThreadGetRand, (args[k])) for k in range(nb_processes)]
-        
-        Scenarios={}
-        for res in multiple_results:
-            Scenarios.update(res.get(timeout=500))
-        
-        return Scenarios    
-    
-    
+
+        return self.GetBinomialRandStreams(MasterSeed, FailureProb, NumScenarios, NumLinks, Links, CapPerLink, nb_processes)
+
+
     def GetImportanceSamplingVector(self,Links, Scenarios, NumScenarios, FailureProb, FailureProbIS):
         """Calculate the importance sampling vector.
         
@@ -144,15 +189,38 @@ class ScenariosGenerator(object):
         Gamma: Importance sampling vector.
     
         """
+        Weights = self.GetImportanceSamplingWeights(Links, Scenarios, NumScenarios, FailureProb, FailureProbIS)
+        
         Gamma={}
         for k in range(NumScenarios):
-            sum_failure=0
-            for s,d in Links:
-                sum_failure=sum_failure+Scenarios[k,s,d]
-            Gamma[k]=(FailureProb**(sum_failure)*(1-FailureProb)**(len(Links)-sum_failure))/(FailureProbIS**(sum_failure)*(1-FailureProbIS)**(len(Links)-sum_failure))
+            Gamma[k]=float(Weights[k])
             
         return Gamma
     
+    def GetImportanceSamplingWeights(self,Links, Scenarios, NumScenarios, FailureProb, FailureProbIS, Log=False):
+        """Calculate the importance sampling weights of the scenarios as an array.
+        
+        The likelihood ratio of scenario k is computed in log space from its failed links,
+        log(Gamma[k]) = sum over failed links of log(p/p_IS) + sum over working links of log((1-p)/(1-p_IS)),
+        so it does not underflow for large networks or small probabilities. Links with p == p_IS are left out,
+        and p_IS must be in (0,1) on the other links (see RandomStreams.GetImportanceSamplingWeights).
+        
+        Parameters
+        ----------
+        Links: Graph edges (links)
+        Scenarios: Set of scenarios with random failure following Binomial distribution.
+        NumScenarios : Number of scenarios.
+        FailureProb: Failure probability, a value for all links or an array with one value per link in Links.
+        FailureProbIS: Importance sampling failure probability, a value for all links or an array with one value per link in Links.
+        Log: True to return log(Gamma) instead of Gamma.
+        
+        Returns
+        -------
+        Gamma: Array with the importance sampling weight (or its logarithm) of each scenario.
+    
+        """
+        return GetImportanceSamplingWeights(Links, Scenarios, NumScenarios, FailureProb, FailureProbIS, Log)
+    
     def GetBinomialFromUnif(self,UnifScenarios,FailureProb,NumScenarios,NumLinks, Links, CapPerLink):    
         """Generate random failure scenarios based on Binomial distribution.
     
@@ -170,15 +238,9 @@ class ScenariosGenerator(object):
         Scenarios: Group of scenarios with random failure following Binomial distribution.
     
         """ 
-        Scenarios={}
-        for k in range(NumScenarios):
-            Index=0
-            for s,d in Links:
-                Scenarios[k,s,d]=0
-                if UnifScenarios[k,Index] < FailureProb:
-                    Scenarios[k,s,d]=CapPerLink[Index]
-                Index=Index+1
-        return Scenarios
+        Y = np.asarray(UnifScenarios)[:NumScenarios,:NumLinks] < FailureProb
+        
+        return ScenarioSet(Y, Links, CapPerLink)
     
     def GetUniformRand(self,RandSeed, NumScenarios, NumLinks):    
         """Generate random failure scenarios based on Binomial distribution.
@@ -216,14 +278,25 @@ class ScenariosGenerator(object):
         NumFailures: Number of failures on each scenario.
     
         """
+        if isinstance(Scenarios, ScenarioSet):
+            return Scenarios.GetScenarios(0, NumScenarios).GetFailedCapacity(Links).tolist()
+        
         NumFailures=[0 for i in range(NumScenarios)]
         for i in range(NumScenarios):
             for s,d in Links:
                 NumFailures[i] = NumFailures[i] + Scenarios[i,s,d]
         return NumFailures
     
-    def SaveRandScenario(self, file_name,scenarios): 
-        """Save the optimal backup network to the file ``filename``.""" 
+    def SaveRandScenario(self, file_name,scenarios, FailureProb=None, FailureProbIS=None, Seed=None, Gamma=None): 
+        """Save the random scenarios to the file ``filename``.
+        
+        A ScenarioSet is saved in the binary scenario format (see ScenarioStore), together with
+        the probabilities, seed and importance sampling vector given. Dictionaries are saved as JSON.
+        
+        """ 
+        if isinstance(scenarios, ScenarioSet):
+            SaveScenarioStore(file_name, scenarios, FailureProb, FailureProbIS, Seed, Gamma)
+            return
         
         data = {"scenarios": [scenario for scenario in scenarios],
                 "scenario_status": [scenarios[scenario] for scenario in scenarios]}
@@ -232,10 +305,16 @@ class ScenariosGenerator(object):
         f.close()
         
     def LoadRandScenarios(self,file_name): 
-        """Load a backup network from the file ``filename``.  
-        Returns the backup network solution saved in the file. 
+        """Load the random scenarios from the file ``filename``.  
+        Returns the scenarios saved in the file. 
+        
+        Binary scenario files are memory mapped and returned as a ScenarioSet; use ScenarioStore
+        directly to read only part of the scenarios or the saved importance sampling vector.
       
         """ 
+        if IsScenarioStore(file_name):
+            return ScenarioStore(file_name).GetScenarios()
+        
         f = open(file_name, "r") 
         data = json.load(f) 
         f.close() 
@@ -249,4 +328,4 @@ class ScenariosGenerator(object):
             RndScenarios[k,s,d]=scenarios_status[IndexAux]
             IndexAux=IndexAux+1
         
-        return RndScenarios    
\ No newline at end of file
+        return RndScenarios
@@ -0,0 +1,346 @@
+'''
+Created on Oct 18, 2026
+
+@author: Edielson
+'''
+import numpy as np
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+
+def GetCapacityMatrix(Scenarios, NumScenarios, Links):
+    """Get the (NumScenarios, NumLinks) matrix of failed capacity for a set of scenarios.
+
+    Parameters
+    ----------
+    Scenarios: Set of scenarios (ScenarioSet or dictionary indexed by (k,s,d)).
+    NumScenarios : Number of scenarios in the set.
+    Links: Graph edges (links) defining the column order.
+
+    Returns
+    -------
+    Capacity: Matrix with the failed capacity of each link (column) on each scenario (row).
+
+    """
+    if isinstance(Scenarios, ScenarioSet):
+        return Scenarios.GetCapacityMatrix(Links)[:NumScenarios]
+
+    Capacity = np.zeros((NumScenarios, len(Links)))
+    for k in range(NumScenarios):
+        Index=0
+        for s,d in Links:
+            Capacity[k,Index]=Scenarios[k,s,d]
+            Index=Index+1
+    return Capacity
+
+
+def AggregateScenarios(Scenarios, NumScenarios, Links, Gamma=None):
+    """Collapse identical failure scenarios into one weighted scenario.
+
+    The scenarios are grouped by failure pattern (the rows of the failure matrix, or of the packed words),
+    and each group is replaced by one scenario weighted by the sum of its importance sampling weights
+    (its multiplicity without importance sampling). Since each scenario enters the buffered failure
+    probability as Gamma[k]*max(0, load), the weighted scenarios give the same model with fewer rows.
+
+    Parameters
+    ----------
+    Scenarios: Set of scenarios (ScenarioSet or dictionary indexed by (k,s,d)).
+    NumScenarios : Number of scenarios in the set.
+    Links: Graph edges (links) defining the column order.
+    Gamma: Importance sampling weight of each scenario (array), or None.
+
+    Returns
+    -------
+    Capacity: (NumUnique, NumLinks) matrix with the failed capacity of each distinct scenario.
+    Weights: Weight of each distinct scenario (sum of Gamma, or number of scenarios in the group).
+    Inverse: Index of the distinct scenario of each original scenario.
+
+    """
+    if isinstance(Scenarios, PackedScenarioSet):
+        Rows = Scenarios.Words[:NumScenarios]
+    elif isinstance(Scenarios, ScenarioSet):
+        Rows = Scenarios.Failures[:NumScenarios]
+    else:
+        Rows = GetCapacityMatrix(Scenarios, NumScenarios, Links)
+    Rows = np.ascontiguousarray(Rows)
+    Keys = Rows.view(np.dtype((np.void, Rows.dtype.itemsize*Rows.shape[1]))).ravel()
+    Unique, First, Inverse = np.unique(Keys, return_index=True, return_inverse=True)
+    Inverse = Inverse.ravel()
+
+    if isinstance(Scenarios, ScenarioSet):
+        Capacity = Scenarios.GetSubset(First).GetCapacityMatrix(Links)
+    else:
+        Capacity = Rows[First]
+    if Gamma is None:
+        Weights = np.bincount(Inverse, minlength=len(First)).astype(float)
+    else:
+        Weights = np.bincount(Inverse, weights=np.asarray(Gamma, dtype=float)[:NumScenarios], minlength=len(First))
+    return Capacity, Weights, Inverse
+
+def GetNumWords(NumLinks):
+    """Return the number of 64-bit words needed to store one bit per link."""
+    return -(-NumLinks//64)
+
+def PackFailures(Failures):
+    """Pack a (NumScenarios, NumLinks) failure matrix into (NumScenarios, NumWords) little-endian uint64 words.
+
+    Bit b of word w holds the failure of link 64*w+b; the unused bits of the last word are zero.
+
+    """
+    Failures = np.asarray(Failures, dtype=np.uint8)
+    NumScenarios, NumLinks = Failures.shape
+    Padded = np.zeros((NumScenarios, 64*GetNumWords(NumLinks)), dtype=np.uint8)
+    Padded[:,:NumLinks] = Failures != 0
+    return np.packbits(Padded, axis=1, bitorder='little').view('<u8')
+
+def UnpackFailures(Words, NumLinks):
+    """Unpack (NumScenarios, NumWords) uint64 words into a (NumScenarios, NumLinks) uint8 failure matrix."""
+    Words = np.ascontiguousarray(Words, dtype='<u8')
+    return np.unpackbits(Words.view(np.uint8), axis=1, count=NumLinks, bitorder='little')
+
+#number of set bits of each byte, for numpy versions without bitwise_count
+ByteCount = np.unpackbits(np.arange(256, dtype=np.uint8).reshape(-1,1), axis=1).sum(axis=1).astype(np.uint8)
+
+def PopCount(Words):
+    """Return the number of set bits of each uint64 word."""
+    Words = np.ascontiguousarray(Words, dtype='<u8')
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(Words)
+    return ByteCount[Words.view(np.uint8)].reshape(Words.shape+(8,)).sum(axis=-1)
+
+
+class ScenarioSet(Mapping):
+    """ Set of failure scenarios stored as a dense failure matrix.
+
+    The scenarios are kept as a (NumScenarios, NumLinks) uint8 failure mask together with
+    the capacity of each link. The object is also a read-only dictionary indexed by (k,s,d),
+    returning the failed capacity of link (s,d) on scenario k, so it can be used wherever
+    the dictionary of scenarios was expected.
+
+    Parameters
+    ----------
+    Failures: (NumScenarios, NumLinks) array with 1 if the link failed and 0 otherwise.
+    Links: Graph edges (links)
+    CapPerLink: Edge (link) capacity (weight)
+
+    """
+
+    def __init__(self, Failures, Links, CapPerLink):
+        '''
+        Constructor
+        '''
+        self.Failures = np.ascontiguousarray(Failures, dtype=np.uint8)
+        self.Links = [tuple(link) for link in Links]
+        self.CapPerLink = np.asarray(CapPerLink)
+        self.LinkIndex = dict((link,index) for index,link in enumerate(self.Links))
+        self.NumScenarios, self.NumLinks = self.Failures.shape
+
+        if len(self.CapPerLink) != self.NumLinks or len(self.Links) != self.NumLinks:
+            raise ValueError('Failure matrix has %d columns for %d links and %d capacities'
+                             %(self.NumLinks, len(self.Links), len(self.CapPerLink)))
+
+    def __getitem__(self, key):
+        k,s,d = key
+        if not 0 <= k < self.NumScenarios or (s,d) not in self.LinkIndex:
+            raise KeyError(key)
+        Index = self.LinkIndex[s,d]
+        return (self.CapPerLink[Index]*self.Failures[k,Index]).item()
+
+    def __iter__(self):
+        for k in range(self.NumScenarios):
+            for s,d in self.Links:
+                yield k,s,d
+
+    def __len__(self):
+        return self.NumScenarios*self.NumLinks
+
+    def __contains__(self, key):
+        try:
+            k,s,d = key
+        except (TypeError, ValueError):
+            return False
+        return 0 <= k < self.NumScenarios and (s,d) in self.LinkIndex
+
+    def GetLinkColumns(self, Links):
+        """Return the column index of each link in ``Links``."""
+        return np.array([self.LinkIndex[tuple(link)] for link in Links], dtype=np.intp)
+
+    def GetCapacityMatrix(self, Links=None):
+        """Return the (NumScenarios, NumLinks) matrix of failed capacity.
+
+        Parameters
+        ----------
+        Links: Graph edges (links) defining the column order. None for the order of the set.
+
+        """
+        Capacity = self.Failures*self.CapPerLink
+        if Links is not None:
+            Capacity = Capacity[:,self.GetLinkColumns(Links)]
+        return Capacity
+
+    def GetNumFailures(self):
+        """Return the number of failed links on each scenario."""
+        return self.Failures.sum(axis=1, dtype=np.int64)
+
+    def GetFailedCapacity(self, Links=None):
+        """Return the failed capacity on each scenario (sum over ``Links``, None for all links)."""
+        return self.GetCapacityMatrix(Links).sum(axis=1)
+
+    def GetLoads(self, RoutingMatrix, Links=None):
+        """Return the (NumScenarios, NumRows) load routed by each row of ``RoutingMatrix``.
+
+        Parameters
+        ----------
+        RoutingMatrix: (NumRows, NumLinks) matrix with the fraction of each link routed by each row.
+        Links: Graph edges (links) of the columns of the routing matrix. None for the order of the set.
+
+        """
+        return np.dot(self.GetCapacityMatrix(Links), np.asarray(RoutingMatrix).T)
+
+    def GetWeightedSum(self, Weights, Links=None):
+        """Return the (NumScenarios, NumRows) sum of the (NumRows, NumLinks) weights of the failed links.
+
+        Parameters
+        ----------
+        Weights: (NumRows, NumLinks) matrix with the weight of each link on each row.
+        Links: Graph edges (links) of the columns of the weights. None for the order of the set.
+
+        """
+        Failures = self.Failures
+        if Links is not None:
+            Failures = Failures[:,self.GetLinkColumns(Links)]
+        return np.dot(Failures, np.asarray(Weights, dtype=float).T)
+
+    def GetScenarios(self, Start, Stop):
+        """Return the scenarios from ``Start`` to ``Stop`` as a new set."""
+        return ScenarioSet(self.Failures[Start:Stop], self.Links, self.CapPerLink)
+
+    def GetSubset(self, Indexes):
+        """Return the scenarios of the given indexes as a new set."""
+        return ScenarioSet(self.Failures[Indexes], self.Links, self.CapPerLink)
+
+    def GetPacked(self):
+        """Return the scenarios as a PackedScenarioSet (one bit per link)."""
+        return PackedScenarioSet(PackFailures(self.Failures), self.Links, self.CapPerLink)
+
+
+class PackedScenarioSet(ScenarioSet):
+    """ Set of failure scenarios stored with one bit per link.
+
+    The failures of each scenario are packed into little-endian uint64 words (see PackFailures),
+    8 times less memory than the dense set. Failure counts and failed capacities are computed
+    with popcounts of the words masked by each group of links, without unpacking the scenarios.
+    The ``Failures`` attribute unpacks the whole set on each access.
+
+    Parameters
+    ----------
+    Words: (NumScenarios, NumWords) array of uint64 words (it may be a memory map).
+    Links: Graph edges (links)
+    CapPerLink: Edge (link) capacity (weight)
+
+    """
+
+    #above this number of masks (rows times distinct weights), blocks of scenarios are unpacked instead
+    MaxMasks = 8
+    #number of scenarios processed at a time
+    BlockSize = 4096
+
+    def __init__(self, Words, Links, CapPerLink):
+        '''
+        Constructor
+        '''
+        self.Words = np.asarray(Words, dtype='<u8')
+        self.Links = [tuple(link) for link in Links]
+        self.CapPerLink = np.asarray(CapPerLink)
+        self.LinkIndex = dict((link,index) for index,link in enumerate(self.Links))
+        self.NumScenarios = self.Words.shape[0]
+        self.NumLinks = len(self.Links)
+
+        if self.Words.ndim != 2 or self.Words.shape[1] != GetNumWords(self.NumLinks) or len(self.CapPerLink) != self.NumLinks:
+            raise ValueError('Packed failures with shape %s for %d links and %d capacities'
+                             %(self.Words.shape, self.NumLinks, len(self.CapPerLink)))
+
+    @property
+    def Failures(self):
+        return UnpackFailures(self.Words, self.NumLinks)
+
+    def __getitem__(self, key):
+        k,s,d = key
+        if not 0 <= k < self.NumScenarios or (s,d) not in self.LinkIndex:
+            raise KeyError(key)
+        Index = self.LinkIndex[s,d]
+        Failed = int(self.Words[k,Index//64]) >> (Index%64) & 1
+        return (self.CapPerLink[Index]*Failed).item()
+
+    def GetNumFailures(self):
+        """Return the number of failed links on each scenario."""
+        NumFailures = np.empty(self.NumScenarios, dtype=np.int64)
+        for Start in range(0, self.NumScenarios, self.BlockSize):
+            Block = self.Words[Start:Start+self.BlockSize]
+            NumFailures[Start:Start+len(Block)] = PopCount(Block).sum(axis=1)
+        return NumFailures
+
+    def GetFailedCapacity(self, Links=None):
+        """Return the failed capacity on each scenario (sum over ``Links``, None for all links)."""
+        Columns = self.GetLinkColumns(Links) if Links is not None else np.arange(self.NumLinks)
+        return self.GetWeightedSum(self.CapPerLink[Columns].reshape(1,-1), Links)[:,0]
+
+    def GetLoads(self, RoutingMatrix, Links=None):
+        """Return the (NumScenarios, NumRows) load routed by each row of ``RoutingMatrix``.
+
+        Parameters
+        ----------
+        RoutingMatrix: (NumRows, NumLinks) matrix with the fraction of each link routed by each row.
+        Links: Graph edges (links) of the columns of the routing matrix. None for the order of the set.
+
+        """
+        Columns = self.GetLinkColumns(Links) if Links is not None else np.arange(self.NumLinks)
+        return self.GetWeightedSum(np.asarray(RoutingMatrix, dtype=float)*self.CapPerLink[Columns], Links)
+
+    def GetWeightedSum(self, Weights, Links=None):
+        """Return the (NumScenarios, NumRows) sum of the (NumRows, NumLinks) weights of the failed links.
+
+        The links of each row are grouped by weight and each group is packed into a mask, so the
+        sum is the weighted popcount of the scenario words masked by each group. With more than
+        MaxMasks masks, each block of scenarios is unpacked and multiplied by the weights instead.
+
+        Parameters
+        ----------
+        Weights: (NumRows, NumLinks) matrix with the weight of each link on each row.
+        Links: Graph edges (links) of the columns of the weights. None for the order of the set.
+
+        """
+        if Links is not None:
+            Expanded = np.zeros((len(Weights), self.NumLinks))
+            Expanded[:,self.GetLinkColumns(Links)] = Weights
+            Weights = Expanded
+        Weights = np.asarray(Weights, dtype=float)
+        Values = np.unique(Weights[Weights != 0])
+        Result = np.zeros((self.NumScenarios, Weights.shape[0]))
+        if len(Values)*Weights.shape[0] > self.MaxMasks:
+            for Start in range(0, self.NumScenarios, self.BlockSize):
+                Block = UnpackFailures(self.Words[Start:Start+self.BlockSize], self.NumLinks)
+                Result[Start:Start+len(Block)] = np.dot(Block, Weights.T)
+            return Result
+
+        Masks = [PackFailures(Weights == Value) for Value in Values]
+        for Start in range(0, self.NumScenarios, self.BlockSize):
+            Block = self.Words[Start:Start+self.BlockSize]
+            for Value,Mask in zip(Values, Masks):
+                Result[Start:Start+len(Block)] += Value*PopCount(Block[:,None,:] & Mask[None,:,:]).sum(axis=2)
+        return Result
+
+    def GetScenarios(self, Start, Stop):
+        """Return the scenarios from ``Start`` to ``Stop`` as a new set (sharing the words)."""
+        return PackedScenarioSet(self.Words[Start:Stop], self.Links, self.CapPerLink)
+
+    def GetSubset(self, Indexes):
+        """Return the scenarios of the given indexes as a new set."""
+        return PackedScenarioSet(self.Words[Indexes], self.Links, self.CapPerLink)
+
+    def GetPacked(self):
+        """Return the scenarios as a PackedScenarioSet (one bit per link)."""
+        return self
@@ -0,0 +1,157 @@
+'''
+Created on Oct 18, 2026
+
+@author: Edielson
+'''
+import json
+import struct
+import numpy as np
+
+from NetworkOptimization.ScenarioSet import ScenarioSet, PackedScenarioSet, GetNumWords, PackFailures
+
+#file layout: magic, header length (uint64), JSON header, padding, failure words, gamma vector
+Magic = b'NOSCEN01'
+Alignment = 64
+
+
+def GetHeaderValue(Value):
+    """Return a JSON friendly copy of a probability or seed (scalars, vectors or None)."""
+    if isinstance(Value, np.ndarray):
+        return Value.tolist()
+    if isinstance(Value, np.generic):
+        return Value.item()
+    return Value
+
+def SaveScenarioStore(FileName, Scenarios, FailureProb=None, FailureProbIS=None, Seed=None, Gamma=None, BlockSize=None):
+    """Save a set of scenarios to the binary scenario file ``FileName``.
+
+    Parameters
+    ----------
+    FileName: Name of the scenario file.
+    Scenarios: Set of scenarios (ScenarioSet or PackedScenarioSet).
+    FailureProb: Failure probability used for the scenarios (saved in the header).
+    FailureProbIS: Importance sampling failure probability used to generate the scenarios (saved in the header).
+    Seed: Random seed used to generate the scenarios (saved in the header).
+    Gamma: Importance sampling vector (None to save the scenarios only).
+    BlockSize: Number of scenarios packed at a time (None for 65536).
+
+    """
+    if BlockSize == None:
+        BlockSize = 65536
+    NumScenarios, NumLinks = Scenarios.NumScenarios, Scenarios.NumLinks
+    NumWords = GetNumWords(NumLinks)
+
+    Header = {"num_scenarios": NumScenarios,
+              "num_links": NumLinks,
+              "num_words": NumWords,
+              "links": [list(link) for link in Scenarios.Links],
+              "cap_per_link": Scenarios.CapPerLink.tolist(),
+              "failure_prob": GetHeaderValue(FailureProb),
+              "failure_prob_is": GetHeaderValue(FailureProbIS),
+              "seed": GetHeaderValue(Seed),
+              "gamma": Gamma is not None}
+    Data = json.dumps(Header).encode('utf-8')
+    Offset = len(Magic)+8+len(Data)
+    Offset = Offset + (-Offset)%Alignment
+
+    f = open(FileName, "wb")
+    f.write(Magic)
+    f.write(struct.pack('<Q', len(Data)))
+    f.write(Data)
+    f.write(b'\0'*(Offset-len(Magic)-8-len(Data)))
+    for Start in range(0, NumScenarios, BlockSize):
+        if isinstance(Scenarios, PackedScenarioSet):
+            f.write(np.ascontiguousarray(Scenarios.Words[Start:Start+BlockSize]).tobytes())
+        else:
+            f.write(PackFailures(Scenarios.Failures[Start:Start+BlockSize]).tobytes())
+    if Gamma is not None:
+        if isinstance(Gamma, dict):
+            Gamma = [Gamma[k] for k in range(NumScenarios)]
+        f.write(np.asarray(Gamma, dtype='<f8')[:NumScenarios].tobytes())
+    f.close()
+
+def IsScenarioStore(FileName):
+    """Return True if ``FileName`` is a binary scenario file."""
+    f = open(FileName, "rb")
+    Data = f.read(len(Magic))
+    f.close()
+    return Data == Magic
+
+
+class ScenarioStore(object):
+    """ Binary scenario file opened with memory mapping.
+
+    The failure matrix is kept on disk with one bit per link and scenario, and only the scenarios
+    requested are read and unpacked, so one scenario bank can be shared by many optimizations and
+    assessments without parsing or loading the whole file.
+
+    Parameters
+    ----------
+    FileName: Name of the scenario file (written by SaveScenarioStore).
+
+    """
+
+    def __init__(self, FileName):
+        '''
+        Constructor
+        '''
+        f = open(FileName, "rb")
+        if f.read(len(Magic)) != Magic:
+            f.close()
+            raise ValueError('%s is not a scenario file' %FileName)
+        Length, = struct.unpack('<Q', f.read(8))
+        Header = json.loads(f.read(Length).decode('utf-8'))
+        f.close()
+
+        self.FileName = FileName
+        self.NumScenarios = Header["num_scenarios"]
+        self.NumLinks = Header["num_links"]
+        self.NumWords = Header["num_words"]
+        self.Links = [tuple(link) for link in Header["links"]]
+        self.CapPerLink = np.asarray(Header["cap_per_link"])
+        self.FailureProb = Header["failure_prob"]
+        self.FailureProbIS = Header["failure_prob_is"]
+        self.Seed = Header["seed"]
+
+        Offset = len(Magic)+8+Length
+        Offset = Offset + (-Offset)%Alignment
+        if self.NumScenarios > 0:
+            self.Words = np.memmap(FileName, dtype='<u8', mode='r', offset=Offset, shape=(self.NumScenarios, self.NumWords))
+        else:
+            self.Words = np.zeros((0, self.NumWords), dtype='<u8')
+        self.Gamma = None
+        if Header["gamma"]:
+            if self.NumScenarios > 0:
+                self.Gamma = np.memmap(FileName, dtype='<f8', mode='r', offset=Offset+8*self.NumScenarios*self.NumWords, shape=(self.NumScenarios,))
+            else:
+                self.Gamma = np.zeros(0)
+
+    def __len__(self):
+        return self.NumScenarios
+
+    def GetScenarios(self, Start=0, Stop=None):
+        """Return the scenarios from ``Start`` to ``Stop`` (None for the last one) as a PackedScenarioSet.
+
+        The set is built over the memory map, so the scenarios are only read when used.
+
+        """
+        if Stop == None:
+            Stop = self.NumScenarios
+        return PackedScenarioSet(self.Words[Start:Stop], self.Links, self.CapPerLink)
+
+    def GetScenarioSet(self, Start=0, Stop=None):
+        """Return the scenarios from ``Start`` to ``Stop`` (None for the last one) as a dense ScenarioSet."""
+        return ScenarioSet(self.GetScenarios(Start, Stop).Failures, self.Links, self.CapPerLink)
+
+    def GetBlocks(self, BlockSize):
+        """Return a generator of PackedScenarioSet objects with at most BlockSize scenarios each."""
+        for Start in range(0, self.NumScenarios, BlockSize):
+            yield self.GetScenarios(Start, Start+BlockSize)
+
+    def GetImportanceSampling(self, Start=0, Stop=None):
+        """Return the saved importance sampling vector from ``Start`` to ``Stop`` (None if it was not saved)."""
+        if self.Gamma is None:
+            return None
+        if Stop == None:
+            Stop = self.NumScenarios
+        return self.Gamma[Start:Stop]
@@ -3,7 +3,10 @@ Created on Fev 05, 2016
  
 @author: Edielson P. Frigieri
 '''
-from gurobipy import Model, GRB, quicksum
+from gurobipy import Model, GRB
+import numpy as np
+
+from NetworkOptimization.ModelBuilder import ModelBuilder, GetLinkNames
  
 class SQModel(object):
     '''
@@ -27,41 +30,35 @@ class SQModel(object):
     __impSample = {}
     __N = 1
         
-    def __init__(self,imp_samp,nodes,links,capacity,epsilon,N,backup_link,link_capacity):
+    def __init__(self,imp_samp,nodes,links,capacity,epsilon,N,backup_link,link_capacity,aggregate=False,reduce=False):
         '''
         Constructor
+
+        With aggregate, identical scenarios are collapsed into weighted ones before the model is built, and
+        with reduce the zero- and single-failure scenarios get their closed form (see ReduceScenarioRows).
         '''
         self.__links = links
         self.__nodes = nodes
         self.__capacity = capacity
         self.__epsilon = epsilon
         self.__N = N
-        self.__loadModel(imp_samp,backup_link,link_capacity)
+        self.__loadModel(imp_samp,backup_link,link_capacity,aggregate,reduce)
                                  
-    def __loadModel(self,imp_samp, backup_link,link_capacity):
+    def __loadModel(self,imp_samp, backup_link,link_capacity,aggregate,reduce):
                  
         # Create optimization model
         self.__model = Model('Backup')
-     
-        for i,j in self.__links:
-            for k in range(self.__N):
-                self.__z[k,i,j] = self.__model.addVar(lb=0,name='z[%s][%s][%s]' % (k,i,j))
-        self.__model.update()
+        Builder = ModelBuilder(self.__model)
+        Failed, Weights = Builder.GetScenarioRows(self.__capacity, self.__N, self.__links, imp_samp, aggregate, self.__epsilon if reduce else None)
         
-        for i,j in self.__links: 
-            self.__z0[i,j] = self.__model.addVar(lb=-GRB.INFINITY,name='z0[%s][%s]' %(i,j))
-        self.__model.update()
-         
-        for i,j in self.__links: 
-            self.__q[i,j] = self.__model.addVar(lb=-GRB.INFINITY,name='q[%s][%s]' %(i,j))
-        self.__model.update()
-        
-        self.__model.modelSense = GRB.MINIMIZE
+        ZStart, Z0Start, ZKeys = Builder.AddScenarioVars(self.__links, len(Failed))
+        QStart = Builder.AddVars(GetLinkNames('q', self.__links, '[%s][%s]'), lb=-GRB.INFINITY, obj=1.0)
         
-        self.__model.setObjective(quicksum(self.__q[i,j] for i,j in self.__links))
+        self.__z = Builder.GetVarDict(ZKeys, ZStart)
+        self.__z0 = Builder.GetVarDict(self.__links, Z0Start)
+        self.__q = Builder.GetVarDict(self.__links, QStart)
         
-        self.__model.update()
-         
+        self.__model.modelSense = GRB.MINIMIZE
             
         #------------------------------------------------------------------------#
         #                    Constraints definition                              #
@@ -70,21 +67,16 @@ class SQModel(object):
         #------------------------------------------------------------------------#
           
         # Buffer probability I
-        for i,j in self.__links:
-            self.__model.addConstr(self.__z0[i,j] + 1/(self.__N*self.__epsilon)*quicksum(self.__z[k,i,j]*imp_samp[k] for (k) in range(self.__N)) <= self.__q[i,j],'[CONST]Buffer_Prob_I[%s][%s]'%(i,j))
-        self.__model.update()
+        Builder.AddBufferProbConstrs(self.__links, len(Failed), ZStart, Z0Start, self.__epsilon, QStart+np.arange(len(self.__links)), Weights, self.__N)
          
-        # Link capacity constraints
-        for i,j in self.__links:
-            for k in range(self.__N):
-                self.__model.addConstr((quicksum(backup_link[i,j,s,d]*self.__capacity[k,s,d] for s,d in self.__links) - link_capacity[i,j] - self.__z0[i,j]) <= self.__z[k,i,j],'[CONST]Buffer_Prob_II[%s][%s][%s]' % (k,i,j))
-        self.__model.update()
+        # Link capacity constraints, for the fixed routes and capacities (z[k,i,j] >= 0 is the lower bound of z)
+        Routes = np.array([[backup_link[i,j,s,d] for s,d in self.__links] for i,j in self.__links], dtype=float).reshape(len(self.__links), -1)
+        Loads = np.dot(Failed, Routes.T)
+        LinkCapacity = np.array([link_capacity[i,j] for i,j in self.__links], dtype=float)
+        Builder.AddScenarioConstrs(self.__links, ZKeys, ZStart, Z0Start, Constant=LinkCapacity.reshape(-1,1)-Loads.T)
+        Builder.AddZeroLoadConstrs(self.__links, Z0Start, Constant=LinkCapacity)
         
-        # Link capacity constraints
-        for i,j in self.__links:
-            for k in range(self.__N):
-                self.__model.addConstr(self.__z[k,i,j] >= 0,'[CONST]Buffer_Prob_III[%s][%s][%s]' % (k,i,j))
-        self.__model.update()
+        self.BuildStatistics = Builder.Update()
          
     def optimize(self,MipGap, TimeLimit, LogLevel = None):
          
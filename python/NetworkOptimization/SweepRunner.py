@@ -0,0 +1,216 @@
+'''
+Created on Oct 18, 2026
+
+@author: Edielson
+'''
+import os
+import csv
+import json
+import time
+import itertools
+import numpy as np
+import multiprocessing
+from multiprocessing import Pool
+
+from NetworkOptimization.BFPBackupModel import BFPBackupNetwork
+from NetworkOptimization.QualityAssessment import GetModelEvaluator
+from NetworkOptimization.RandomStreams import GetStreamScenarios
+from NetworkOptimization import Tools
+
+# Parameters of a configuration that are not given by the grid
+DefaultConfiguration = {"topology": "full", "num_nodes": 5, "p": 0.025, "p2": None, "epsilon": 0.01,
+                        "num_scenarios": 100, "num_assess": 10000, "seed": 0, "mip_gap": None, "time_limit": None}
+
+# Columns of the results of each configuration (see ThreadSolve)
+ResultColumns = ["status", "objective", "bound", "gap", "build_time", "solve_time", "assess_time",
+                 "num_vars", "num_constrs", "num_backup_links", "max_bfp", "mean_bfp", "error"]
+
+def GetTopology(Name, NumNodes=None):
+    """Return the graph, links and nodes of a topology of Tools: "full" and "ring" (with NumNodes nodes), "nsfnet" or "sprint"."""
+    if Name == "full":
+        G,links,nodes,num_links = Tools.GetFullConnectedNetwork(NumNodes)
+    elif Name == "ring":
+        G,links,nodes,num_links = Tools.GetRingNetwork(NumNodes)
+    elif Name == "nsfnet":
+        G,links,nodes,num_links = Tools.GetFSNETNetwork()
+    elif Name == "sprint":
+        G,links,nodes,num_links = Tools.GetSprintNetwork()
+    else:
+        raise ValueError('Unknown topology %s.' %Name)
+    return G, [tuple(link) for link in links], list(nodes)
+
+def GetJobId(Configuration):
+    """Return the key of a configuration in the checkpoint file."""
+    return json.dumps(Configuration, sort_keys=True)
+
+def GetConfigurations(Grid):
+    """Return the configurations of a grid.
+
+    Parameters
+    ----------
+    Grid: Dictionary with a list of values (or a single value) for any of the parameters of DefaultConfiguration.
+        The configurations are all the combinations of the values, in the order of the grid.
+
+    """
+    Keys = list(Grid.keys())
+    Values = [Grid[key] if isinstance(Grid[key], (list, tuple)) else [Grid[key]] for key in Keys]
+    Configurations = []
+    for Combination in itertools.product(*Values):
+        Configuration = dict(DefaultConfiguration)
+        Configuration.update(zip(Keys, Combination))
+        Configurations.append(Configuration)
+    return Configurations
+
+def ThreadSolve(Configuration, Threads, StreamSize):
+    """Worker job: solve the backup model of a configuration and assess the design out of sample.
+
+    The model scenarios are the first num_scenarios scenarios of the random streams of the seed, and the
+    assessment scenarios are the next num_assess ones. The capacity of every link is 1.
+
+    Returns
+    -------
+    Row: The configuration with the results (see ResultColumns). A failed job has its message in "error".
+
+    """
+    Row = dict(Configuration)
+    Row.update(dict.fromkeys(ResultColumns))
+    try:
+        G, Links, Nodes = GetTopology(Configuration["topology"], Configuration["num_nodes"])
+        CapPerLink = [1 for i in range(len(Links))]
+        Seed, p, p2 = Configuration["seed"], Configuration["p"], Configuration["p2"]
+        NumScenarios, NumAssess = Configuration["num_scenarios"], Configuration["num_assess"]
+
+        Scenarios, Gamma = GetStreamScenarios(Seed, p, p2, 0, NumScenarios, Links, CapPerLink, StreamSize)
+        BackupNet = BFPBackupNetwork()
+        BackupNet.LoadModel(Gamma, Nodes, Links, Scenarios, Configuration["epsilon"], NumScenarios)
+        model = BackupNet.model
+        model.Params.OutputFlag = 0
+        model.Params.Threads = Threads
+        if Configuration["mip_gap"] != None:
+            model.Params.MIPGap = Configuration["mip_gap"]
+        if Configuration["time_limit"] != None:
+            model.Params.TimeLimit = Configuration["time_limit"]
+        SolveStart = time.time()
+        model.optimize()
+        Row.update({"status": model.Status,
+                    "build_time": BackupNet.BuildStatistics["build_time"],
+                    "solve_time": time.time()-SolveStart,
+                    "num_vars": BackupNet.BuildStatistics["num_vars"],
+                    "num_constrs": BackupNet.BuildStatistics["num_constrs"]})
+        if model.SolCount == 0:
+            return Row
+
+        # Out of sample assessment of the (rounded) incumbent
+        AssessStart = time.time()
+        BackupCapacity, BackupRoutes, BackupLinks = BackupNet.GetSolution()
+        Evaluator = GetModelEvaluator(Links, BackupCapacity, BackupRoutes)
+        Assess, AssessGamma = GetStreamScenarios(Seed, p, p2, NumScenarios, NumScenarios+NumAssess, Links, CapPerLink, StreamSize)
+        BufferedP, Variance = Evaluator.GetStatistics(Evaluator.GetOverloads(Evaluator.GetScenarioLoads(Assess, NumAssess), AssessGamma))
+        Row.update({"objective": model.ObjVal,
+                    "bound": model.ObjBound,
+                    "gap": model.MIPGap,
+                    "assess_time": time.time()-AssessStart,
+                    "num_backup_links": sum(1 for value in BackupCapacity.values() if value > 0),
+                    "max_bfp": max(BufferedP.values()) if BufferedP else 0.0,
+                    "mean_bfp": float(np.mean(list(BufferedP.values()))) if BufferedP else 0.0})
+    except Exception as Error:
+        Row["error"] = '%s: %s' %(type(Error).__name__, Error)
+    return Row
+
+def ThreadSolveJob(Job):
+    """Worker job of the pool: return the key and the results of a configuration (see ThreadSolve)."""
+    return GetJobId(Job[0]), ThreadSolve(*Job)
+
+class SweepRunner(object):
+    """ Batch runner of backup design studies over a grid of configurations.
+
+    Each configuration (topology, p, p2, epsilon, K, ...) is a job of a pool of worker processes, which solves
+    the buffered failure probability model with a budget of Threads solver threads and assesses the design
+    out of sample (see ThreadSolve). Each result is appended to a checkpoint file (one JSON line per job) as
+    soon as it arrives, so a sweep that stops is resumed by running it again: the jobs in the checkpoint are
+    not solved twice, except the failed ones (e.g. a license or memory error), which are solved again.
+
+    Parameters
+    ----------
+    CheckpointFile: File with the results of the finished jobs.
+    NumProcesses: Number of worker processes (None for the number of available processors divided by Threads).
+    Threads: Number of solver threads of each job.
+    StreamSize: Number of scenarios per random stream (None for 4096).
+
+    """
+
+    def __init__(self, CheckpointFile, NumProcesses=None, Threads=1, StreamSize=None):
+        '''
+        Constructor
+        '''
+        if NumProcesses == None:
+            NumProcesses = max(1, multiprocessing.cpu_count()//Threads)
+        if StreamSize == None:
+            StreamSize = 4096
+        self.CheckpointFile = CheckpointFile
+        self.NumProcesses = NumProcesses
+        self.Threads = Threads
+        self.StreamSize = StreamSize
+
+    def LoadCheckpoint(self):
+        """Return the results in the checkpoint file indexed by job (see GetJobId).
+
+        A line cut short by a crash is ignored, so its job is solved again. A job with several lines
+        (e.g. a failed job that was retried) has the result of its last line.
+
+        """
+        Results = {}
+        if not os.path.exists(self.CheckpointFile):
+            return Results
+        with open(self.CheckpointFile) as f:
+            for Line in f:
+                try:
+                    Result = json.loads(Line)
+                except ValueError:
+                    continue
+                Results[Result["job"]] = Result["row"]
+        return Results
+
+    def Run(self, Configurations, RetryErrors=True):
+        """Solve the configurations that are not in the checkpoint file.
+
+        Parameters
+        ----------
+        Configurations: List of configurations (see GetConfigurations).
+        RetryErrors: True to solve again the jobs whose result in the checkpoint has an error, False to keep it.
+
+        Returns
+        -------
+        Rows: The results of the configurations, in the given order (see ThreadSolve).
+
+        """
+        Results = self.LoadCheckpoint()
+        Pending = [Configuration for Configuration in Configurations if GetJobId(Configuration) not in Results
+                   or (RetryErrors and Results[GetJobId(Configuration)]["error"] != None)]
+        print('%d configurations, %d in the checkpoint' %(len(Configurations), len(Configurations)-len(Pending)))
+
+        if len(Pending) > 0:
+            Jobs = [(Configuration, self.Threads, self.StreamSize) for Configuration in Pending]
+            with open(self.CheckpointFile, 'a+') as f, Pool(min(self.NumProcesses, len(Jobs))) as Workers:
+                # End a line cut short by a crash before appending
+                if f.tell() > 0:
+                    f.seek(f.tell()-1)
+                    if f.read(1) != '\n':
+                        f.write('\n')
+                for Job, Row in Workers.imap_unordered(ThreadSolveJob, Jobs):
+                    Results[Job] = Row
+                    f.write(json.dumps({"job": Job, "row": Row}) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                    print('%s: objective %s, max p(x)=%s, %s s' %(Job, Row["objective"], Row["max_bfp"], Row["solve_time"]))
+
+        return [Results[GetJobId(Configuration)] for Configuration in Configurations]
+
+    def SaveTable(self, Rows, FileName):
+        """Save the results as a table (CSV file with one row per configuration)."""
+        Columns = list(dict.fromkeys([key for Row in Rows for key in Row]))
+        with open(FileName, 'w', newline='') as f:
+            Writer = csv.DictWriter(f, fieldnames=Columns)
+            Writer.writeheader()
+            for Row in Rows:
+                Writer.writerow(Row)
@@ -3,8 +3,8 @@ from math import sqrt
 
 from NetworkOptimization.BFPBackupModel import BFPBackupNetwork
 from NetworkOptimization.RndScenariosGen import ScenariosGenerator
-from NetworkOptimization.QualityAssessment import QoS
-from NetworkOptimization.SuperquantileModel import SQModel
+from NetworkOptimization.QualityAssessment import QoS, SQEvaluator
+from NetworkOptimization.ParallelExecutor import ParallelExecutor
 from NetworkOptimization import Tools
 
 
@@ -93,13 +93,15 @@ def BFPBackupModelExample(use_parallel,importance_sampling,plot_options,num_node
     start = time.clock()
     if use_parallel == 0:
         print('Normal operation!\n')
-        scenarios_test = ScenariosGen.GetBinomialRand(None, p2, num_scenarios[3], num_links, links, CapPerLink)
-        gamma_test = ScenariosGen.GetImportanceSamplingVector(links, scenarios, num_scenarios[3], p, p2)
-        BufferedP,Variance = SolutionQos.GetBufferedFailureProb(gamma_test, scenarios_test, num_scenarios[3], links, BkpLinks, OptCapacity, BkpRoutes)
+        #scenarios are generated and evaluated block by block, so memory does not grow with num_scenarios[3]
+        BufferedP,Variance = SolutionQos.GetBufferedFailureProbStream(None, p, p2, num_scenarios[3], None, links, CapPerLink, BkpLinks, OptCapacity, BkpRoutes)
          
     else:
         print('Using parallel processing!!\n')
-        BufferedP = SolutionQos.GetBufferedFailureProbPar(p, num_scenarios[3], links, CapPerLink, BkpLinks, OptCapacity, BkpRoutes)
+        #the worker pool is started once and the design is shared with the workers instead of pickled per task
+        with ParallelExecutor(links, CapPerLink) as Executor:
+            Executor.LoadDesign(BkpLinks, OptCapacity, BkpRoutes)
+            BufferedP,Variance = Executor.GetBufferedFailureProb(None, p, p2, num_scenarios[3])
         
     stop = time.clock()        
     print('[%g seconds]Done!\n'%(stop-start))
@@ -125,11 +127,11 @@ def BFPBackupModelExample(use_parallel,importance_sampling,plot_options,num_node
         stop = time.clock()        
         print('[%g seconds]Done!\n'%(stop-start))
             
-        print('Creating super quantile model...')
-        MySQModel = SQModel(gamma,nodes,BkpLinks,scenarios,epsilon,num_scenarios[1],BkpRoutes,OptCapacity)
-        print('Done!\n')
-        print('Solving...\n')
+        print('Computing super quantile...')
+        #closed form for the fixed design (SQModel solves the same problem as an LP)
+        MySQModel = SQEvaluator(gamma,nodes,BkpLinks,scenarios,epsilon,num_scenarios[1],BkpRoutes,OptCapacity)
         SuperQuantile, OptimalZ = MySQModel.optimize(mip_gap,time_limit,None)
+        print('Done!\n')
         
         print('\nSuper quantile assigned per backup link:\n' )
         for i,j in BkpLinks:
@@ -1,12 +1,14 @@
 import networkx as nx
 
 from NetworkOptimization.PathBackupModel import PathBackup
-from NetworkOptimization.Tools import plotGraph, getAllPaths, getLinkPaths
+from NetworkOptimization.PathIndex import PathIndex
+from NetworkOptimization.PathCatalog import PathCatalogCache
+from NetworkOptimization.Tools import plotGraph
 
 import math
 from gurobipy import tuplelist
 
-def PathBackupModelExample(plot_options,num_nodes,p,invstd,mip_gap,time_limit,cutoff):
+def PathBackupModelExample(plot_options,num_nodes,p,invstd,mip_gap,time_limit,cutoff,num_shortest=None,column_generation=0,cache=None):
     ""
     #######################################
     #        Generating graphs
@@ -43,19 +45,14 @@ def PathBackupModelExample(plot_options,num_nodes,p,invstd,mip_gap,time_limit,cu
     #        Optimization Model
     #######################################
     
-    #Find all possible paths in the graph for all source -> destination pairs
-    paths = getAllPaths(G,cutoff)
- 
-    #Find all possible paths for each source (s) -> destination (d) pair
-    Psd = {}
-    for s,d in links:
-        Psd[s,d] = nx.all_simple_paths(G, s, d,cutoff)
-    
-    #Find all s->d paths that uses the i->j link
-    Pij={}
-    for i,j in links:
-        for s,d in links:
-            Pij[i,j,s,d] = getLinkPaths(G,i,j,s,d,cutoff)
+    #Find all possible paths in the graph for all source -> destination pairs (enumerated once per source),
+    #or only the num_shortest shortest backup paths of each pair, with the (s,d) paths that use each link (i,j)
+    #in the link x path incidence of the catalog
+    #(the catalog is loaded from the cache of path catalogs, if any, instead of enumerating the paths again)
+    if cache is None:
+        paths = PathIndex(G,cutoff,num_shortest)
+    else:
+        paths = cache.GetPathIndex(G,cutoff,num_shortest)
     
     capacity={}
     mean={}
@@ -75,7 +72,10 @@ def PathBackupModelExample(plot_options,num_nodes,p,invstd,mip_gap,time_limit,cu
     #optimization
     links = tuplelist(links)
     # Creating a backup network model
-    BackupNet = PathBackup(nodes,links,paths,Psd,Pij,capacity,mean,std,invstd)
+    BackupNet = PathBackup(nodes,links,paths,None,None,capacity,mean,std,invstd)
+    if column_generation == 1:
+        # Add the backup paths that improve the relaxation (e.g. starting from num_shortest=1)
+        print('Paths added by column generation: %d' % BackupNet.generatePaths(G))
     # Find a optimal solution
     solution = BackupNet.optimize(mip_gap,time_limit)
          
@@ -117,8 +117,11 @@ if __name__ == '__main__':
 
     #definition of the graph depth (cutoff) when looking for paths, i.e. path extension
     # Example: CutoffList = [None, 2, 1], will test for no limit, max path extension of  2 and 1
-    CutoffList = [1,2,None]
+    CutoffList = [None,2,1]
+    
+    #cache of path catalogs on disk: the catalogs of cutoff 2 and 1 are derived from the one of no limit
+    Cache = PathCatalogCache('path_catalogs', MaxSize=256*1024*1024)
  
     for cutoff in CutoffList:
-        print('Normal-based backup model with paths: cutoff = %g' % cutoff)  
-        PathBackupModelExample(PlotOptions,NumNodes,p,invstd,MipGap,TimeLimit,cutoff)
\ No newline at end of file
+        print('Normal-based backup model with paths: cutoff = %s' % cutoff)  
+        PathBackupModelExample(PlotOptions,NumNodes,p,invstd,MipGap,TimeLimit,cutoff,cache=Cache)
\ No newline at end of file
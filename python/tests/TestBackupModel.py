@@ -1,9 +1,31 @@
+import os
 import unittest
+import numpy as np
 from NetworkOptimization.BFPBackupModel import *
+from NetworkOptimization.QualityAssessment import GetSuperquantiles
 from NetworkOptimization.RndScenariosGen import *
 from NetworkOptimization.Tools import *
 from datetime import datetime
 
+def GetInstance(seed, p, p2, num_scenarios, cap_per_link=None):
+    """Return the nodes, links, scenarios (sampled with p2 from the random streams of the seed) and importance
+    sampling weights of the full connected network with 4 nodes, whose link capacities alternate between 1 and 2."""
+    G,links,nodes,num_links=GetFullConnectedNetwork(4)
+    links=list(links)
+    if cap_per_link == None:
+        cap_per_link=[1+(i%2) for i in range(num_links)]
+    ScenariosGen = ScenariosGenerator()
+    scenarios = ScenariosGen.GetBinomialRandStreams(seed, p2, num_scenarios, num_links, links, cap_per_link, 1)
+    gamma=ScenariosGen.GetImportanceSamplingVector(links, scenarios, num_scenarios, p, p2)
+    return nodes, links, scenarios, gamma
+
+def GetModel(gamma, nodes, links, scenarios, epsilon, **LoadModelArgs):
+    """Return a BFPBackupNetwork loaded with the scenarios (see LoadModel), without solver output."""
+    BackupNet = BFPBackupNetwork()
+    BackupNet.LoadModel(gamma,nodes,links,scenarios,epsilon,scenarios.NumScenarios,**LoadModelArgs)
+    BackupNet.model.Params.OutputFlag = 0
+    return BackupNet
+
 class TestBackupModel(unittest.TestCase):
 
     def test_save(self):
@@ -56,5 +78,204 @@ class TestBackupModel(unittest.TestCase):
                   
         self.assertTrue(Answer, None)
 
+    def test_load_model(self):
+        
+        epsilon=0.1
+        num_scenarios = 6
+
+        nodes,links,scenarios,gamma = GetInstance(3, 0.1, 0.2, num_scenarios)
+        num_links = len(links)
+        BackupNet = GetModel(gamma,nodes,links,scenarios,epsilon)
+        model = BackupNet.model
+        
+        self.assertEqual(model.NumVars, num_links*(num_links+num_scenarios+2))
+        #z[k,i,j] >= 0 is a bound, not a constraint
+        self.assertEqual(model.NumConstrs, num_links*(1+num_scenarios+len(nodes)))
+        self.assertIsNone(model.getConstrByName('[CONST]Buffer_Prob_III[0][%s][%s]' % links[0]))
+        self.assertEqual(BackupNet.z[0,links[0][0],links[0][1]].LB, 0)
+        
+        stats = BackupNet.BuildStatistics
+        self.assertEqual(stats["num_vars"], model.NumVars)
+        self.assertEqual(stats["num_constrs"], model.NumConstrs)
+        self.assertEqual(stats["nonzeros"], model.NumNZs)
+        self.assertEqual(stats["constrs"]["Buffer_Prob_II"], num_links*num_scenarios)
+        
+        #(sum_sd bBackupLink[i,j,s,d]*Capacity[k,s,d] - BackupCapacity[i,j] - z0[i,j])*Gamma[k] - z[k,i,j] <= 0
+        for k in range(num_scenarios):
+            for i,j in links[:3]:
+                constr = model.getConstrByName('[CONST]Buffer_Prob_II[%s][%s][%s]' % (k,i,j))
+                row = model.getRow(constr)
+                coeffs = dict((row.getVar(n).VarName, row.getCoeff(n)) for n in range(row.size()))
+                expected = {'Backup_Capacity[%s,%s]' % (i,j): -gamma[k], 'z0[%s][%s]' % (i,j): -gamma[k], 'z[%s][%s][%s]' % (k,i,j): -1}
+                for s,d in links:
+                    if scenarios[k,s,d] != 0:
+                        expected['Backup_Link[%s,%s,%s,%s]' % (i,j,s,d)] = scenarios[k,s,d]*gamma[k]
+                self.assertEqual(set(coeffs), set(expected))
+                for name in expected:
+                    self.assertAlmostEqual(coeffs[name], expected[name])
+                self.assertEqual(constr.Sense, GRB.LESS_EQUAL)
+        
+        constr = model.getConstrByName('Flow1[%s,%s,%s]' % (links[0][0],links[0][0],links[0][1]))
+        self.assertEqual(constr.RHS, 1)
+        self.assertEqual(model.getRow(constr).size(), 2*(len(nodes)-1))
+
+    def test_aggregate_scenarios(self):
+        
+        epsilon=0.1
+        num_scenarios = 40
+
+        nodes,links,scenarios,gamma = GetInstance(3, 0.05, 0.1, num_scenarios)
+        num_unique = len(set(map(tuple, scenarios.Failures)))
+        
+        BackupNet = GetModel(gamma,nodes,links,scenarios,epsilon)
+        BackupNet.model.optimize()
+        Aggregated = GetModel(gamma,nodes,links,scenarios,epsilon,Aggregate=True)
+        Aggregated.model.optimize()
+        
+        stats = Aggregated.BuildStatistics
+        self.assertLess(num_unique, num_scenarios)
+        self.assertEqual(stats["num_scenarios"], num_unique)
+        self.assertAlmostEqual(stats["compression_ratio"], 1.0*num_scenarios/num_unique)
+        self.assertEqual(stats["constrs"]["Buffer_Prob_II"], len(links)*num_unique)
+        self.assertAlmostEqual(Aggregated.model.ObjVal, BackupNet.model.ObjVal, places=5)
+
+    def test_reduce_scenarios(self):
+        
+        epsilon=0.1
+        num_scenarios = 40
+
+        nodes,links,scenarios,gamma = GetInstance(5, 0.015, 0.03, num_scenarios)
+        num_failures = scenarios.GetNumFailures()
+        
+        BackupNet = GetModel(gamma,nodes,links,scenarios,epsilon)
+        BackupNet.model.optimize()
+        Reduced = GetModel(gamma,nodes,links,scenarios,epsilon,Reduce=True)
+        Reduced.model.optimize()
+        
+        stats = Reduced.BuildStatistics
+        num_single = len(set(scenarios.Failures[num_failures == 1].argmax(axis=1)))
+        self.assertGreater(stats["zero_failure"], 0)
+        self.assertEqual(stats["zero_failure"], (num_failures == 0).sum())
+        self.assertEqual(stats["single_failure"], (num_failures == 1).sum())
+        self.assertEqual(stats["num_scenarios"], (num_failures > 1).sum()+num_single)
+        self.assertEqual(stats["constrs"]["Zero_Load"], len(links))
+        self.assertAlmostEqual(Reduced.model.ObjVal, BackupNet.model.ObjVal, places=5)
+
+    def test_decompose(self):
+        
+        epsilon=0.05
+        num_scenarios = 40
+
+        nodes,links,scenarios,gamma = GetInstance(7, 0.1, 0.2, num_scenarios)
+        num_links = len(links)
+        BackupNet = GetModel(gamma,nodes,links,scenarios,epsilon)
+        BackupNet.model.optimize()
+        
+        Master = GetModel(gamma,nodes,links,scenarios,epsilon,Decompose=True)
+        self.assertEqual(Master.model.NumVars, num_links*(num_links+1))
+        self.assertEqual(Master.BuildStatistics["constrs"]["Buffer_Cut"], num_links)
+        
+        #Optimize writes the model to bpbackup.lp
+        self.addCleanup(os.remove, 'bpbackup.lp')
+        OptCapacity,BackupRoutes,BkpLinks = Master.Optimize()
+        self.assertGreater(Master.Cuts.NumLazy, 0)
+        self.assertAlmostEqual(Master.model.ObjVal, BackupNet.model.ObjVal, places=5)
+        
+        #the capacity of each backup link covers the superquantile of its load
+        Routes = np.array([[BackupRoutes[i,j,s,d] for s,d in links] for i,j in links])
+        Superquantiles = GetSuperquantiles(np.dot(Routes, scenarios.GetCapacityMatrix(links).T), gamma, num_scenarios, epsilon)[0]
+        for b,(i,j) in enumerate(links):
+            self.assertLessEqual(Superquantiles[b], OptCapacity[i,j]+1e-6)
+
+    def test_update_model(self):
+        
+        epsilon=0.05
+        num_scenarios = 40
+
+        nodes,links,scenarios,gamma = GetInstance(7, 0.1, 0.2, num_scenarios)
+        other = GetInstance(8, 0.1, 0.1, num_scenarios)[2]
+        BackupNet = GetModel(gamma,nodes,links,scenarios,epsilon)
+        NumVars = BackupNet.model.NumVars
+        
+        #each change gives the same optimum as a new model
+        def AssertOptimum(weights, capacity, epsilon):
+            BackupNet.model.optimize()
+            NewNet = GetModel(weights,nodes,links,capacity,epsilon)
+            NewNet.model.optimize()
+            self.assertEqual(BackupNet.model.NumVars, NumVars)
+            self.assertAlmostEqual(BackupNet.model.ObjVal, NewNet.model.ObjVal, places=5)
+        
+        BackupNet.SetEpsilon(0.1)
+        AssertOptimum(gamma, scenarios, 0.1)
+        BackupNet.SetGamma(None)
+        AssertOptimum(None, scenarios, 0.1)
+        BackupNet.ReplaceScenarios(other, gamma)
+        AssertOptimum(gamma, other, 0.1)
+        
+        #a change of the number of scenario rows needs a new model
+        Aggregated = GetModel(None,nodes,links,scenarios,epsilon,Aggregate=True)
+        self.assertRaises(ValueError, Aggregated.ReplaceScenarios, other)
+
+    def test_update_decomposed_model(self):
+        
+        epsilon=0.05
+        num_scenarios = 40
+
+        nodes,links,scenarios,gamma = GetInstance(7, 0.1, 0.2, num_scenarios)
+        other,other_gamma = GetInstance(8, 0.1, 0.2, num_scenarios)[2:]
+        Master = GetModel(gamma,nodes,links,scenarios,epsilon,Decompose=True)
+        #Optimize writes the model to bpbackup.lp
+        self.addCleanup(os.remove, 'bpbackup.lp')
+        
+        #the cuts and the Buffer_Cut rows give the same optimum as a new decomposed model
+        def AssertOptimum(weights, capacity, epsilon):
+            Master.Optimize()
+            NewNet = GetModel(weights,nodes,links,capacity,epsilon,Decompose=True)
+            NewNet.Optimize()
+            self.assertAlmostEqual(Master.model.ObjVal, NewNet.model.ObjVal, places=5)
+            for i,j in links:
+                Row = Master.model.getRow(Master.BufferCut[i,j])
+                NewRow = NewNet.model.getRow(NewNet.BufferCut[i,j])
+                self.assertEqual(Row.size(), NewRow.size())
+                for n in range(Row.size()):
+                    self.assertAlmostEqual(Row.getCoeff(n), NewRow.getCoeff(n))
+        
+        Master.SetEpsilon(0.1)
+        AssertOptimum(gamma, scenarios, 0.1)
+        Master.ReplaceScenarios(other, other_gamma)
+        AssertOptimum(other_gamma, other, 0.1)
+    
+    def test_update_reduced_model(self):
+        
+        epsilon=0.05
+        num_scenarios = 40
+
+        nodes,links,scenarios,gamma = GetInstance(3, 0.1, 0.2, num_scenarios)
+        other = GetInstance(8, 0.1, 0.1, num_scenarios)[2]
+        BackupNet = GetModel(gamma,nodes,links,scenarios,epsilon,Reduce=True)
+        self.assertGreater(BackupNet.BuildStatistics["zero_failure"], 0)
+        NumConstrs = BackupNet.model.NumConstrs
+        
+        #each change gives the same optimum as a new reduced model
+        def AssertOptimum(weights, epsilon):
+            BackupNet.model.optimize()
+            NewNet = GetModel(weights,nodes,links,scenarios,epsilon,Reduce=True)
+            NewNet.model.optimize()
+            self.assertEqual(BackupNet.model.NumConstrs, NewNet.model.NumConstrs)
+            self.assertAlmostEqual(BackupNet.model.ObjVal, NewNet.model.ObjVal, places=5)
+        
+        BackupNet.SetEpsilon(0.1)
+        AssertOptimum(gamma, 0.1)
+        scaled = dict((k, 2*gamma[k]) for k in gamma)
+        BackupNet.SetGamma(scaled)
+        AssertOptimum(scaled, 0.1)
+        
+        #weights below K*epsilon keep the zero-failure scenarios, and other scenarios merge into other rows
+        small = dict((k, 1e-3*gamma[k]) for k in gamma)
+        self.assertRaisesRegex(ValueError, 'zero-failure', BackupNet.SetGamma, small)
+        self.assertRaisesRegex(ValueError, 'scenario rows', BackupNet.ReplaceScenarios, other)
+        self.assertEqual(BackupNet.model.NumConstrs, NumConstrs)
+        AssertOptimum(scaled, 0.1)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import numpy as np
+
+from NetworkOptimization.ParallelExecutor import ParallelExecutor
+from NetworkOptimization.QualityAssessment import QoS
+from NetworkOptimization.RndScenariosGen import ScenariosGenerator
+from NetworkOptimization import Tools
+
+class TestParallelExecutor(unittest.TestCase):
+
+    def test_executor(self):
+
+        seed=10
+        num_scenarios = 20000
+        p=0.025
+        p2=2*p
+
+        G,links,nodes,num_links=Tools.GetFSNETNetwork()
+        cap_per_link=[1 for i in range(num_links)]
+
+        rnd = np.random.RandomState(0)
+        BackupLinks = links[:10]
+        BackupRoutes = {}
+        for s,d in links:
+            for i,j in links:
+                BackupRoutes[s,d,i,j] = int(rnd.rand() < 0.3)
+        BackupCapacity = {}
+        for i,j in links:
+            BackupCapacity[i,j] = rnd.randint(0,3)
+
+        ScenariosGen = ScenariosGenerator()
+        SolutionQos = QoS()
+
+        with ParallelExecutor(links, cap_per_link, 3) as Executor:
+            scenarios = Executor.GetBinomialRand(seed, p2, num_scenarios)
+            expected = ScenariosGen.GetBinomialRandStreams(seed, p2, num_scenarios, num_links, links, cap_per_link, 1)
+            self.assertTrue((scenarios.Failures == expected.Failures).all())
+            #the generator reuses the running pool
+            shared = ScenariosGen.GetBinomialRandStreams(seed, p2, num_scenarios, num_links, links, cap_per_link, Executor=Executor)
+            self.assertTrue((shared.Failures == expected.Failures).all())
+            self.assertIn(shared.SharedSpec, Executor.SharedSpecs)
+            self.assertRaises(ValueError, ScenariosGen.GetBinomialRandStreams, seed, p2, num_scenarios, num_links, links, cap_per_link, StreamSize=1000, Executor=Executor)
+
+            Executor.LoadDesign(BackupLinks, BackupCapacity, BackupRoutes)
+            BufferedP,Variance = Executor.GetBufferedFailureProb(seed, p, p2, num_scenarios)
+            StreamP,StreamVar = SolutionQos.GetBufferedFailureProbStream(seed, p, p2, num_scenarios, None, links, cap_per_link, BackupLinks, BackupCapacity, BackupRoutes)
+            for i,j in BackupLinks:
+                self.assertAlmostEqual(BufferedP[i,j], StreamP[i,j])
+                self.assertAlmostEqual(Variance[i,j], StreamVar[i,j])
+
+            #scenarios generated by the workers are evaluated in place, other sets are copied once
+            gamma = ScenariosGen.GetImportanceSamplingVector(links, scenarios, num_scenarios, p, p2)
+            SerialP,SerialVar = SolutionQos.GetBufferedFailureProb(gamma, scenarios, num_scenarios, links, BackupLinks, BackupCapacity, BackupRoutes)
+            for test_scenarios in [scenarios, expected]:
+                SharedP,SharedVar = Executor.GetBufferedFailureProbScenarios(test_scenarios, gamma)
+                for i,j in BackupLinks:
+                    self.assertAlmostEqual(SharedP[i,j], SerialP[i,j])
+                    self.assertAlmostEqual(SharedVar[i,j], SerialVar[i,j])
+
+            #a new design replaces the previous one on the same workers
+            Executor.LoadDesign(BackupLinks, dict((link,num_links) for link in links), BackupRoutes)
+            BufferedP,Variance = Executor.GetBufferedFailureProb(seed, p, p2, num_scenarios)
+            for i,j in BackupLinks:
+                self.assertEqual(BufferedP[i,j], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import os
+import unittest
+from gurobipy import GRB
+
+from NetworkOptimization.ParameterSweep import ParameterSweep
+from NetworkOptimization.BFPBackupModel import BFPBackupNetwork
+from NetworkOptimization.BFPBackupModel_WithBackupCapacity import BFPBackupNetwork_WithBackupCapacity
+from NetworkOptimization.BFP_JRD_Model import BFP_JRD_Model
+from NetworkOptimization import Tools
+from TestBackupModel import GetInstance
+
+class TestParameterSweep(unittest.TestCase):
+
+    def test_run(self):
+
+        seed=3
+        p=0.05
+        p2=2*p
+        num_scenarios=40
+
+        G,links,nodes,num_links=Tools.GetFullConnectedNetwork(4)
+        links=list(links)
+        cap_per_link=[1 for i in range(num_links)]
+
+        Sweep = ParameterSweep(nodes, links, cap_per_link, p, p2, 0.1, num_scenarios, seed)
+        Points = [{"epsilon": 0.2}, {"epsilon": 0.1}, {"epsilon": 0.05, "num_scenarios": 60}]
+        Cold = Sweep.Run(Points, WarmStart=False)
+        Warm = Sweep.Run(Points)
+        Hint = Sweep.Run(Points, Hint=True)
+        os.remove('bpbackup.lp')
+
+        self.assertEqual([Result["num_scenarios"] for Result in Warm], [40, 40, 60])
+        self.assertEqual([Result["warm_start"] for Result in Warm], [False, True, True])
+        for ColdResult,WarmResult,HintResult in zip(Cold, Warm, Hint):
+            self.assertAlmostEqual(ColdResult["objective"], WarmResult["objective"])
+            self.assertAlmostEqual(ColdResult["objective"], HintResult["objective"])
+        #the solutions kept and chained as MIP starts are integral
+        for Result in Warm:
+            for value in list(Result["backup_capacity"].values())+list(Result["backup_routes"].values()):
+                self.assertIsInstance(value, int)
+
+        #a solution saved to JSON is the MIP start of a new model: the first solution found is already optimal
+        Scenarios,Gamma = Sweep.GetScenarios(Sweep.GetPoint(Points[1]))
+        BackupNet = BFPBackupNetwork()
+        BackupNet.LoadModel(Gamma, nodes, links, Scenarios, 0.1, num_scenarios)
+        Saved = BFPBackupNetwork()
+        Saved.BackupCapacitySolution = Warm[1]["backup_capacity"]
+        Saved.BackupRoutesSolution = Warm[1]["backup_routes"]
+        Saved.SaveBakupNetwork('TestParameterSweep.dat')
+        BackupCapacity,BackupRoutes,BackupLinks = Saved.LoadBackupNetwork('TestParameterSweep.dat')
+        os.remove('TestParameterSweep.dat')
+
+        self.assertEqual(BackupNet.SetStart(BackupCapacity, BackupRoutes), num_links*(num_links+1))
+        BackupNet.model.Params.OutputFlag = 0
+        BackupNet.model.Params.SolutionLimit = 1
+        BackupNet.model.optimize()
+        self.assertAlmostEqual(BackupNet.model.ObjVal, Warm[1]["objective"])
+
+    def test_start_with_backup_capacity(self):
+
+        epsilon=0.1
+        num_scenarios=20
+
+        #unit capacity on the 12 links of the full connected network with 4 nodes
+        nodes,links,scenarios,gamma = GetInstance(3, 0.05, 0.1, num_scenarios, [1]*12)
+        num_links = len(links)
+        #fractional capacity of a continuous solution
+        capacity = dict((link, 0.4+0.3*(n%4)) for n,link in enumerate(links))
+
+        BackupNet = BFPBackupNetwork_WithBackupCapacity()
+        BackupNet.LoadModel(gamma, nodes, links, scenarios, epsilon, num_scenarios, dict(capacity), links)
+        BackupNet.model.Params.OutputFlag = 0
+        #Optimize writes the model to bpbackup_withcap.lp
+        self.addCleanup(os.remove, 'bpbackup_withcap.lp')
+        BackupCapacity,BackupRoutes,BackupLinks = BackupNet.Optimize()
+
+        #the start of Delta is the rounded increase over HatBackupCapacity (never negative)
+        Start = BFPBackupNetwork_WithBackupCapacity()
+        Start.LoadModel(gamma, nodes, links, scenarios, epsilon, num_scenarios, dict(capacity), links)
+        Noisy = dict((link, BackupCapacity[link]+1e-7) for link in links)
+        Noisy[links[0]] = Start.HatBackupCapacity[links[0]]-1
+        self.assertEqual(Start.SetStart(Noisy, BackupRoutes), num_links*(num_links+1))
+        Start.model.update()
+        self.assertEqual(Start.Delta[links[0]].Start, 0)
+        for link in links[1:]:
+            self.assertEqual(Start.Delta[link].Start, BackupCapacity[link]-Start.HatBackupCapacity[link])
+
+        #the solution is the MIP start of a new model: the first solution found is already optimal
+        Start.SetStart(BackupCapacity, BackupRoutes)
+        Start.model.Params.OutputFlag = 0
+        Start.model.Params.SolutionLimit = 1
+        Start.model.optimize()
+        self.assertAlmostEqual(Start.model.ObjVal, BackupNet.model.ObjVal)
+
+    def test_start_jrd(self):
+
+        epsilon=0.1
+        num_scenarios=20
+
+        #unit capacity on the 12 links of the full connected network with 4 nodes
+        nodes,links,scenarios,gamma = GetInstance(5, 0.05, 0.1, num_scenarios, [1]*12)
+        num_links = len(links)
+
+        JRDModel = BFP_JRD_Model()
+        JRDModel.LoadModel(gamma, nodes, links, links, scenarios, epsilon, num_scenarios)
+        JRDModel.model.Params.OutputFlag = 0
+        #Optimize writes the model to bpbackup.lp
+        self.addCleanup(os.remove, 'bpbackup.lp')
+        WavelengthCapacity,Routes,UsedLinks,HatCapacity = JRDModel.Optimize()
+
+        Start = BFP_JRD_Model()
+        Start.LoadModel(gamma, nodes, links, links, scenarios, epsilon, num_scenarios)
+        self.assertEqual(Start.SetStart(WavelengthCapacity, Routes), num_links*(num_links+1))
+        Start.model.update()
+        for i,j,s,d in Routes:
+            self.assertEqual(Start.bAssignedRoute[i,j,s,d].Start, Routes[i,j,s,d])
+        Start.model.Params.OutputFlag = 0
+        Start.model.Params.SolutionLimit = 1
+        Start.model.optimize()
+        self.assertAlmostEqual(Start.model.ObjVal, JRDModel.model.ObjVal, places=5)
+
+        #hints do not set the MIP start
+        Hint = BFP_JRD_Model()
+        Hint.LoadModel(gamma, nodes, links, links, scenarios, epsilon, num_scenarios)
+        self.assertEqual(Hint.SetStart(WavelengthCapacity, Routes, True), num_links*(num_links+1))
+        Hint.model.update()
+        self.assertEqual(Hint.WavelengthCapacity[links[0]].VarHintVal, WavelengthCapacity[links[0]])
+        self.assertEqual(Hint.WavelengthCapacity[links[0]].Start, GRB.UNDEFINED)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import math
+import unittest
+import networkx as nx
+
+from NetworkOptimization.PathBackupModel import PathBackup, GetPathCatalog
+from NetworkOptimization.PathIndex import PathIndex
+from NetworkOptimization.Tools import getAllPaths, getLinkPaths, GetFullConnectedNetwork
+
+class TestPathBackupModel(unittest.TestCase):
+
+    def test_path_catalog(self):
+        
+        G,links,nodes,num_links=GetFullConnectedNetwork(4)
+        links=list(links)
+        Index = PathIndex(G)
+        paths = Index.GetAllPaths()
+        Psd = dict(((s,d), [paths[p] for p in Index.GetPaths(s,d)]) for s,d in links)
+        Pij = dict(((i,j,s,d), [paths[p] for p in Index.GetLinkPaths(i,j,s,d)]) for i,j in links for s,d in links)
+        
+        #the catalog of a PathIndex (in another link order) is the catalog of its paths
+        PathPair, Incidence = GetPathCatalog(links, paths, Psd, Pij)
+        IndexPathPair, IndexIncidence = GetPathCatalog(links[::-1], Index)
+        self.assertEqual(PathPair.tolist(), [num_links-1-k for k in IndexPathPair])
+        self.assertEqual((Incidence != IndexIncidence[::-1]).nnz, 0)
+        self.assertEqual(Incidence.nnz, len(Index.PathLinks))
+    
+    def test_optimize(self):
+        
+        p=0.001
+        cutoff=None
+        G,links,nodes,num_links=GetFullConnectedNetwork(3)
+        links=list(links)
+        capacity=dict((link, 1) for link in links)
+        mean=dict((link, p) for link in links)
+        std=dict((link, math.sqrt(p*(1-p))) for link in links)
+        
+        paths = getAllPaths(G,cutoff)
+        Psd = dict(((s,d), list(nx.all_simple_paths(G, s, d, cutoff))) for s,d in links)
+        Pij = dict(((i,j,s,d), getLinkPaths(G,i,j,s,d,cutoff)) for i,j in links for s,d in links)
+        BackupNet = PathBackup(nodes,links,paths,Psd,Pij,capacity,mean,std,2.326347874)
+        Solution = BackupNet.optimize(None,None)
+        IndexNet = PathBackup(nodes,links,PathIndex(G,cutoff),None,None,capacity,mean,std,2.326347874)
+        IndexSolution = IndexNet.optimize(None,None)
+        os.remove('pathbackup.lp')
+        
+        self.assertEqual(IndexNet.BuildStatistics["constrs"]["SCOP2"], num_links*num_links)
+        self.assertAlmostEqual(sum(Solution.values()), sum(IndexSolution.values()), places=5)
+
+    def test_shortest_paths(self):
+        
+        p=0.001
+        G,links,nodes,num_links=GetFullConnectedNetwork(4)
+        links=list(links)
+        capacity=dict((link, 1) for link in links)
+        mean=dict((link, p) for link in links)
+        std=dict((link, math.sqrt(p*(1-p))) for link in links)
+        
+        #two candidate backup paths per link, none of them the link itself
+        Index = PathIndex(G, NumShortest=2)
+        BackupNet = PathBackup(nodes,links,Index,None,None,capacity,mean,std,2.326347874)
+        Solution = BackupNet.optimize(None,None)
+        os.remove('pathbackup.lp')
+        self.assertEqual(BackupNet.BuildStatistics["vars"]["Backup_Path"], 2*num_links)
+        self.assertGreater(sum(Solution.values()), 0)
+
+    def test_generate_paths(self):
+        
+        p=0.01
+        #complete graph on 4 nodes without the links 0-2 (the SOCP must fit the size-limited license)
+        G = nx.complete_graph(4).to_directed()
+        G.remove_edges_from([(0,2),(2,0)])
+        links=list(G.edges())
+        nodes=list(G.nodes())
+        capacity=dict((link, 1) for link in links)
+        mean=dict(((s,d), p*(1+s)) for s,d in links)
+        std=dict(((s,d), math.sqrt(p*(1-p))*(1+d)) for s,d in links)
+        
+        #all the backup paths: no path improves the relaxation
+        FullNet = PathBackup(nodes,links,PathIndex(G,NumShortest=len(links)),None,None,capacity,mean,std,2.326347874)
+        self.assertEqual(FullNet.generatePaths(G), 0)
+        
+        #one shortest backup path per link, and the paths of negative reduced cost
+        BackupNet = PathBackup(nodes,links,PathIndex(G,NumShortest=1),None,None,capacity,mean,std,2.326347874)
+        NumAdded = BackupNet.generatePaths(G)
+        self.assertGreater(NumAdded, 0)
+        History = BackupNet.GenerationHistory
+        self.assertGreater(History[0]["objective"], History[-1]["objective"])
+        self.assertAlmostEqual(History[-1]["objective"], FullNet.GenerationHistory[0]["objective"], places=5)
+        
+        Solution = BackupNet.optimize(None,None)
+        FullSolution = FullNet.optimize(None,None)
+        os.remove('pathbackup.lp')
+        self.assertAlmostEqual(sum(Solution.values()), sum(FullSolution.values()), places=5)
+        for p in range(len(links), len(links)+NumAdded):
+            Path = BackupNet.getPath(p)
+            self.assertNotEqual(Path, [Path[0], Path[-1]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import unittest
+import networkx as nx
+
+from NetworkOptimization.PathCatalog import PathCatalogCache, SavePathIndex, LoadPathIndex, GetGraphHash
+from NetworkOptimization.PathIndex import PathIndex
+from NetworkOptimization.Tools import GetFullConnectedNetwork, GetFSNETNetwork
+
+class TestPathCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.Directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.Directory)
+
+    def test_save_and_load(self):
+        
+        G = GetFullConnectedNetwork(5)[0]
+        Index = PathIndex(G, 3)
+        FileName = os.path.join(self.Directory, 'TestPathCatalog.pcat')
+        SavePathIndex(FileName, Index, GetGraphHash(G))
+        Loaded = LoadPathIndex(FileName)
+        
+        self.assertEqual(Loaded.Links, Index.Links)
+        self.assertEqual(Loaded.Cutoff, 3)
+        self.assertEqual(Loaded.GetAllPaths(), Index.GetAllPaths())
+        for s,d in Index.Links:
+            for i,j in Index.Links:
+                self.assertEqual(Loaded.GetLinkPaths(i,j,s,d).tolist(), Index.GetLinkPaths(i,j,s,d).tolist())
+    
+    def test_cache(self):
+        
+        G = GetFullConnectedNetwork(5)[0]
+        Cache = PathCatalogCache(self.Directory)
+        for cutoff in [None, 2, 1, 2]:
+            Index = Cache.GetPathIndex(G, cutoff)
+            self.assertEqual(Index.GetAllPaths(), PathIndex(G, cutoff).GetAllPaths())
+        self.assertEqual(Cache.Statistics, {"hits": 1, "derived": 2, "enumerated": 1, "evicted": 0})
+        
+        #the same edges in another order
+        H = nx.DiGraph()
+        H.add_edges_from(reversed(list(G.edges())))
+        self.assertEqual(GetGraphHash(H), GetGraphHash(G))
+        Index = Cache.GetPathIndex(H, 1)
+        self.assertEqual(Cache.Statistics["hits"], 2)
+        self.assertEqual(sorted(Index.GetAllPaths()), sorted(PathIndex(H, 1).GetAllPaths()))
+        
+        #shortest paths of a lower limit are derived, by latency only for the same limits
+        G = GetFSNETNetwork()[0]
+        for i,j in G.edges():
+            G[i][j]['latency'] = 1+(i+j)%3
+        for cutoff, k, weight in [(None, 6, None), (3, 2, None), (None, 4, 'latency'), (None, 3, 'latency'), (2, 2, 'latency')]:
+            Index = Cache.GetPathIndex(G, cutoff, k, weight)
+            self.assertEqual(Index.GetAllPaths(), PathIndex(G, cutoff, k, weight).GetAllPaths())
+        self.assertEqual(Cache.Statistics["derived"], 4)
+        self.assertEqual(Cache.Statistics["enumerated"], 4)
+
+    def test_ignored_parameters(self):
+        
+        #without NumShortest, PathIndex ignores the weight and the maximum length (it is not a hop limit)
+        G = GetFullConnectedNetwork(5)[0]
+        Cache = PathCatalogCache(self.Directory)
+        Expected = PathIndex(G, None, None, None, 2).GetAllPaths()
+        self.assertEqual(len(Expected), 320)
+        self.assertEqual(Cache.GetPathIndex(G).GetAllPaths(), Expected)
+        self.assertEqual(Cache.GetPathIndex(G, None, None, None, 2).GetAllPaths(), Expected)
+        self.assertEqual(Cache.GetPathIndex(G, None, None, 'latency', 1).GetAllPaths(), Expected)
+        self.assertEqual(Cache.Statistics, {"hits": 2, "derived": 0, "enumerated": 1, "evicted": 0})
+        
+        #and a lower cutoff derived from it keeps all its paths
+        self.assertEqual(Cache.GetPathIndex(G, 2, None, None, 1).GetAllPaths(), PathIndex(G, 2).GetAllPaths())
+        self.assertEqual(Cache.Statistics["derived"], 1)
+    
+    def test_evict(self):
+        
+        G = GetFullConnectedNetwork(5)[0]
+        Cache = PathCatalogCache(self.Directory)
+        Cache.GetPathIndex(G, 3)
+        Size = sum(os.path.getsize(os.path.join(self.Directory, Name)) for Name in os.listdir(self.Directory))
+        Cache.GetPathIndex(G, 1)
+        os.utime(Cache.GetFileName(GetGraphHash(G), {"cutoff": 1, "num_shortest": None, "weight": None, "max_length": None}), (0, 0))
+        
+        #the catalog of cutoff 1 is the least recently used
+        Cache.MaxSize = Size
+        Cache.GetPathIndex(G, 2)
+        self.assertEqual(Cache.Statistics["evicted"], 2)
+        self.assertEqual(len(os.listdir(self.Directory)), 1)
+        Cache.GetPathIndex(G, 2)
+        self.assertEqual(Cache.Statistics["hits"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import networkx as nx
+
+from NetworkOptimization.PathIndex import PathIndex
+from NetworkOptimization.Tools import getAllPaths, getLinkPaths, GetFullConnectedNetwork, GetRingNetwork, GetFSNETNetwork
+
+class TestPathIndex(unittest.TestCase):
+
+    def test_link_paths(self):
+
+        for G in [GetFullConnectedNetwork(5)[0], GetRingNetwork(5)[0]]:
+            links = list(G.edges())
+            for cutoff in [None, 3, 1]:
+                Index = PathIndex(G, cutoff)
+                Paths = Index.GetAllPaths()
+                self.assertEqual(Index.NumPaths, len(getAllPaths(G, cutoff)))
+                self.assertEqual(sorted(Paths), sorted(getAllPaths(G, cutoff)))
+                for s,d in links:
+                    self.assertEqual(sorted(Paths[p] for p in Index.GetPaths(s,d)), sorted(nx.all_simple_paths(G, s, d, cutoff)))
+                    for i,j in links:
+                        self.assertEqual(sorted(Paths[p] for p in Index.GetLinkPaths(i,j,s,d)), sorted(getLinkPaths(G,i,j,s,d,cutoff)))
+                for p in range(Index.NumPaths):
+                    self.assertEqual(Index.PathPair[p], links.index((Paths[p][0], Paths[p][-1])))
+                    self.assertEqual(len(Index.GetPathLinks(p)), len(Paths[p])-1)
+
+    def test_shortest_paths(self):
+        
+        G = GetFullConnectedNetwork(5)[0]
+        links = list(G.edges())
+        for cutoff in [None, 2]:
+            Index = PathIndex(G, cutoff, NumShortest=4)
+            Paths = Index.GetAllPaths()
+            for s,d in links:
+                #the shortest backup paths that do not use the protected link
+                Candidates = [path for path in nx.all_simple_paths(G, s, d, cutoff) if path != [s,d]]
+                Lengths = [len(Paths[p]) for p in Index.GetPaths(s,d)]
+                self.assertEqual(Lengths, sorted(len(path) for path in Candidates)[:4])
+                for p in Index.GetPaths(s,d):
+                    self.assertIn(Paths[p], Candidates)
+                    self.assertNotIn(Index.LinkIds[s,d], Index.GetPathLinks(p))
+        
+        #shortest paths by latency, up to a maximum latency
+        G,links,nodes,num_links = GetFSNETNetwork()
+        for i,j in G.edges():
+            G[i][j]['latency'] = 1+(i+j)%3
+        Index = PathIndex(G, NumShortest=5, Weight='latency', MaxLength=6)
+        for s,d in G.edges():
+            Latencies = [nx.path_weight(G, Index.GetPath(p), 'latency') for p in Index.GetPaths(s,d)]
+            self.assertEqual(Latencies, sorted(Latencies))
+            self.assertLessEqual(len(Latencies), 5)
+            self.assertTrue(all(latency <= 6 for latency in Latencies))
+        self.assertGreater(Index.NumPaths, 0)
+
+        #shortest paths by latency with at most cutoff links
+        G = GetFullConnectedNetwork(6)[0]
+        for i,j in G.edges():
+            G[i][j]['latency'] = 1+(3*i+j)%5
+        for cutoff in [1, 2, 3]:
+            Index = PathIndex(G, cutoff, NumShortest=4, Weight='latency', MaxLength=6)
+            for s,d in G.edges():
+                Candidates = [path for path in nx.all_simple_paths(G, s, d, cutoff) if path != [s,d]]
+                Expected = sorted(nx.path_weight(G, path, 'latency') for path in Candidates)
+                Latencies = [nx.path_weight(G, Index.GetPath(p), 'latency') for p in Index.GetPaths(s,d)]
+                self.assertEqual(Latencies, [latency for latency in Expected if latency <= 6][:4])
+                for p in Index.GetPaths(s,d):
+                    self.assertIn(Index.GetPath(p), Candidates)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import unittest
+from gurobipy import GRB
+
+from NetworkOptimization.ProgressiveSolver import ProgressiveSolver
+from NetworkOptimization.QualityAssessment import GetModelEvaluator
+from NetworkOptimization import Tools
+
+class TestProgressiveSolver(unittest.TestCase):
+
+    def test_solve(self):
+
+        seed=3
+        p=0.05
+        p2=2*p
+        epsilon=0.05
+        num_initial=20
+        num_assess=2000
+
+        G,links,nodes,num_links=Tools.GetFullConnectedNetwork(4)
+        links=list(links)
+        cap_per_link=[1 for i in range(num_links)]
+
+        Solver = ProgressiveSolver(nodes, links, cap_per_link, p, p2, epsilon)
+        BackupCapacity,BackupRoutes,BackupLinks,BufferedP = Solver.Solve(seed, num_initial, num_assess, MaxIterations=5)
+        os.remove('bpbackup.lp')
+
+        History = Solver.History
+        self.assertGreater(len(History), 1)
+        self.assertEqual(History[0]["num_scenarios"], num_initial)
+        for previous,current in zip(History[:-1], History[1:]):
+            self.assertGreater(previous["max_bfp"], epsilon)
+            self.assertEqual(current["num_scenarios"], previous["num_scenarios"]+previous["added"])
+            self.assertGreater(current["num_vars"], previous["num_vars"])
+        self.assertLessEqual(History[-1]["max_bfp"], epsilon)
+        self.assertEqual(max(BufferedP.values()), History[-1]["max_bfp"])
+
+        #the last assessment batch follows the sample and the previous batches of the same streams
+        Start = num_initial+(len(History)-1)*num_assess
+        Assess,Gamma = Solver.GetScenarios(seed, Start, Start+num_assess, 4096)
+        Evaluator = GetModelEvaluator(links, BackupCapacity, BackupRoutes)
+        P,Var = Evaluator.GetStatistics(Evaluator.GetIndicators(Assess.GetCapacityMatrix(links), Gamma))
+        for i,j in links:
+            self.assertAlmostEqual(P[i,j], BufferedP[i,j])
+
+    def test_solve_limits(self):
+
+        G,links,nodes,num_links=Tools.GetFullConnectedNetwork(4)
+        links=list(links)
+        cap_per_link=[1 for i in range(num_links)]
+
+        #Optimize writes the model to bpbackup.lp
+        self.addCleanup(os.remove, 'bpbackup.lp')
+
+        #a solve stopped by the solution limit goes on with its incumbent, rounded
+        Solver = ProgressiveSolver(nodes, links, cap_per_link, 0.05, 0.1, 0.05)
+        BackupCapacity,BackupRoutes,BackupLinks,BufferedP = Solver.Solve(3, 20, 2000, MaxIterations=1, Params={"SolutionLimit": 1})
+        self.assertEqual(len(Solver.History), 1)
+        self.assertEqual(Solver.History[0]["status"], GRB.Status.SOLUTION_LIMIT)
+        self.assertGreater(len(BackupRoutes), 0)
+        self.assertEqual(Solver.History[0]["max_bfp"], max(BufferedP.values()))
+        for value in list(BackupCapacity.values())+list(BackupRoutes.values()):
+            self.assertEqual(value, round(value))
+
+        #a solve without any solution keeps the previous design
+        BackupCapacity,BackupRoutes,BackupLinks,BufferedP = Solver.Solve(3, 20, 2000, MaxIterations=1, TimeLimit=0)
+        self.assertEqual(len(Solver.History), 1)
+        self.assertIsNone(Solver.History[0]["max_bfp"])
+        self.assertEqual((BackupCapacity,BackupRoutes,BufferedP), ({},{},{}))
+
+if __name__ == '__main__':
+    unittest.main()
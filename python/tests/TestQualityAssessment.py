@@ -3,13 +3,15 @@ Created on Jun 9, 2016
 
 @author: Edielson
 '''
+import os
 import unittest
 import time
 import math 
 import numpy as np
 
 from NetworkOptimization.BFPBackupModel import BFPBackupNetwork
-from NetworkOptimization.QualityAssessment import QoS
+from NetworkOptimization.QualityAssessment import QoS, SQEvaluator
+from NetworkOptimization.SuperquantileModel import SQModel
 from NetworkOptimization.RndScenariosGen import ScenariosGenerator
 from NetworkOptimization import Tools
 
@@ -307,6 +309,148 @@ class Test(unittest.TestCase):
             self.assertLessEqual(RealBufferedP[i,j],BufferedP[i,j]+ConfidenceInterval[i,j])
             
 
+    def test_vectorized_buffer_prob(self):
+        print('\n######### Testing BFPEvaluator against the scenario loop #########\n')
+        num_scenarios = 2000
+        p=0.025
+        p2=2*p
+        
+        G,links,nodes,num_links=Tools.GetFSNETNetwork()
+        cap_per_link=[1 for i in range(num_links)]
+        
+        rnd = np.random.RandomState(0)
+        BackupLinks = links[:10]
+        BackupRoutes = {}
+        for s,d in links:
+            for i,j in links:
+                BackupRoutes[s,d,i,j] = int(rnd.rand() < 0.3)
+        BackupCapacity = {}
+        for i,j in links:
+            BackupCapacity[i,j] = rnd.randint(0,3)
+        
+        ScenariosGen = ScenariosGenerator()
+        scenarios = ScenariosGen.GetBinomialRand(0, p2, num_scenarios, num_links, links, cap_per_link)
+        gamma = ScenariosGen.GetImportanceSamplingVector(links, scenarios, num_scenarios, p, p2)
+        
+        SolutionQos = QoS()
+        BufferedP,Variance = SolutionQos.GetBufferedFailureProb(gamma, scenarios, num_scenarios, links, BackupLinks, BackupCapacity, BackupRoutes)
+        
+        for i,j in BackupLinks:
+            I=[]
+            for k in range(num_scenarios):
+                Psd=0
+                for s,d in links:
+                    Psd=Psd+BackupRoutes[s,d,i,j]*scenarios[k,s,d]
+                I.append(gamma[k] if Psd > BackupCapacity[i,j] else 0)
+            self.assertAlmostEqual(BufferedP[i,j], np.mean(I))
+            self.assertAlmostEqual(Variance[i,j], np.var(I,ddof=1))
+
+    def test_streaming_buffer_prob(self):
+        print('\n######### Testing GetBufferedFailureProbStream method #########\n')
+        num_scenarios = 5000
+        seed = 5
+        p=0.025
+        p2=2*p
+
+        G,links,nodes,num_links=Tools.GetFSNETNetwork()
+        cap_per_link=[1 for i in range(num_links)]
+
+        rnd = np.random.RandomState(1)
+        BackupLinks = links[:10]
+        BackupRoutes = {}
+        for s,d in links:
+            for i,j in links:
+                BackupRoutes[s,d,i,j] = int(rnd.rand() < 0.3)
+        BackupCapacity = {}
+        for i,j in links:
+            BackupCapacity[i,j] = rnd.randint(0,3)
+
+        SolutionQos = QoS()
+        ScenariosGen = ScenariosGenerator()
+        block = next(ScenariosGen.GetBinomialBlocks(seed, p2, num_scenarios, num_scenarios, num_links, links, cap_per_link))
+        gamma = ScenariosGen.GetImportanceSamplingVector(links, block, num_scenarios, p, p2)
+        BufferedP,Variance = SolutionQos.GetBufferedFailureProb(gamma, block, num_scenarios, links, BackupLinks, BackupCapacity, BackupRoutes)
+
+        for block_size in [num_scenarios, 777]:
+            StreamP,StreamVar = SolutionQos.GetBufferedFailureProbStream(seed, p, p2, num_scenarios, block_size, links, cap_per_link, BackupLinks, BackupCapacity, BackupRoutes)
+            for i,j in BackupLinks:
+                self.assertAlmostEqual(StreamP[i,j], BufferedP[i,j])
+                self.assertAlmostEqual(StreamVar[i,j], Variance[i,j])
+
+    def test_sequential_buffer_prob(self):
+        print('\n######### Testing GetBufferedFailureProbSequential method #########\n')
+        p=0.025
+        p2=2*p
+        block_size=1000
+        max_scenarios=1000000
+
+        G,links,nodes,num_links=Tools.GetFSNETNetwork()
+        cap_per_link=[1 for i in range(num_links)]
+
+        rnd = np.random.RandomState(1)
+        BackupLinks = links[:5]
+        BackupRoutes = {}
+        for s,d in links:
+            for i,j in links:
+                BackupRoutes[s,d,i,j] = int(rnd.rand() < 0.3)
+        BackupCapacity = {}
+        for i,j in links:
+            BackupCapacity[i,j] = rnd.randint(1,4)
+
+        SolutionQos = QoS()
+        BufferedP,Variance,ConfidenceInterval,NumSamples = SolutionQos.GetBufferedFailureProbSequential(0, p, p2, max_scenarios, block_size, links, cap_per_link, BackupLinks, BackupCapacity, BackupRoutes, RelativeHalfWidth=0.2)
+
+        self.assertLess(NumSamples, max_scenarios)
+        self.assertEqual(NumSamples % block_size, 0)
+        for i,j in BackupLinks:
+            self.assertLessEqual(ConfidenceInterval[i,j], 0.2*BufferedP[i,j])
+
+        BufferedP,Variance,ConfidenceInterval,NumSamples = SolutionQos.GetBufferedFailureProbSequential(0, p, p2, 3*block_size, block_size, links, cap_per_link, BackupLinks, BackupCapacity, BackupRoutes, AbsoluteHalfWidth=1e-12)
+        self.assertEqual(NumSamples, 3*block_size)
+
+        #a rare event without hits does not meet a relative target, only an absolute one
+        BufferedP,Variance,ConfidenceInterval,NumSamples = SolutionQos.GetBufferedFailureProbSequential(0, 1e-5, None, 3*block_size, block_size, links, cap_per_link, BackupLinks, BackupCapacity, BackupRoutes, RelativeHalfWidth=0.1)
+        self.assertEqual(NumSamples, 3*block_size)
+        BufferedP,Variance,ConfidenceInterval,NumSamples = SolutionQos.GetBufferedFailureProbSequential(0, 1e-5, None, 3*block_size, block_size, links, cap_per_link, BackupLinks, BackupCapacity, BackupRoutes, RelativeHalfWidth=0.1, AbsoluteHalfWidth=1e-3)
+        self.assertEqual(NumSamples, block_size)
+
+    def test_sq_evaluator(self):
+        print('\n######### Testing SQEvaluator against SQModel #########\n')
+        p=0.05
+        p2=2*p
+        epsilon=0.1
+        num_scenarios=100
+
+        G,links,nodes,num_links=Tools.GetFullConnectedNetwork(4)
+        links=list(links)
+        cap_per_link=[1+(i%2) for i in range(num_links)]
+
+        rnd = np.random.RandomState(0)
+        BackupRoutes = {}
+        for i,j in links:
+            for s,d in links:
+                BackupRoutes[i,j,s,d] = int(rnd.rand() < 0.3)
+        BackupCapacity = {}
+        for i,j in links:
+            BackupCapacity[i,j] = rnd.randint(0,3)
+
+        ScenariosGen = ScenariosGenerator()
+        scenarios = ScenariosGen.GetBinomialRandStreams(7, p2, num_scenarios, num_links, links, cap_per_link, 1)
+        gamma = ScenariosGen.GetImportanceSamplingVector(links, scenarios, num_scenarios, p, p2)
+        loads = scenarios.GetLoads(np.array([[BackupRoutes[i,j,s,d] for s,d in links] for i,j in links]), links)
+
+        LPModel = SQModel(gamma,nodes,links,scenarios,epsilon,num_scenarios,BackupRoutes,BackupCapacity)
+        SuperQuantileLP, OptimalZLP = LPModel.optimize(None,None)
+        os.remove('quantile.lp')
+        for test_scenarios in [scenarios, scenarios.GetPacked(), dict(scenarios)]:
+            Evaluator = SQEvaluator(gamma,nodes,links,test_scenarios,epsilon,num_scenarios,BackupRoutes,BackupCapacity)
+            SuperQuantile, OptimalZ = Evaluator.optimize(None,None)
+            for b,(i,j) in enumerate(links):
+                self.assertAlmostEqual(SuperQuantile[i,j], SuperQuantileLP[i,j])
+                #z0 is optimal: it attains the superquantile
+                Excess = np.maximum(loads[:,b]-BackupCapacity[i,j]-OptimalZ[i,j], 0)
+                self.assertAlmostEqual(OptimalZ[i,j]+sum(gamma[k]*Excess[k] for k in range(num_scenarios))/(num_scenarios*epsilon), SuperQuantile[i,j])
+
 if __name__ == "__main__":
     #import sys;sys.argv = ['', 'Test.testName']
     unittest.main()
\ No newline at end of file
@@ -1,9 +1,21 @@
+import os
+import shutil
+import tempfile
 import unittest
+import numpy as np
 from NetworkOptimization.RndScenariosGen import ScenariosGenerator
+from NetworkOptimization.ScenarioStore import ScenarioStore
+from NetworkOptimization.ScenarioSet import AggregateScenarios
 from NetworkOptimization import Tools
 
 class TestRandScenariosGen(unittest.TestCase):
 
+    def setUp(self):
+        self.Directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.Directory)
+
     def test_GetUnifRand(self):
     
         num_nodes=5
@@ -72,6 +84,195 @@ class TestRandScenariosGen(unittest.TestCase):
         loadedScenarios = ScenariosGen.LoadRandScenarios(file_name)
         
         self.assertEqual(scenarios, loadedScenarios)
+    
+    def testScenarioSet(self):
+        
+        seed=0
+        num_scenarios = 100
+        p=0.1
+        
+        G,links,nodes,num_links=Tools.GetFSNETNetwork()
+        cap_per_link=[1+(i%3) for i in range(num_links)]
+        
+        ScenariosGen = ScenariosGenerator()
+        scenarios = ScenariosGen.GetBinomialRand(seed, p, num_scenarios, num_links, links, cap_per_link)
+        
+        self.assertEqual(scenarios.Failures.shape, (num_scenarios, num_links))
+        self.assertEqual(len(scenarios), num_scenarios*num_links)
+        
+        capacity = scenarios.GetCapacityMatrix()
+        for k in range(num_scenarios):
+            for s,d in links:
+                index = scenarios.LinkIndex[s,d]
+                self.assertEqual(scenarios[k,s,d], capacity[k,index])
+                self.assertEqual(scenarios[k,s,d], cap_per_link[index]*scenarios.Failures[k,index])
+        
+        self.assertRaises(KeyError, lambda: scenarios[num_scenarios,1,2])
+        self.assertEqual(dict(scenarios), scenarios)
+
+    def testRandStreams(self):
+
+        seed=2016
+        num_scenarios = 10000
+        stream_size = 1000
+        p=0.1
+
+        G,links,nodes,num_links=Tools.GetFSNETNetwork()
+        cap_per_link=[1 for i in range(num_links)]
+
+        ScenariosGen = ScenariosGenerator()
+        serial = ScenariosGen.GetBinomialRandStreams(seed, p, num_scenarios, num_links, links, cap_per_link, 1, stream_size)
+        parallel = ScenariosGen.GetBinomialRandStreams(seed, p, num_scenarios, num_links, links, cap_per_link, 3, stream_size)
+        blocks = [block.Failures for block in ScenariosGen.GetBinomialBlocks(seed, p, num_scenarios, 333, num_links, links, cap_per_link, stream_size)]
+
+        self.assertTrue((serial.Failures == parallel.Failures).all())
+        self.assertTrue((serial.Failures == np.vstack(blocks)).all())
+        self.assertAlmostEqual(serial.Failures.mean(), p, delta=0.01)
+
+        other = ScenariosGen.GetBinomialRandStreams(seed+1, p, num_scenarios, num_links, links, cap_per_link, 1, stream_size)
+        self.assertFalse((serial.Failures == other.Failures).all())
+
+    def testPackedScenarioSet(self):
+
+        seed=2016
+        num_scenarios = 5000
+        p=0.1
+
+        G,links,nodes,num_links=Tools.GetFSNETNetwork()
+        #more than 64 links so the failures take two words per scenario
+        links = links+[(s+100,d+100) for s,d in links]+[(s+200,d+200) for s,d in links]
+        num_links = len(links)
+        cap_per_link=[1+(i%3) for i in range(num_links)]
+
+        ScenariosGen = ScenariosGenerator()
+        scenarios = ScenariosGen.GetBinomialRandStreams(seed, p, num_scenarios, num_links, links, cap_per_link, 1)
+        packed = scenarios.GetPacked()
+
+        self.assertEqual(packed.Words.shape, (num_scenarios, 2))
+        self.assertTrue((packed.Failures == scenarios.Failures).all())
+        self.assertTrue((packed.GetNumFailures() == scenarios.GetNumFailures()).all())
+        self.assertEqual(dict(packed.GetScenarios(0, 10)), dict(scenarios.GetScenarios(0, 10)))
+
+        subset = links[10:80]
+        self.assertTrue(np.allclose(packed.GetFailedCapacity(subset), scenarios.GetFailedCapacity(subset)))
+        rnd = np.random.RandomState(0)
+        #popcount of a few masks, and unpacked blocks for many routing rows
+        for routing in [(rnd.rand(2,len(subset)) < 0.3)*1.0, (rnd.rand(30,len(subset)) < 0.3)*1.0]:
+            self.assertTrue(np.allclose(packed.GetLoads(routing, subset), scenarios.GetLoads(routing, subset)))
+
+        self.assertEqual(ScenariosGen.GetNumFailures(packed, num_scenarios, links), ScenariosGen.GetNumFailures(scenarios, num_scenarios, links))
+
+    def testAggregateScenarios(self):
+
+        seed=2016
+        num_scenarios = 2000
+        p=0.01
+        p2=2*p
+
+        G,links,nodes,num_links=Tools.GetFSNETNetwork()
+        cap_per_link=[1+(i%3) for i in range(num_links)]
+
+        ScenariosGen = ScenariosGenerator()
+        scenarios = ScenariosGen.GetBinomialRandStreams(seed, p2, num_scenarios, num_links, links, cap_per_link, 1)
+        gamma = ScenariosGen.GetImportanceSamplingWeights(links, scenarios, num_scenarios, p, p2)
+
+        capacity, weights, inverse = AggregateScenarios(scenarios, num_scenarios, links, gamma)
+        self.assertEqual(len(capacity), len(set(map(tuple, scenarios.Failures))))
+        self.assertTrue((capacity[inverse] == scenarios.GetCapacityMatrix(links)).all())
+        self.assertAlmostEqual(weights.sum(), gamma.sum())
+        self.assertTrue(np.allclose(weights, [gamma[inverse == u].sum() for u in range(len(capacity))]))
+
+        #the same groups for packed sets and dictionaries, and the multiplicity without importance sampling
+        for test_scenarios in [scenarios.GetPacked(), dict(scenarios)]:
+            test_capacity, counts, test_inverse = AggregateScenarios(test_scenarios, num_scenarios, links)
+            self.assertTrue((test_capacity[test_inverse] == capacity[inverse]).all())
+            self.assertEqual(counts.sum(), num_scenarios)
+            self.assertEqual(sorted(counts), sorted(np.bincount(inverse)))
+
+    def testImportanceSamplingWeights(self):
+
+        seed=2016
+        num_scenarios = 1000
+        p=0.025
+        p2=5*p
+
+        G,links,nodes,num_links=Tools.GetFSNETNetwork()
+        cap_per_link=[1 for i in range(num_links)]
+
+        ScenariosGen = ScenariosGenerator()
+        scenarios = ScenariosGen.GetBinomialRandStreams(seed, p2, num_scenarios, num_links, links, cap_per_link, 1)
+        num_failures = scenarios.GetNumFailures()
+
+        gamma = ScenariosGen.GetImportanceSamplingWeights(links, scenarios, num_scenarios, p, p2)
+        expected = (p**num_failures*(1-p)**(num_links-num_failures))/(p2**num_failures*(1-p2)**(num_links-num_failures))
+        self.assertTrue(np.allclose(gamma, expected))
+        self.assertTrue(np.allclose(gamma, ScenariosGen.GetImportanceSamplingWeights(links, scenarios.GetPacked(), num_scenarios, p, p2)))
+        self.assertTrue(np.allclose(gamma, ScenariosGen.GetImportanceSamplingWeights(links, dict(scenarios), num_scenarios, p, p2)))
+
+        #heterogeneous probabilities per link
+        rnd = np.random.RandomState(0)
+        p_links = rnd.uniform(0.001, 0.05, num_links)
+        p2_links = 4*p_links
+        scenarios = ScenariosGen.GetBinomialRandStreams(seed, p2_links, num_scenarios, num_links, links, cap_per_link, 1)
+        failures = scenarios.Failures
+        expected = np.prod(np.where(failures, p_links/p2_links, (1-p_links)/(1-p2_links)), axis=1)
+        gamma = ScenariosGen.GetImportanceSamplingWeights(links, scenarios, num_scenarios, p_links, p2_links)
+        self.assertTrue(np.allclose(gamma, expected))
+
+        #links with p == p_IS (even 0) do not change the weights, and a failure with p == 0 has weight 0
+        p_links[:3] = 0
+        p2_links[:2] = 0
+        scenarios = ScenariosGen.GetBinomialRandStreams(seed, p2_links, num_scenarios, num_links, links, cap_per_link, 1)
+        failures = scenarios.Failures
+        expected = np.prod(np.where(failures, p_links/np.where(p2_links > 0, p2_links, 1), (1-p_links)/(1-p2_links)), axis=1)
+        gamma = ScenariosGen.GetImportanceSamplingWeights(links, scenarios, num_scenarios, p_links, p2_links)
+        self.assertTrue(np.isfinite(gamma).all())
+        self.assertTrue(np.allclose(gamma, expected))
+        self.assertTrue(np.allclose(gamma, ScenariosGen.GetImportanceSamplingWeights(links, scenarios.GetPacked(), num_scenarios, p_links, p2_links)))
+        self.assertTrue((gamma[failures[:,2] == 1] == 0).all())
+        self.assertTrue(np.allclose(ScenariosGen.GetImportanceSamplingWeights(links, scenarios, num_scenarios, 0, 0), 1))
+        self.assertRaises(ValueError, ScenariosGen.GetImportanceSamplingWeights, links, scenarios, num_scenarios, p, 0)
+
+        #the log weights stay finite where the direct products underflow
+        many_links = [(k,k+1) for k in range(2000)]
+        many_failures = ScenariosGen.GetBinomialRandStreams(seed, 0.5, 10, len(many_links), many_links, [1]*len(many_links), 1)
+        log_gamma = ScenariosGen.GetImportanceSamplingWeights(many_links, many_failures, 10, 1e-3, 0.5, True)
+        self.assertTrue(np.isfinite(log_gamma).all())
+        num_failures = many_failures.GetNumFailures()
+        self.assertTrue(np.allclose(log_gamma, num_failures*np.log(1e-3/0.5)+(len(many_links)-num_failures)*np.log((1-1e-3)/0.5)))
+
+    def testScenarioStore(self):
+
+        seed=2016
+        file_name = os.path.join(self.Directory, 'TestScenarioStore.dat')
+        num_scenarios = 1000
+        p=0.025
+        p2=5*p
+
+        G,links,nodes,num_links=Tools.GetFSNETNetwork()
+        #more than 64 links so the failures take two words per scenario
+        links = links+[(s+100,d+100) for s,d in links]+[(s+200,d+200) for s,d in links]
+        num_links = len(links)
+        cap_per_link=[1+(i%3) for i in range(num_links)]
+
+        ScenariosGen = ScenariosGenerator()
+        scenarios = ScenariosGen.GetBinomialRandStreams(seed, p2, num_scenarios, num_links, links, cap_per_link, 1)
+        gamma = ScenariosGen.GetImportanceSamplingVector(links, scenarios, num_scenarios, p, p2)
+
+        ScenariosGen.SaveRandScenario(file_name, scenarios, p, p2, seed, gamma)
+        store = ScenarioStore(file_name)
+
+        self.assertEqual((store.NumScenarios, store.NumLinks, store.NumWords), (num_scenarios, num_links, 2))
+        self.assertEqual((store.FailureProb, store.FailureProbIS, store.Seed), (p, p2, seed))
+        self.assertEqual(store.Links, scenarios.Links)
+        self.assertTrue((store.GetScenarios().Failures == scenarios.Failures).all())
+        self.assertTrue((store.GetScenarios(100, 300).Failures == scenarios.Failures[100:300]).all())
+        self.assertTrue((np.vstack([block.Failures for block in store.GetBlocks(333)]) == scenarios.Failures).all())
+        for k in range(num_scenarios):
+            self.assertEqual(store.GetImportanceSampling()[k], gamma[k])
+
+        self.assertEqual(ScenariosGen.LoadRandScenarios(file_name), scenarios)
+        del store
             
                     
 if __name__ == '__main__':
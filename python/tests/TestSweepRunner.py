@@ -0,0 +1,78 @@
+import os
+import csv
+import shutil
+import tempfile
+import unittest
+
+from NetworkOptimization.SweepRunner import SweepRunner, GetConfigurations, ThreadSolve
+
+class TestSweepRunner(unittest.TestCase):
+
+    def test_run(self):
+
+        Grid = {"topology": "full", "num_nodes": 4, "p": 0.05, "p2": [None, 0.1], "epsilon": [0.1, 0.05],
+                "num_scenarios": 40, "num_assess": 1000, "seed": 3}
+        Configurations = GetConfigurations(Grid)
+        self.assertEqual(len(Configurations), 4)
+        self.assertEqual([(c["p2"], c["epsilon"]) for c in Configurations], [(None, 0.1), (None, 0.05), (0.1, 0.1), (0.1, 0.05)])
+
+        Runner = SweepRunner('TestSweepRunner.json', NumProcesses=2)
+        if os.path.exists(Runner.CheckpointFile):
+            os.remove(Runner.CheckpointFile)
+        #a sweep stopped after the first job: the second job is cut short in the checkpoint
+        Rows = Runner.Run(Configurations[:2])
+        with open(Runner.CheckpointFile) as f:
+            Lines = f.readlines()
+        with open(Runner.CheckpointFile, 'w') as f:
+            f.write(Lines[0] + Lines[1][:20])
+        
+        #the resumed sweep solves the other jobs only
+        Resumed = Runner.Run(Configurations)
+        with open(Runner.CheckpointFile) as f:
+            self.assertEqual(len(f.readlines()), 5)
+        self.assertEqual(len(Runner.LoadCheckpoint()), 4)
+        for Row, Configuration in zip(Resumed, Configurations):
+            self.assertEqual(Row["error"], None)
+            self.assertEqual(Row["epsilon"], Configuration["epsilon"])
+            self.assertGreaterEqual(Row["objective"], Row["num_backup_links"])
+        for Row, ResumedRow in zip(Rows, Resumed):
+            self.assertEqual(Row["objective"], ResumedRow["objective"])
+            self.assertEqual(Row["max_bfp"], ResumedRow["max_bfp"])
+        #a smaller epsilon never needs less capacity
+        self.assertLessEqual(Resumed[0]["objective"], Resumed[1]["objective"])
+        
+        Runner.SaveTable(Resumed, 'TestSweepRunner.csv')
+        with open('TestSweepRunner.csv') as f:
+            Table = list(csv.DictReader(f))
+        os.remove('TestSweepRunner.csv')
+        os.remove(Runner.CheckpointFile)
+        self.assertEqual(len(Table), 4)
+        self.assertEqual(float(Table[3]["objective"]), Resumed[3]["objective"])
+
+    def test_error(self):
+        
+        Row = ThreadSolve(GetConfigurations({"topology": "mesh"})[0], 1, 4096)
+        self.assertEqual(Row["status"], None)
+        self.assertTrue(Row["error"].startswith('ValueError'))
+
+    def test_retry_errors(self):
+
+        Directory = tempfile.mkdtemp()
+        try:
+            Configurations = GetConfigurations({"topology": "mesh"})
+            Runner = SweepRunner(os.path.join(Directory, 'TestSweepRunner.json'), NumProcesses=1)
+            self.assertTrue(Runner.Run(Configurations)[0]["error"].startswith('ValueError'))
+            
+            #a failed job stays in the checkpoint and is solved again by the next run, unless errors are kept
+            Runner.Run(Configurations, RetryErrors=False)
+            with open(Runner.CheckpointFile) as f:
+                self.assertEqual(len(f.readlines()), 1)
+            Runner.Run(Configurations)
+            with open(Runner.CheckpointFile) as f:
+                self.assertEqual(len(f.readlines()), 2)
+            self.assertEqual(len(Runner.LoadCheckpoint()), 1)
+        finally:
+            shutil.rmtree(Directory)
+
+if __name__ == '__main__':
+    unittest.main()